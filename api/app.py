@@ -1,10 +1,19 @@
+import click
 from flask import Flask, jsonify, request
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 from flask_cors import CORS
+from flask_migrate import Migrate
 from datetime import timedelta
 import os
 from dotenv import load_dotenv
+from utils.cache import init_response_cache
+from utils.compression import init_compression
+from utils.idempotency import init_idempotency
+from utils.json_provider import init_json_provider
+from utils.outbox import FileSink, WebhookSink, init_outbox, outbox
+from utils.query_budget import init_query_counter
+from utils.ratings import rebuild_rating_aggregates
 
 # Load environment variables
 load_dotenv()
@@ -20,13 +29,48 @@ if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgres://'):
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your-secret-key')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
+# Upper bounds of the catalog price facet buckets; the last bucket is open-ended
+app.config['FACET_PRICE_EDGES'] = [50, 100, 500, 1000]
+# Rows per INSERT/commit in bulk product imports
+app.config['IMPORT_BATCH_SIZE'] = 500
+# Largest batch accepted by PATCH /api/products/bulk
+app.config['BULK_UPDATE_MAX_ITEMS'] = 1000
+# Rows fetched per round trip by the streaming catalog export
+app.config['EXPORT_BATCH_SIZE'] = 1000
+# Cache for anonymous catalog reads: 'memory' (per worker), 'sqlite' (one file
+# shared by every worker on the host, so invalidation reaches all of them) or 'none'
+app.config['RESPONSE_CACHE_BACKEND'] = os.getenv('RESPONSE_CACHE_BACKEND', 'memory')
+app.config['RESPONSE_CACHE_PATH'] = os.getenv('RESPONSE_CACHE_PATH', os.path.join(app.instance_path, 'response_cache_api.sqlite3'))
+app.config['RESPONSE_CACHE_TTL'] = int(os.getenv('RESPONSE_CACHE_TTL', 60))
+# Responses smaller than this many bytes are sent uncompressed
+app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', 500))
+# Stored responses for Idempotency-Key retries: 'memory' (per worker) or
+# 'sqlite' (shared by every worker on the host, so duplicates coalesce across them).
+# The root app uses the same instance folder, so this app's files take an _api
+# suffix, like its Alembic version table
+app.config['IDEMPOTENCY_BACKEND'] = os.getenv('IDEMPOTENCY_BACKEND', 'memory')
+app.config['IDEMPOTENCY_PATH'] = os.getenv('IDEMPOTENCY_PATH', os.path.join(app.instance_path, 'idempotency_api.sqlite3'))
+app.config['IDEMPOTENCY_TTL'] = int(os.getenv('IDEMPOTENCY_TTL', 24 * 3600))
+# Events sent to a sink per outbox batch (and per cursor checkpoint)
+app.config['OUTBOX_BATCH_SIZE'] = int(os.getenv('OUTBOX_BATCH_SIZE', 100))
 
 # Initialize extensions
 db = SQLAlchemy(app)
+# Alembic revisions live in api/migrations; this app can share a database
+# file with the root app, so it keeps its own version table
+migrate = Migrate(
+    app, db, directory=os.path.join(os.path.dirname(__file__), 'migrations'), version_table='alembic_version_api'
+)
 jwt = JWTManager(app)
+init_query_counter(app)
+init_response_cache(app)
+init_json_provider(app)
+init_compression(app)
+init_idempotency(app)
 
 # Import models and routes
-from api.models import User, Product, Order, Message, Review
+from api.models import User, Product, Order, Message, Review, OutboxEvent, OutboxCursor, product_search
+init_outbox(app, db, OutboxEvent, OutboxCursor)
 from api.routes import auth_routes, product_routes, order_routes, message_routes, review_routes
 
 # Register blueprints
@@ -36,6 +80,34 @@ app.register_blueprint(order_routes.bp)
 app.register_blueprint(message_routes.bp)
 app.register_blueprint(review_routes.bp)
 
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index():
+    """Rebuild the product full-text index from the product table."""
+    product_search.rebuild()
+
+@app.cli.command('rebuild-rating-aggregates')
+def rebuild_ratings():
+    """Recompute stored product rating aggregates from the reviews."""
+    rebuild_rating_aggregates(db, Product, Review)
+
+@app.cli.command('dispatch-outbox')
+@click.argument('consumer')
+@click.option('--file', 'path', help='Append events as JSON lines to this file')
+@click.option('--webhook', help='POST event batches to this URL')
+@click.option('--once', is_flag=True, help='Stop once the outbox is drained')
+def dispatch_outbox(consumer, path, webhook, once):
+    """Deliver outbox events to a file or webhook, resuming from CONSUMER's cursor."""
+    if bool(path) == bool(webhook):
+        raise click.UsageError('Pass exactly one of --file and --webhook')
+    sink = FileSink(path) if path else WebhookSink(webhook)
+    print(f'Sent {outbox().dispatcher(consumer, sink).run(once=once)} events')
+
+@app.cli.command('prune-outbox')
+@click.option('--days', default=7, help='Keep delivered events younger than this')
+def prune_outbox(days):
+    """Delete outbox events that every consumer has received."""
+    print(f'Removed {outbox().prune(timedelta(days=days))} events')
+
 @app.route('/api/health')
 def health_check():
     return jsonify({
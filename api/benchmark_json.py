@@ -0,0 +1,105 @@
+"""Compare JSON encode throughput of the app's provider against the stdlib.
+
+Usage::
+
+    python -m api.benchmark_json [--items 100] [--repeat 200]
+
+Encodes a page of products (the shape ``GET /api/products`` returns) and a
+page of orders with their items, and prints payloads per second and MB/s for
+each encoder. Without orjson installed both rows use the stdlib encoder.
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask import Flask
+
+from utils.json_provider import FastJSONProvider, _default, orjson
+
+CATEGORIES = ['vegetables', 'fruits', 'grains', 'dairy', 'spices']
+STATUSES = ['pending', 'confirmed', 'completed', 'cancelled']
+
+
+def product_page(count):
+    now = datetime.utcnow()
+    return {
+        'products': [{
+            'id': i,
+            'name': f'Product {i}',
+            'description': 'Fresh from the farm, harvested this week. ' * 3,
+            'price': round(random.uniform(1, 200), 2),
+            'quantity': random.randint(0, 500),
+            'unit': 'kg',
+            'category': random.choice(CATEGORIES),
+            'image_url': f'/static/media/ab/cd/{i:064x}.jpg',
+            'seller': {'id': i % 20, 'name': f'Farmer {i % 20}', 'location': 'Kigali'},
+            'created_at': now - timedelta(days=i),
+            'updated_at': now,
+        } for i in range(count)],
+        'next_cursor': 'eyJrIjpbIjIwMjYtMDEtMDFUMDA6MDA6MDAiLDEwMF19',
+        'has_more': True,
+    }
+
+
+def order_page(count):
+    now = datetime.utcnow()
+    return {
+        'orders': [{
+            'id': i,
+            'buyer_id': i % 50,
+            'status': random.choice(STATUSES),
+            'total_amount': Decimal(random.randint(100, 50000)) / 100,
+            'delivery_address': f'{i} Market Street',
+            'items': [{
+                'product_id': i * 3 + j,
+                'quantity': random.randint(1, 20),
+                'price': Decimal(random.randint(100, 5000)) / 100,
+            } for j in range(3)],
+            'created_at': now - timedelta(hours=i),
+            'updated_at': now,
+        } for i in range(count)],
+    }
+
+
+def stdlib_dumps(obj):
+    # What jsonify did before FastJSONProvider: json.dumps with a default hook
+    return json.dumps(obj, default=_default, separators=(',', ':'), sort_keys=True)
+
+
+def measure(encode, payload, repeat):
+    size = len(encode(payload))
+    start = time.perf_counter()
+    for _ in range(repeat):
+        encode(payload)
+    elapsed = time.perf_counter() - start
+    return repeat / elapsed, size * repeat / elapsed / 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=100, help='rows per payload')
+    parser.add_argument('--repeat', type=int, default=200, help='encodes per measurement')
+    args = parser.parse_args(argv)
+
+    app = Flask(__name__)
+    provider = FastJSONProvider(app)
+    encoders = [('stdlib', stdlib_dumps), ('provider', provider.dumps)]
+    if orjson is None:
+        print('orjson is not installed; the provider falls back to the stdlib encoder')
+
+    random.seed(0)
+    payloads = [('products', product_page(args.items)), ('orders', order_page(args.items))]
+    print(f"{'payload':<10} {'encoder':<10} {'per sec':>10} {'MB/s':>8} {'speedup':>8}")
+    for name, payload in payloads:
+        baseline = None
+        for label, encode in encoders:
+            rate, throughput = measure(encode, payload, args.repeat)
+            baseline = baseline or rate
+            print(f'{name:<10} {label:<10} {rate:>10.0f} {throughput:>8.1f} {rate / baseline:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
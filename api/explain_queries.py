@@ -0,0 +1,272 @@
+"""Run EXPLAIN on every SQL statement the Flask apps' GET routes issue and flag full scans.
+
+Usage::
+
+    python -m api.explain_queries [--app all|api|root] [--rows 2000] [--database-url URL]
+
+Both apps are covered by default: this one (api/routes) and the root app
+(routes/). The throwaway databases are built from the models, which declare
+the same indexes the migrations create.
+Without ``--database-url`` each app gets a throwaway SQLite database, seeded
+so the plans reflect realistic table sizes; ``--database-url`` points one
+app (pick it with ``--app``) at an existing database instead. Exits non-zero
+when any statement scans a whole table, which makes it usable as a CI check.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# Extra query strings per endpoint so the filtered variants get explained too
+QUERY_VARIANTS = {
+    'products.get_products': [
+        {}, {'category': 'vegetables'}, {'category': 'grains', 'sort': 'price_asc'},
+        {'min_price': '10', 'max_price': '50'}, {'search': 'tomato'}, {'sort': 'price_desc'},
+    ],
+    'products.get_product_facets': [{}, {'category': 'vegetables'}],
+    'products.export_products': [{'updated_since': '2020-01-01T00:00:00'}],
+    'orders.get_orders': [{}, {'status': 'pending'}],
+    'messages.get_messages': [{}, {'with': '2'}, {'unread_only': 'true'}],
+    'reviews.get_product_reviews': [{}, {'sort_by': 'rating', 'sort_order': 'asc'}],
+    # Root app only
+    'products.search_products': [{'q': 'tomato'}, {'category': 'vegetables'}],
+    'orders.get_sales_analytics': [{}, {'from': '2020-01-01'}],
+}
+
+# Endpoints that must read every row when called without filters
+EXPECTED_FULL_SCANS = {
+    'products.get_product_facets': 'facet counts over the whole catalog',
+}
+
+CATEGORIES = ['vegetables', 'fruits', 'grains', 'dairy', 'spices']
+STATUSES = ['pending', 'confirmed', 'completed', 'cancelled']
+ROOT_STATUSES = ['pending', 'confirmed', 'shipped', 'delivered', 'cancelled']
+
+# SQLite reports index lookups as "SEARCH <table> ..."; any "SCAN <table>",
+# including "SCAN <table> USING [COVERING] INDEX ...", walks every row
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (\w+)\b')
+# ...unless nothing filters the walk and a LIMIT ends it: a first page read
+# in index order stops after the page size
+SQLITE_INDEX_WALK = re.compile(r'^SCAN \w+ USING (COVERING )?INDEX ')
+POSTGRES_FULL_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+def seed_api(db, rows):
+    from sqlalchemy import insert, text
+    from werkzeug.security import generate_password_hash
+    from api.models import User, Product, Order, Message, Review
+
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    password = generate_password_hash('password')
+    users = max(rows // 10, 20)
+
+    db.session.execute(insert(User), [{
+        'username': f'user{i}', 'email': f'user{i}@example.com', 'password': password,
+        'role': 'farmer' if i % 2 else 'buyer', 'created_at': now,
+    } for i in range(1, users + 1)])
+    db.session.execute(insert(Product), [{
+        'name': f'Product {i}', 'description': 'Fresh produce from the farm',
+        'price': round(rng.uniform(1, 1000), 2), 'quantity': rng.randint(0, 500),
+        'category': rng.choice(CATEGORIES), 'region': f'Region {i % 12}',
+        'seller_id': rng.randrange(1, users + 1, 2),
+        'created_at': now - timedelta(minutes=i), 'updated_at': now - timedelta(minutes=i),
+    } for i in range(1, rows + 1)])
+    db.session.execute(insert(Order), [{
+        'buyer_id': rng.randrange(2, users + 1, 2), 'product_id': rng.randint(1, rows),
+        'quantity': 1, 'total_price': 10.0, 'status': rng.choice(STATUSES),
+        'created_at': now - timedelta(minutes=i),
+    } for i in range(rows * 2)])
+    db.session.execute(insert(Message), [{
+        'sender_id': rng.randint(1, users), 'receiver_id': rng.randint(1, users),
+        'content': 'Is this still available?', 'is_read': rng.random() < 0.7,
+        'created_at': now - timedelta(minutes=i),
+    } for i in range(rows * 2)])
+    db.session.execute(insert(Review), [{
+        'user_id': rng.randrange(2, users + 1, 2), 'product_id': rng.randint(1, rows),
+        'rating': rng.randint(1, 5), 'comment': 'Good', 'created_at': now - timedelta(minutes=i),
+    } for i in range(rows)])
+    db.session.commit()
+
+    # Give the planner table statistics, as a long-running database would have
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+
+
+def seed_root(db, rows):
+    from sqlalchemy import insert, text
+    from werkzeug.security import generate_password_hash
+    from models.order import Order, OrderItem, OrderSeller, ProductSalesDaily, SellerSalesDaily
+    from models.product import Product
+    from models.review import Review
+    from models.user import User
+    from utils.order_sellers import backfill_order_sellers
+    from utils.rollups import rebuild_sales_rollups
+
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    password = generate_password_hash('password')
+    users = max(rows // 10, 20)
+
+    db.session.execute(insert(User), [{
+        'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': password,
+        'role': 'farmer' if i % 2 else 'buyer', 'created_at': now,
+    } for i in range(1, users + 1)])
+    db.session.execute(insert(Product), [{
+        'name': f'Product {i}', 'description': 'Fresh produce from the farm',
+        'price': round(rng.uniform(1, 1000), 2), 'quantity': rng.randint(0, 500), 'unit': 'kg',
+        'category': rng.choice(CATEGORIES), 'seller_id': rng.randrange(1, users + 1, 2),
+        'created_at': now - timedelta(minutes=i), 'updated_at': now - timedelta(minutes=i),
+    } for i in range(1, rows + 1)])
+    db.session.execute(insert(Order), [{
+        'buyer_id': rng.randrange(2, users + 1, 2), 'status': rng.choice(ROOT_STATUSES),
+        'total_amount': 20.0, 'shipping_address': '1 Market Street',
+        'created_at': now - timedelta(hours=i), 'updated_at': now - timedelta(hours=i),
+    } for i in range(rows * 2)])
+    db.session.execute(insert(OrderItem), [{
+        'order_id': order_id, 'product_id': rng.randint(1, rows), 'quantity': 1, 'price_at_time': 10.0,
+    } for order_id in range(1, rows * 2 + 1) for _ in range(2)])
+    db.session.execute(insert(Review), [{
+        'user_id': rng.randrange(2, users + 1, 2), 'product_id': rng.randint(1, rows),
+        'rating': rng.randint(1, 5), 'comment': 'Good', 'created_at': now - timedelta(minutes=i),
+    } for i in range(rows)])
+    db.session.commit()
+
+    # Derived tables are filled the way the app's maintenance commands fill them
+    backfill_order_sellers(db, Order, OrderItem, Product, OrderSeller)
+    rebuild_sales_rollups(db, ProductSalesDaily, SellerSalesDaily, Order, OrderItem, Product)
+
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+
+
+def load_app(name):
+    """Import one of the apps; DATABASE_URL must be set first."""
+    if name == 'api':
+        from api.app import app, db
+        return app, db, seed_api
+    from app import app, db
+    import models.order, models.review  # noqa: F401 - register the remaining tables
+    return app, db, seed_root
+
+
+def capture_statements(app, db):
+    """Return the SELECT statements (with parameters) each GET route runs."""
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import event
+
+    statements = {}
+    current = {}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            statements.setdefault(statement, (current['label'], parameters))
+
+    with app.app_context():
+        headers = {
+            'farmer': {'Authorization': f'Bearer {create_access_token(identity=1)}'},
+            'buyer': {'Authorization': f'Bearer {create_access_token(identity=2)}'},
+        }
+        engine = db.engine
+
+    client = app.test_client()
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        for rule in app.url_map.iter_rules():
+            if 'GET' not in rule.methods or rule.endpoint == 'static':
+                continue
+            path = rule.rule
+            for argument in rule.arguments:
+                path = path.replace(f'<int:{argument}>', '1').replace(f'<{argument}>', '1')
+            for role, role_headers in headers.items():
+                for args in QUERY_VARIANTS.get(rule.endpoint, [{}]):
+                    current['label'] = (rule.endpoint, role, args)
+                    response = client.get(path, query_string=args, headers=role_headers)
+                    # Drain streamed bodies so their queries run too
+                    response.get_data()
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return statements
+
+
+def explain(connection, dialect, statement, parameters):
+    if dialect == 'sqlite':
+        rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+        plan = [row[-1] for row in rows]
+        bounded = ' WHERE ' not in statement and ' LIMIT ' in statement
+        scans = [
+            match.group(1) for line in plan for match in [SQLITE_FULL_SCAN.match(line)]
+            if match and not (bounded and SQLITE_INDEX_WALK.match(line))
+        ]
+    else:
+        rows = connection.exec_driver_sql(f'EXPLAIN {statement}', parameters).fetchall()
+        plan = [row[0] for row in rows]
+        scans = [match.group(1) for line in plan for match in [POSTGRES_FULL_SCAN.search(line)] if match]
+    return plan, scans
+
+
+def explain_app(name, options):
+    """Explain one app's statements; return how many there were and how many scan."""
+    if options.database_url:
+        os.environ['DATABASE_URL'] = options.database_url
+    else:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), f'explain-{name}.db')
+
+    app, db, seed = load_app(name)
+    with app.app_context():
+        if not options.database_url:
+            db.create_all()
+            seed(db, options.rows)
+        tables = set(db.metadata.tables)
+
+    statements = capture_statements(app, db)
+
+    flagged = 0
+    with app.app_context():
+        with db.engine.connect() as connection:
+            dialect = connection.dialect.name
+            for statement, ((endpoint, role, args), parameters) in statements.items():
+                plan, scans = explain(connection, dialect, statement, parameters)
+                # Scans of CTEs, subqueries and virtual tables are not table scans
+                scans = [table for table in scans if table in tables]
+                expected = scans and not args and endpoint in EXPECTED_FULL_SCANS
+                if scans or options.verbose:
+                    if expected:
+                        marker = f'expected full scan: {EXPECTED_FULL_SCANS[endpoint]}'
+                    else:
+                        marker = 'FULL SCAN of ' + ', '.join(scans) if scans else 'ok'
+                    print(f'[{marker}] {name} {endpoint} ({role}) {args or ""}'.rstrip())
+                    print('    ' + ' '.join(statement.split()))
+                    for line in plan:
+                        print(f'      {line}')
+                flagged += bool(scans) and not expected
+    return len(statements), flagged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', choices=['all', 'api', 'root'], default='all', help='which Flask app to explain')
+    parser.add_argument('--rows', type=int, default=2000, help='products to seed (other tables scale with it)')
+    parser.add_argument('--database-url', help='explain against this database instead of a seeded SQLite file')
+    parser.add_argument('--verbose', action='store_true', help='print the plan of every statement')
+    options = parser.parse_args(argv)
+    if options.database_url and options.app == 'all':
+        parser.error('--database-url needs --app api or --app root; the apps have different schemas')
+
+    os.environ.setdefault('RESPONSE_CACHE_BACKEND', 'none')
+
+    total = flagged = 0
+    for name in (['api', 'root'] if options.app == 'all' else [options.app]):
+        explained, scanned = explain_app(name, options)
+        total += explained
+        flagged += scanned
+
+    print(f'{total} statements explained, {flagged} with full table scans')
+    return 1 if flagged else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
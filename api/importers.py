@@ -0,0 +1,185 @@
+import csv
+import json
+import math
+
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from api.app import db
+from api.models import Product, product_search
+
+REQUIRED_FIELDS = ('name', 'description', 'price', 'quantity', 'category')
+OPTIONAL_FIELDS = ('region', 'image_url')
+
+# Only the first errors are reported in full; the rest are just counted
+MAX_REPORTED_ERRORS = 1000
+
+
+class MalformedFile(ValueError):
+    """The upload cannot be read past ``line``; earlier rows were readable."""
+
+    def __init__(self, line, message):
+        super().__init__(message)
+        self.line = line
+
+
+def read_csv(stream):
+    # csv pulls lines lazily, so only the current row is ever held in memory
+    lines = (line.decode('utf-8-sig', errors='replace') for line in stream)
+    reader = csv.DictReader(lines)
+    try:
+        for row in reader:
+            yield reader.line_num, row
+    except csv.Error as e:
+        # line_num still counts the last record read; the bad one starts after it
+        raise MalformedFile(reader.line_num + 1, f'Malformed CSV: {e}') from e
+
+
+def read_jsonl(stream):
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_number, None
+            continue
+        yield line_number, row
+
+
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonl,
+}
+
+
+def validate_row(row, seller_id):
+    """Return ``(mapping, errors)`` for one uploaded row."""
+    if not isinstance(row, dict):
+        return None, ['Row is not a valid JSON object']
+
+    errors = [f'Missing field: {field}' for field in REQUIRED_FIELDS if row.get(field) in (None, '')]
+    if errors:
+        return None, errors
+
+    try:
+        # bool is an int subclass; true must not import as a price of 1
+        if isinstance(row['price'], bool):
+            raise TypeError
+        price = float(row['price'])
+        # float() accepts nan and inf, and nan < 0 is False
+        if not math.isfinite(price):
+            errors.append('Price must be a finite number')
+        elif price < 0:
+            errors.append('Price must not be negative')
+    except (TypeError, ValueError):
+        errors.append('Price must be a number')
+
+    try:
+        quantity = row['quantity']
+        # int() would take true as 1 and truncate a JSON 2.7 to 2
+        if isinstance(quantity, bool) or (isinstance(quantity, float) and not quantity.is_integer()):
+            raise TypeError
+        quantity = int(quantity)
+        if quantity < 0:
+            errors.append('Quantity must not be negative')
+    except (TypeError, ValueError):
+        errors.append('Quantity must be an integer')
+
+    if errors:
+        return None, errors
+
+    mapping = {
+        'name': str(row['name'])[:100],
+        'description': str(row['description']),
+        'price': price,
+        'quantity': quantity,
+        'category': str(row['category'])[:50],
+        'seller_id': seller_id,
+    }
+    # Every mapping carries the same keys so each batch is one executemany
+    for field in OPTIONAL_FIELDS:
+        mapping[field] = str(row[field]) if row.get(field) else None
+    return mapping, []
+
+
+class ImportReport:
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        # Set when the upload could not be read to the end
+        self.stopped = None
+
+    def fail(self, row_number, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'errors': errors})
+
+    def stop(self, error):
+        self.stopped = {'line': error.line, 'error': str(error)}
+
+    def to_dict(self):
+        report = {
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors)
+        }
+        if self.stopped:
+            report['stopped'] = self.stopped
+        return report
+
+
+def _insert_batch(batch, report):
+    rows = [mapping for _, mapping in batch]
+    try:
+        # One multi-row INSERT per batch; RETURNING gives the ids to index
+        result = db.session.execute(
+            insert(Product).returning(Product.id, sort_by_parameter_order=True),
+            rows
+        )
+        ids = result.scalars().all()
+        product_search.index_rows([
+            {'id': product_id, 'name': row['name'], 'description': row['description']}
+            for product_id, row in zip(ids, rows)
+        ])
+        db.session.commit()
+        report.imported += len(rows)
+    except SQLAlchemyError:
+        db.session.rollback()
+        for row_number, _ in batch:
+            report.fail(row_number, ['Database error while saving this batch'])
+
+
+def import_products(stream, file_format, seller_id, batch_size=500):
+    """Validate and insert products from a CSV or JSONL byte stream.
+
+    Rows are committed in batches of ``batch_size``, so a large upload is a
+    handful of multi-row INSERTs and memory use does not grow with its size.
+    If the file turns out to be malformed partway, the rows before that line
+    are still imported and ``report.stopped`` names the line, so the client
+    knows what was committed and where to resume.
+    """
+    report = ImportReport()
+    batch = []
+
+    try:
+        for row_number, row in READERS[file_format](stream):
+            mapping, errors = validate_row(row, seller_id)
+            if errors:
+                report.fail(row_number, errors)
+                continue
+
+            batch.append((row_number, mapping))
+            if len(batch) >= batch_size:
+                _insert_batch(batch, report)
+                batch = []
+    except MalformedFile as e:
+        report.stop(e)
+
+    if batch:
+        _insert_batch(batch, report)
+
+    return report
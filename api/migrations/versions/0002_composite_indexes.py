@@ -0,0 +1,44 @@
+"""indexes for the catalog, order, message and review queries
+
+Keyset pagination and the category, seller, buyer, inbox and review filters
+read these instead of scanning their tables. On a large PostgreSQL table
+consider creating them by hand with CREATE INDEX CONCURRENTLY before
+upgrading; the IF NOT EXISTS checks below then skip them.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 12:20:02.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_product_created_at_id', 'product', ['created_at', 'id']),
+    ('ix_product_price_id', 'product', ['price', 'id']),
+    ('ix_product_category_price', 'product', ['category', 'price']),
+    ('ix_product_seller_id', 'product', ['seller_id']),
+    ('ix_order_buyer_id_status_created_at', 'order', ['buyer_id', 'status', 'created_at']),
+    ('ix_order_product_id', 'order', ['product_id']),
+    ('ix_message_receiver_id_is_read', 'message', ['receiver_id', 'is_read']),
+    ('ix_message_sender_id_receiver_id_created_at', 'message', ['sender_id', 'receiver_id', 'created_at']),
+    ('ix_review_product_id_created_at', 'review', ['product_id', 'created_at']),
+    ('ix_review_user_id_product_id', 'review', ['user_id', 'product_id']),
+]
+
+
+def upgrade():
+    # `flask --app api.app create-indexes` may already have built some of them
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
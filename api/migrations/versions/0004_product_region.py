@@ -0,0 +1,27 @@
+"""product region
+
+``region`` is a catalog facet.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 12:20:04.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('product', sa.Column('region', sa.String(length=100), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_column('region')
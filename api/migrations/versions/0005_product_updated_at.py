@@ -0,0 +1,29 @@
+"""product updated_at
+
+``updated_at`` drives conditional GETs. Existing products take their
+creation time as their last update.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 12:20:05.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('product', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute('UPDATE product SET updated_at = created_at')
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
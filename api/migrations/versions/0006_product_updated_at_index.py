@@ -0,0 +1,26 @@
+"""index for incremental exports
+
+``updated_since`` exports read products in (updated_at, id) order.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 12:20:06.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # `flask --app api.app create-indexes` may already have built it
+    op.create_index('ix_product_updated_at_id', 'product', ['updated_at', 'id'], unique=False, if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index('ix_product_updated_at_id', table_name='product')
@@ -1,5 +1,6 @@
 from datetime import datetime
 from api.app import db
+from utils.search import ProductSearchIndex
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -23,13 +24,46 @@ class Product(db.Model):
     price = db.Column(db.Float, nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     category = db.Column(db.String(50), nullable=False)
+    region = db.Column(db.String(100))
     image_url = db.Column(db.String(200))
     seller_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Denormalized review aggregates, maintained by utils.ratings
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_1 = db.Column(db.Integer, nullable=False, default=0)
+    rating_2 = db.Column(db.Integer, nullable=False, default=0)
+    rating_3 = db.Column(db.Integer, nullable=False, default=0)
+    rating_4 = db.Column(db.Integer, nullable=False, default=0)
+    rating_5 = db.Column(db.Integer, nullable=False, default=0)
     
     # Relationships
     orders = db.relationship('Order', backref='product', lazy=True)
     reviews = db.relationship('Review', backref='product', lazy=True)
+    
+    # Keyset indexes for the catalog sort orders and incremental exports,
+    # plus the category filter in price and newest order, and the seller's
+    # own listings
+    __table_args__ = (
+        db.Index('ix_product_created_at_id', 'created_at', 'id'),
+        db.Index('ix_product_price_id', 'price', 'id'),
+        db.Index('ix_product_updated_at_id', 'updated_at', 'id'),
+        db.Index('ix_product_category_price', 'category', 'price'),
+        db.Index('ix_product_category_created_at_id', 'category', 'created_at', 'id'),
+        db.Index('ix_product_seller_id', 'seller_id'),
+    )
+    
+    @property
+    def average_rating(self):
+        if not self.rating_count:
+            return 0
+        return round(self.rating_sum / self.rating_count, 2)
+    
+    @property
+    def rating_histogram(self):
+        return {str(rating): getattr(self, f'rating_{rating}') for rating in range(1, 6)}
 
 class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -39,6 +73,12 @@ class Order(db.Model):
     total_price = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(20), nullable=False)  # 'pending', 'confirmed', 'completed', 'cancelled'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # A buyer's orders by status, and the orders of a farmer's products
+    __table_args__ = (
+        db.Index('ix_order_buyer_id_status_created_at', 'buyer_id', 'status', 'created_at'),
+        db.Index('ix_order_product_id', 'product_id'),
+    )
 
 class Message(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -47,6 +87,12 @@ class Message(db.Model):
     content = db.Column(db.Text, nullable=False)
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Unread counts, and conversations read from either side by recency
+    __table_args__ = (
+        db.Index('ix_message_receiver_id_is_read', 'receiver_id', 'is_read'),
+        db.Index('ix_message_sender_id_receiver_id_created_at', 'sender_id', 'receiver_id', 'created_at'),
+    )
 
 class Review(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -54,4 +100,30 @@ class Review(db.Model):
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
     rating = db.Column(db.Integer, nullable=False)
     comment = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow) 
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # A product's reviews by date, and the one-review-per-buyer check
+    __table_args__ = (
+        db.Index('ix_review_product_id_created_at', 'product_id', 'created_at'),
+        db.Index('ix_review_user_id_product_id', 'user_id', 'product_id'),
+    )
+
+class OutboxEvent(db.Model):
+    # AUTOINCREMENT: without it SQLite reuses ids once pruning empties the
+    # table, and a reused id falls behind every consumer's cursor
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(50), nullable=False)  # e.g. order.created, review.deleted
+    aggregate_id = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class OutboxCursor(db.Model):
+    consumer = db.Column(db.String(100), primary_key=True)
+    position = db.Column(db.Integer, nullable=False, default=0)  # id of the last delivered event
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Full-text index over product names and descriptions, synced on every flush
+product_search = ProductSearchIndex(db, Product)
+product_search.register()
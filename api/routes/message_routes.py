@@ -2,18 +2,44 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from api.models import Message, User
 from api.app import db
-from sqlalchemy import or_
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
+from utils.fieldsets import Field, Fieldset, InvalidFields, column, timestamp
+from utils.idempotency import idempotent
+from utils.outbox import outbox
+from utils.query_budget import query_budget
 
 bp = Blueprint('messages', __name__, url_prefix='/api/messages')
 
+# Keys of a message list entry; ?fields= and ?expand= pick from these
+MESSAGE_FIELDS = Fieldset(
+    id=column(Message.id),
+    content=column(Message.content),
+    is_read=column(Message.is_read),
+    sender=Field(
+        lambda message: {'id': message.sender.id, 'username': message.sender.username},
+        relations=lambda: [joinedload(Message.sender).load_only(User.id, User.username)]
+    ),
+    receiver=Field(
+        lambda message: {'id': message.receiver.id, 'username': message.receiver.username},
+        relations=lambda: [joinedload(Message.receiver).load_only(User.id, User.username)]
+    ),
+    created_at=timestamp(Message.created_at),
+)
+
 @bp.route('', methods=['GET'])
 @jwt_required()
+@query_budget(1)
 def get_messages():
     current_user_id = get_jwt_identity()
     
     # Get query parameters
     conversation_with = request.args.get('with')
     unread_only = request.args.get('unread_only', 'false').lower() == 'true'
+    try:
+        fields = MESSAGE_FIELDS.select(request.args)
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
     
     # Base query - get messages where user is either sender or receiver
     query = Message.query.filter(
@@ -36,23 +62,12 @@ def get_messages():
     if unread_only:
         query = query.filter(Message.receiver_id == current_user_id, Message.is_read == False)
     
-    messages = query.order_by(Message.created_at.desc()).all()
+    messages = query.options(
+        *MESSAGE_FIELDS.options(fields, Message.id, Message.created_at)
+    ).order_by(Message.created_at.desc()).all()
     
     return jsonify({
-        'messages': [{
-            'id': message.id,
-            'content': message.content,
-            'is_read': message.is_read,
-            'sender': {
-                'id': message.sender.id,
-                'username': message.sender.username
-            },
-            'receiver': {
-                'id': message.receiver.id,
-                'username': message.receiver.username
-            },
-            'created_at': message.created_at.isoformat()
-        } for message in messages]
+        'messages': [MESSAGE_FIELDS.render(message, fields) for message in messages]
     })
 
 @bp.route('/conversations', methods=['GET'])
@@ -79,12 +94,13 @@ def get_conversations():
                 'id': conv.id,
                 'username': conv.username
             },
-            'last_message_time': conv.last_message_time.isoformat()
+            'last_message_time': conv.last_message_time
         } for conv in conversations]
     })
 
 @bp.route('', methods=['POST'])
 @jwt_required()
+@idempotent
 def send_message():
     current_user_id = get_jwt_identity()
     data = request.get_json()
@@ -104,6 +120,13 @@ def send_message():
     )
     
     db.session.add(new_message)
+    db.session.flush()
+    outbox().record('message.sent', new_message.id, {
+        'message_id': new_message.id,
+        'sender_id': new_message.sender_id,
+        'receiver_id': new_message.receiver_id,
+        'created_at': new_message.created_at
+    })
     db.session.commit()
     
     return jsonify({
@@ -119,7 +142,7 @@ def send_message():
                 'id': new_message.receiver.id,
                 'username': new_message.receiver.username
             },
-            'created_at': new_message.created_at.isoformat()
+            'created_at': new_message.created_at
         }
     }), 201
 
@@ -133,6 +156,12 @@ def mark_as_read(message_id):
     if message.receiver_id != current_user_id:
         return jsonify({'error': 'Unauthorized to mark this message as read'}), 403
     
+    if not message.is_read:
+        outbox().record('message.read', message.id, {
+            'message_id': message.id,
+            'sender_id': message.sender_id,
+            'receiver_id': message.receiver_id
+        })
     message.is_read = True
     db.session.commit()
     
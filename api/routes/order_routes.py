@@ -2,17 +2,57 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from api.models import Order, Product, User
 from api.app import db
+from sqlalchemy.orm import joinedload
+from utils.cache import invalidate_cache
+from utils.fieldsets import Field, Fieldset, InvalidFields, column, timestamp
+from utils.idempotency import idempotent
+from utils.outbox import outbox
+from utils.query_budget import query_budget
+from utils.stock import InsufficientStock, release_stock, reserve_stock
 
 bp = Blueprint('orders', __name__, url_prefix='/api/orders')
 
+# Keys of an order list entry; ?fields= and ?expand= pick from these
+ORDER_FIELDS = Fieldset(
+    id=column(Order.id),
+    product=Field(
+        lambda order: {
+            'id': order.product.id,
+            'name': order.product.name,
+            'price': order.product.price
+        },
+        relations=lambda: [joinedload(Order.product).load_only(Product.id, Product.name, Product.price, Product.seller_id)]
+    ),
+    quantity=column(Order.quantity),
+    total_price=column(Order.total_price),
+    status=column(Order.status),
+    buyer=Field(
+        lambda order: {'id': order.buyer.id, 'username': order.buyer.username},
+        relations=lambda: [joinedload(Order.buyer).load_only(User.id, User.username)]
+    ),
+    seller=Field(
+        lambda order: {'id': order.product.seller.id, 'username': order.product.seller.username},
+        relations=lambda: [
+            joinedload(Order.product).load_only(Product.id, Product.name, Product.price, Product.seller_id)
+                .joinedload(Product.seller).load_only(User.id, User.username)
+        ]
+    ),
+    created_at=timestamp(Order.created_at),
+)
+
 @bp.route('', methods=['GET'])
 @jwt_required()
+@query_budget(2)
 def get_orders():
     current_user_id = get_jwt_identity()
     user = User.query.get(current_user_id)
     
     # Get query parameters
     status = request.args.get('status')
+    try:
+        fields = ORDER_FIELDS.select(request.args)
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
     
     # Base query
     if user.role == 'farmer':
@@ -26,38 +66,25 @@ def get_orders():
     if status:
         query = query.filter(Order.status == status)
     
-    orders = query.all()
+    # Load the product, seller and buyer with the orders instead of once per
+    # row, and only when the requested fields include them
+    orders = query.options(*ORDER_FIELDS.options(fields, Order.id)).all()
     
     return jsonify({
-        'orders': [{
-            'id': order.id,
-            'product': {
-                'id': order.product.id,
-                'name': order.product.name,
-                'price': order.product.price
-            },
-            'quantity': order.quantity,
-            'total_price': order.total_price,
-            'status': order.status,
-            'buyer': {
-                'id': order.buyer.id,
-                'username': order.buyer.username
-            },
-            'seller': {
-                'id': order.product.seller.id,
-                'username': order.product.seller.username
-            },
-            'created_at': order.created_at.isoformat()
-        } for order in orders]
+        'orders': [ORDER_FIELDS.render(order, fields) for order in orders]
     })
 
 @bp.route('/<int:order_id>', methods=['GET'])
 @jwt_required()
+@query_budget(2)
 def get_order(order_id):
     current_user_id = get_jwt_identity()
     user = User.query.get(current_user_id)
     
-    order = Order.query.get_or_404(order_id)
+    order = Order.query.options(
+        joinedload(Order.product).joinedload(Product.seller),
+        joinedload(Order.buyer)
+    ).get_or_404(order_id)
     
     # Check if user has permission to view this order
     if user.role == 'buyer' and order.buyer_id != current_user_id:
@@ -88,12 +115,13 @@ def get_order(order_id):
                 'username': order.product.seller.username,
                 'email': order.product.seller.email
             },
-            'created_at': order.created_at.isoformat()
+            'created_at': order.created_at
         }
     })
 
 @bp.route('', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_order():
     current_user_id = get_jwt_identity()
     user = User.query.get(current_user_id)
@@ -108,10 +136,19 @@ def create_order():
     if not all(field in data for field in required_fields):
         return jsonify({'error': 'Missing required fields'}), 400
     
+    # bool is an int subclass; True must not reserve one unit
+    quantity = data['quantity']
+    if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity <= 0:
+        return jsonify({'error': 'Quantity must be a positive integer'}), 400
+    
     product = Product.query.get_or_404(data['product_id'])
     
-    # Check if requested quantity is available
-    if product.quantity < data['quantity']:
+    # Take the stock with a conditional UPDATE rather than check-then-decrement,
+    # so concurrent buyers of the same product cannot oversell it
+    try:
+        reserve_stock(db, Product, {product.id: data['quantity']})
+    except InsufficientStock:
+        db.session.rollback()
         return jsonify({'error': 'Requested quantity not available'}), 400
     
     # Calculate total price
@@ -125,12 +162,23 @@ def create_order():
         status='pending'
     )
     
-    # Update product quantity
-    product.quantity -= data['quantity']
-    
     db.session.add(new_order)
+    db.session.flush()
+    outbox().record('order.created', new_order.id, {
+        'order_id': new_order.id,
+        'buyer_id': new_order.buyer_id,
+        'seller_id': product.seller_id,
+        'product_id': product.id,
+        'quantity': new_order.quantity,
+        'total_price': new_order.total_price,
+        'status': new_order.status,
+        'created_at': new_order.created_at
+    })
     db.session.commit()
     
+    # Stock levels are part of the cached catalog responses
+    invalidate_cache('products', f'product:{product.id}')
+    
     return jsonify({
         'message': 'Order created successfully',
         'order': {
@@ -143,7 +191,7 @@ def create_order():
             'quantity': new_order.quantity,
             'total_price': new_order.total_price,
             'status': new_order.status,
-            'created_at': new_order.created_at.isoformat()
+            'created_at': new_order.created_at
         }
     }), 201
 
@@ -169,17 +217,28 @@ def update_order_status(order_id):
         return jsonify({'error': 'Invalid status'}), 400
     
     # If order is cancelled, return quantity to product
-    if data['status'] == 'cancelled' and order.status != 'cancelled':
-        order.product.quantity += order.quantity
-    
+    restocked = data['status'] == 'cancelled' and order.status != 'cancelled'
+    if restocked:
+        release_stock(db, Product, {order.product_id: order.quantity})
+    
+    if data['status'] != order.status:
+        outbox().record('order.status_changed', order.id, {
+            'order_id': order.id,
+            'seller_id': current_user_id,
+            'previous_status': order.status,
+            'status': data['status']
+        })
     order.status = data['status']
     db.session.commit()
     
+    if restocked:
+        invalidate_cache('products', f'product:{order.product_id}')
+    
     return jsonify({
         'message': 'Order status updated successfully',
         'order': {
             'id': order.id,
             'status': order.status,
-            'updated_at': order.created_at.isoformat()
+            'updated_at': order.created_at
         }
     }) 
\ No newline at end of file
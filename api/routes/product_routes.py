@@ -1,69 +1,252 @@
-from flask import Blueprint, request, jsonify
+import math
+from datetime import datetime
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from api.models import Product, User
+from api.models import Product, User, product_search
 from api.app import db
+from api.importers import READERS, import_products
+from sqlalchemy import and_, case, func, literal, select, union_all, update
+from sqlalchemy.orm import joinedload
+from utils.cache import cached_response, invalidate_cache
+from utils.conditional import make_etag, not_modified, with_validators
+from utils.fieldsets import Field, Fieldset, InvalidFields, column, timestamp
+from utils.pagination import InvalidCursor, get_page_size, paginate_keyset
+from utils.query_budget import query_budget
 
 bp = Blueprint('products', __name__, url_prefix='/api/products')
 
-@bp.route('', methods=['GET'])
-def get_products():
+# Keyset sort orders: (sort key, descending). Product.id breaks ties.
+SORT_ORDERS = {
+    'newest': (Product.created_at, True),
+    'oldest': (Product.created_at, False),
+    'price_asc': (Product.price, False),
+    'price_desc': (Product.price, True),
+}
+
+# Every key a product response can carry; ?fields= and ?expand= pick from these
+PRODUCT_FIELDS = Fieldset(
+    id=column(Product.id),
+    name=column(Product.name),
+    description=column(Product.description),
+    price=column(Product.price),
+    quantity=column(Product.quantity),
+    category=column(Product.category),
+    region=column(Product.region),
+    image_url=column(Product.image_url),
+    average_rating=Field(lambda p: p.average_rating, Product.rating_sum, Product.rating_count),
+    rating_count=column(Product.rating_count),
+    rating_histogram=Field(
+        lambda p: p.rating_histogram,
+        Product.rating_1, Product.rating_2, Product.rating_3, Product.rating_4, Product.rating_5
+    ),
+    seller=Field(
+        lambda p: {'id': p.seller.id, 'username': p.seller.username},
+        relations=lambda: [joinedload(Product.seller).load_only(User.id, User.username)]
+    ),
+    created_at=timestamp(Product.created_at),
+    updated_at=timestamp(Product.updated_at),
+)
+
+# Keys of a catalog list entry when no fields are asked for
+PRODUCT_LIST_FIELDS = [
+    'id', 'name', 'description', 'price', 'quantity', 'category', 'region',
+    'image_url', 'average_rating', 'rating_count', 'seller', 'created_at'
+]
+
+def filter_products(query):
+    # Filters shared by the catalog list and its facet counts
     # Get query parameters
     category = request.args.get('category')
+    region = request.args.get('region')
     search = request.args.get('search')
     min_price = request.args.get('min_price', type=float)
     max_price = request.args.get('max_price', type=float)
     
-    # Base query
-    query = Product.query
+    # Full-text search
+    matches = product_search.match(search) if search else None
+    if matches is not None:
+        query = product_search.filter(query, matches)
     
     # Apply filters
     if category:
         query = query.filter(Product.category == category)
-    if search:
-        query = query.filter(Product.name.ilike(f'%{search}%'))
+    if region:
+        query = query.filter(Product.region == region)
     if min_price is not None:
         query = query.filter(Product.price >= min_price)
     if max_price is not None:
         query = query.filter(Product.price <= max_price)
     
-    products = query.all()
+    return query, matches
+
+def price_bucket(price):
+    # CASE expression labelling each price with its facet bucket
+    edges = current_app.config['FACET_PRICE_EDGES']
+    whens = []
+    lower = 0
+    for upper in edges:
+        whens.append((and_(price >= lower, price < upper), f'{lower:g}-{upper:g}'))
+        lower = upper
+    return case(*whens, else_=f'{lower:g}+'), [label for _, label in whens] + [f'{lower:g}+']
+
+@bp.route('', methods=['GET'])
+@cached_response('products')
+@query_budget(1)
+def get_products():
+    cursor = request.args.get('cursor')
+    limit = get_page_size(request.args)
+    try:
+        fields = PRODUCT_FIELDS.select(request.args, default=PRODUCT_LIST_FIELDS)
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Base query
+    query, matches = filter_products(Product.query)
+    
+    # Searches are ranked by relevance unless another sort is asked for
+    sort = request.args.get('sort', 'relevance' if matches is not None else 'newest')
+    if sort not in SORT_ORDERS and not (sort == 'relevance' and matches is not None):
+        return jsonify({'error': 'Invalid sort order'}), 400
+    
+    # Select only the columns the requested fields read (plus the sort key and
+    # the ETag's updated_at), and join the seller only when it is part of the response
+    sort_key = SORT_ORDERS[sort][0] if sort in SORT_ORDERS else Product.id
+    query = query.options(*PRODUCT_FIELDS.options(fields, Product.id, Product.updated_at, sort_key))
+    
+    try:
+        if sort == 'relevance':
+            products, next_cursor = product_search.search_page(
+                query, matches, cursor=cursor, limit=limit
+            )
+        else:
+            key, descending = SORT_ORDERS[sort]
+            products, next_cursor = paginate_keyset(
+                query, sort, key, Product.id,
+                descending=descending, cursor=cursor, limit=limit
+            )
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # The ETag covers exactly what this page holds: the request (filters, sort
+    # and cursor), each row's id and updated_at, and whether more follow. It
+    # costs nothing beyond the page query, however large the catalog. There is
+    # no Last-Modified: a product can leave the page without any row changing.
+    etag = make_etag(
+        sorted(request.args.items(multi=True)),
+        [(product.id, product.updated_at) for product in products],
+        next_cursor
+    )
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    return with_validators(jsonify({
+        'products': [PRODUCT_FIELDS.render(p, fields) for p in products],
+        'next_cursor': next_cursor
+    }), etag)
+
+@bp.route('/facets', methods=['GET'])
+@cached_response('products', ttl=30)
+@query_budget(2)
+def get_product_facets():
+    query, _ = filter_products(Product.query)
+    filtered = query.with_entities(Product.category, Product.region, Product.price).cte('filtered')
+    bucket, bucket_labels = price_bucket(filtered.c.price)
+    
+    # All three facets are grouped in one statement and one round trip
+    rows = db.session.execute(union_all(
+        select(literal('category').label('facet'), filtered.c.category.label('value'), func.count().label('count'))
+            .group_by(filtered.c.category),
+        select(literal('region'), filtered.c.region, func.count())
+            .group_by(filtered.c.region),
+        select(literal('price'), bucket, func.count())
+            .group_by(bucket)
+    )).all()
+    
+    facets = {'category': [], 'region': [], 'price': []}
+    for facet, value, count in rows:
+        facets[facet].append({'value': value, 'count': count})
+    
+    facets['category'].sort(key=lambda item: -item['count'])
+    facets['region'].sort(key=lambda item: -item['count'])
+    facets['price'].sort(key=lambda item: bucket_labels.index(item['value']))
     
     return jsonify({
-        'products': [{
-            'id': p.id,
-            'name': p.name,
-            'description': p.description,
-            'price': p.price,
-            'quantity': p.quantity,
-            'category': p.category,
-            'image_url': p.image_url,
-            'seller': {
-                'id': p.seller.id,
-                'username': p.seller.username
-            },
-            'created_at': p.created_at.isoformat()
-        } for p in products]
+        'facets': facets,
+        'total': sum(item['count'] for item in facets['category'])
     })
 
+@bp.route('/export', methods=['GET'])
+def export_products():
+    updated_since = request.args.get('updated_since')
+    if updated_since:
+        try:
+            updated_since = datetime.fromisoformat(updated_since)
+        except ValueError:
+            return jsonify({'error': 'updated_since must be an ISO 8601 timestamp'}), 400
+    
+    # Partners pass this back as updated_since on their next pull
+    started_at = datetime.utcnow().isoformat()
+    
+    stmt = select(
+        Product.id, Product.name, Product.description, Product.price,
+        Product.quantity, Product.category, Product.region, Product.image_url,
+        Product.seller_id, User.username.label('seller_username'),
+        Product.created_at, Product.updated_at
+    ).join(User, User.id == Product.seller_id).order_by(Product.updated_at, Product.id)
+    if updated_since:
+        stmt = stmt.where(Product.updated_at >= updated_since)
+    
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+    
+    def generate():
+        # yield_per streams from a server-side cursor where the driver has
+        # one, so only one batch of rows is in memory at a time
+        result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+        for rows in result.partitions():
+            yield ''.join(current_app.json.dumps({
+                'id': row.id,
+                'name': row.name,
+                'description': row.description,
+                'price': row.price,
+                'quantity': row.quantity,
+                'category': row.category,
+                'region': row.region,
+                'image_url': row.image_url,
+                'seller': {
+                    'id': row.seller_id,
+                    'username': row.seller_username
+                },
+                'created_at': row.created_at,
+                'updated_at': row.updated_at
+            }) + '\n' for row in rows)
+    
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['X-Export-Started-At'] = started_at
+    return response
+
 @bp.route('/<int:product_id>', methods=['GET'])
+@cached_response('product:{product_id}')
+@query_budget(1)
 def get_product(product_id):
-    product = Product.query.get_or_404(product_id)
-    return jsonify({
-        'product': {
-            'id': product.id,
-            'name': product.name,
-            'description': product.description,
-            'price': product.price,
-            'quantity': product.quantity,
-            'category': product.category,
-            'image_url': product.image_url,
-            'seller': {
-                'id': product.seller.id,
-                'username': product.seller.username
-            },
-            'created_at': product.created_at.isoformat()
-        }
-    })
+    try:
+        fields = PRODUCT_FIELDS.select(request.args)
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+    
+    product = Product.query.options(
+        *PRODUCT_FIELDS.options(fields, Product.id, Product.updated_at)
+    ).get_or_404(product_id)
+    
+    # Skip serialization when the client already has this version
+    etag = make_etag(product.id, product.updated_at, fields)
+    cached = not_modified(etag, product.updated_at)
+    if cached:
+        return cached
+    
+    return with_validators(jsonify({
+        'product': PRODUCT_FIELDS.render(product, fields)
+    }), etag, product.updated_at)
 
 @bp.route('', methods=['POST'])
 @jwt_required()
@@ -87,12 +270,14 @@ def create_product():
         price=data['price'],
         quantity=data['quantity'],
         category=data['category'],
+        region=data.get('region'),
         image_url=data.get('image_url'),
         seller_id=current_user_id
     )
     
     db.session.add(new_product)
     db.session.commit()
+    invalidate_cache('products')
     
     return jsonify({
         'message': 'Product created successfully',
@@ -103,12 +288,131 @@ def create_product():
             'price': new_product.price,
             'quantity': new_product.quantity,
             'category': new_product.category,
+            'region': new_product.region,
             'image_url': new_product.image_url,
             'seller_id': new_product.seller_id,
-            'created_at': new_product.created_at.isoformat()
+            'created_at': new_product.created_at
         }
     }), 201
 
+@bp.route('/import', methods=['POST'])
+@jwt_required()
+def bulk_import_products():
+    current_user_id = get_jwt_identity()
+    user = User.query.get(current_user_id)
+    
+    if user.role != 'farmer':
+        return jsonify({'error': 'Only farmers can import products'}), 403
+    
+    # Accept a multipart upload or the raw file as the request body
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if upload is None:
+            return jsonify({'error': 'No file uploaded'}), 400
+        stream, filename = upload.stream, upload.filename or ''
+    else:
+        stream, filename = request.stream, ''
+    
+    # Format from ?format=, else the file extension, else the content type
+    file_format = request.args.get('format')
+    if not file_format:
+        if filename.endswith('.csv') or request.mimetype == 'text/csv':
+            file_format = 'csv'
+        elif filename.endswith(('.jsonl', '.ndjson')) or request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+            file_format = 'jsonl'
+    if file_format not in READERS:
+        return jsonify({'error': 'Unsupported format, use csv or jsonl'}), 400
+    
+    try:
+        report = import_products(
+            stream, file_format, current_user_id,
+            batch_size=current_app.config['IMPORT_BATCH_SIZE']
+        )
+    finally:
+        invalidate_cache('products')
+    
+    # A file malformed partway is still a 400, but the body says how many
+    # rows were committed before the line that could not be read
+    if report.stopped:
+        return jsonify({'error': report.stopped['error'], **report.to_dict()}), 400
+    
+    return jsonify({
+        'message': 'Import finished',
+        **report.to_dict()
+    }), 200 if report.failed == 0 else 207
+
+@bp.route('/bulk', methods=['PATCH'])
+@jwt_required()
+@query_budget(1)
+def bulk_update_products():
+    current_user_id = get_jwt_identity()
+    data = request.get_json()
+    
+    updates = data.get('updates') if isinstance(data, dict) else None
+    if not isinstance(updates, list) or not updates:
+        return jsonify({'error': 'updates must be a non-empty list'}), 400
+    if len(updates) > current_app.config['BULK_UPDATE_MAX_ITEMS']:
+        return jsonify({'error': 'Too many updates in one request'}), 400
+    
+    # Validate everything first; the batch is applied all together or not at all
+    prices = {}
+    quantities = {}
+    errors = []
+    for index, item in enumerate(updates):
+        # bool is an int subclass; true must not update product 1
+        if not isinstance(item, dict) or not isinstance(item.get('id'), int) or isinstance(item['id'], bool):
+            errors.append({'index': index, 'error': 'Each update needs an integer id'})
+            continue
+        if 'price' not in item and 'quantity' not in item:
+            errors.append({'index': index, 'error': 'Nothing to update'})
+            continue
+        if 'price' in item:
+            price = item['price']
+            # Without orjson the stdlib parser accepts NaN and Infinity, and nan < 0 is False
+            if (not isinstance(price, (int, float)) or isinstance(price, bool)
+                    or not math.isfinite(price) or price < 0):
+                errors.append({'index': index, 'error': 'Price must be a finite, non-negative number'})
+                continue
+            prices[item['id']] = float(price)
+        if 'quantity' in item:
+            quantity = item['quantity']
+            if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 0:
+                errors.append({'index': index, 'error': 'Quantity must be a non-negative integer'})
+                continue
+            quantities[item['id']] = quantity
+    
+    if errors:
+        return jsonify({'error': 'Invalid updates', 'details': errors}), 400
+    
+    # One UPDATE ... SET col = CASE id WHEN ... END for the whole batch; the
+    # seller_id condition makes ownership part of the same statement
+    values = {}
+    if prices:
+        values[Product.price] = case(prices, value=Product.id, else_=Product.price)
+    if quantities:
+        values[Product.quantity] = case(quantities, value=Product.id, else_=Product.quantity)
+    
+    ids = set(prices) | set(quantities)
+    result = db.session.execute(
+        update(Product)
+        .where(Product.id.in_(ids), Product.seller_id == current_user_id)
+        .values(values)
+        .returning(Product.id),
+        execution_options={'synchronize_session': False}
+    )
+    updated = sorted(result.scalars().all())
+    db.session.commit()
+    
+    if updated:
+        invalidate_cache('products', *[f'product:{product_id}' for product_id in updated])
+    
+    return jsonify({
+        'message': 'Products updated successfully',
+        'updated': updated,
+        # Ids that do not exist or belong to another seller are left untouched
+        'not_updated': sorted(ids - set(updated))
+    })
+
 @bp.route('/<int:product_id>', methods=['PUT'])
 @jwt_required()
 def update_product(product_id):
@@ -131,10 +435,13 @@ def update_product(product_id):
         product.quantity = data['quantity']
     if 'category' in data:
         product.category = data['category']
+    if 'region' in data:
+        product.region = data['region']
     if 'image_url' in data:
         product.image_url = data['image_url']
     
     db.session.commit()
+    invalidate_cache('products', f'product:{product.id}')
     
     return jsonify({
         'message': 'Product updated successfully',
@@ -145,9 +452,10 @@ def update_product(product_id):
             'price': product.price,
             'quantity': product.quantity,
             'category': product.category,
+            'region': product.region,
             'image_url': product.image_url,
             'seller_id': product.seller_id,
-            'created_at': product.created_at.isoformat()
+            'created_at': product.created_at
         }
     })
 
@@ -162,5 +470,6 @@ def delete_product(product_id):
     
     db.session.delete(product)
     db.session.commit()
+    invalidate_cache('products', f'product:{product_id}')
     
     return jsonify({'message': 'Product deleted successfully'}) 
\ No newline at end of file
@@ -2,11 +2,28 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from api.models import Review, Product, User, Order
 from api.app import db
-from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from utils.cache import cached_response, invalidate_cache
+from utils.outbox import outbox
+from utils.ratings import apply_rating_change, valid_rating
 
 bp = Blueprint('reviews', __name__, url_prefix='/api/products')
 
+def invalidate_review_caches(product_id):
+    # Reviews feed the product's rating, which the catalog pages also show
+    invalidate_cache(f'reviews:{product_id}', f'product:{product_id}', 'products')
+
+def review_event(review):
+    return {
+        'review_id': review.id,
+        'product_id': review.product_id,
+        'user_id': review.user_id,
+        'rating': review.rating,
+        'comment': review.comment
+    }
+
 @bp.route('/<int:product_id>/reviews', methods=['GET'])
+@cached_response('reviews:{product_id}')
 def get_product_reviews(product_id):
     product = Product.query.get_or_404(product_id)
     
@@ -15,7 +32,7 @@ def get_product_reviews(product_id):
     sort_order = request.args.get('sort_order', 'desc')
     
     # Base query
-    query = Review.query.filter_by(product_id=product_id)
+    query = Review.query.options(joinedload(Review.user)).filter_by(product_id=product_id)
     
     # Apply sorting
     if sort_by == 'rating':
@@ -29,14 +46,13 @@ def get_product_reviews(product_id):
     
     reviews = query.all()
     
-    # Calculate average rating
-    avg_rating = db.session.query(func.avg(Review.rating)).filter_by(product_id=product_id).scalar() or 0
-    
     return jsonify({
         'product': {
             'id': product.id,
             'name': product.name,
-            'average_rating': round(float(avg_rating), 2)
+            'average_rating': product.average_rating,
+            'rating_count': product.rating_count,
+            'rating_histogram': product.rating_histogram
         },
         'reviews': [{
             'id': review.id,
@@ -46,7 +62,7 @@ def get_product_reviews(product_id):
                 'id': review.user.id,
                 'username': review.user.username
             },
-            'created_at': review.created_at.isoformat()
+            'created_at': review.created_at
         } for review in reviews]
     })
 
@@ -83,7 +99,7 @@ def create_review(product_id):
         return jsonify({'error': 'Missing required fields'}), 400
     
     # Validate rating
-    if not isinstance(data['rating'], int) or data['rating'] < 1 or data['rating'] > 5:
+    if not valid_rating(data['rating']):
         return jsonify({'error': 'Rating must be an integer between 1 and 5'}), 400
     
     new_review = Review(
@@ -94,7 +110,11 @@ def create_review(product_id):
     )
     
     db.session.add(new_review)
+    apply_rating_change(db, Product, product_id, added=new_review.rating)
+    db.session.flush()
+    outbox().record('review.created', new_review.id, review_event(new_review))
     db.session.commit()
+    invalidate_review_caches(product_id)
     
     return jsonify({
         'message': 'Review created successfully',
@@ -106,7 +126,7 @@ def create_review(product_id):
                 'id': new_review.user.id,
                 'username': new_review.user.username
             },
-            'created_at': new_review.created_at.isoformat()
+            'created_at': new_review.created_at
         }
     }), 201
 
@@ -128,14 +148,17 @@ def update_review(product_id, review_id):
     
     # Update fields if provided
     if 'rating' in data:
-        if not isinstance(data['rating'], int) or data['rating'] < 1 or data['rating'] > 5:
+        if not valid_rating(data['rating']):
             return jsonify({'error': 'Rating must be an integer between 1 and 5'}), 400
+        apply_rating_change(db, Product, review.product_id, added=data['rating'], removed=review.rating)
         review.rating = data['rating']
     
     if 'comment' in data:
         review.comment = data['comment']
     
+    outbox().record('review.updated', review.id, review_event(review))
     db.session.commit()
+    invalidate_review_caches(product_id)
     
     return jsonify({
         'message': 'Review updated successfully',
@@ -147,7 +170,7 @@ def update_review(product_id, review_id):
                 'id': review.user.id,
                 'username': review.user.username
             },
-            'created_at': review.created_at.isoformat()
+            'created_at': review.created_at
         }
     })
 
@@ -165,7 +188,10 @@ def delete_review(product_id, review_id):
     if review.product_id != product_id:
         return jsonify({'error': 'Review does not belong to this product'}), 400
     
+    apply_rating_change(db, Product, review.product_id, removed=review.rating)
+    outbox().record('review.deleted', review.id, review_event(review))
     db.session.delete(review)
     db.session.commit()
+    invalidate_review_caches(product_id)
     
     return jsonify({'message': 'Review deleted successfully'}) 
\ No newline at end of file
@@ -1,10 +1,22 @@
+import click
 from flask import Flask, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
+from flask_migrate import Migrate
 from datetime import timedelta
 import os
 from dotenv import load_dotenv
+from utils.compression import init_compression
+from utils.query_budget import init_query_counter
+from utils.ratings import rebuild_rating_aggregates
+from utils.rollups import rebuild_sales_rollups
+from utils.images import generate_variants, init_image_pipeline, load_variants
+from utils.idempotency import init_idempotency
+from utils.json_provider import init_json_provider
+from utils.media import init_media_store
+from utils.order_sellers import backfill_order_sellers
+from utils.outbox import FileSink, WebhookSink, init_outbox, outbox
 
 # Load environment variables
 load_dotenv()
@@ -18,13 +30,39 @@ app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///agr
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-here')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+# Worker threads that build thumbnail/WebP variants of uploaded images
+app.config['IMAGE_WORKERS'] = int(os.getenv('IMAGE_WORKERS', '2'))
+# Largest batch accepted by PATCH /api/orders/status
+app.config['BULK_STATUS_MAX_ORDERS'] = 500
+# Responses smaller than this many bytes are sent uncompressed
+app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', '500'))
+# Stored responses for Idempotency-Key retries: 'memory' (per worker) or
+# 'sqlite' (shared by every worker on the host, so duplicates coalesce across them)
+app.config['IDEMPOTENCY_BACKEND'] = os.getenv('IDEMPOTENCY_BACKEND', 'memory')
+app.config['IDEMPOTENCY_PATH'] = os.getenv('IDEMPOTENCY_PATH', os.path.join(app.instance_path, 'idempotency.sqlite3'))
+app.config['IDEMPOTENCY_TTL'] = int(os.getenv('IDEMPOTENCY_TTL', '86400'))
+# Events sent to a sink per outbox batch (and per cursor checkpoint)
+app.config['OUTBOX_BATCH_SIZE'] = int(os.getenv('OUTBOX_BATCH_SIZE', '100'))
 
 # Initialize extensions
 db = SQLAlchemy(app)
+# Schema changes ship as Alembic revisions in migrations/; see README
+migrate = Migrate(app, db)
 jwt = JWTManager(app)
-CORS(app)
+init_query_counter(app)
+init_image_pipeline(app)
+init_json_provider(app)
+init_compression(app)
+init_idempotency(app)
+CORS(app, expose_headers=['X-Next-Cursor'])
 
 # Import routes after db initialization to avoid circular imports
+from models.media import MediaBlob
+init_media_store(app, db, MediaBlob)
+from models.outbox import OutboxCursor, OutboxEvent
+init_outbox(app, db, OutboxEvent, OutboxCursor)
+
 from routes.auth import auth_bp
 from routes.products import products_bp
 from routes.orders import orders_bp
@@ -38,6 +76,68 @@ app.register_blueprint(orders_bp, url_prefix='/api/orders')
 app.register_blueprint(messages_bp, url_prefix='/api/messages')
 app.register_blueprint(reviews_bp, url_prefix='/api/reviews')
 
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index():
+    """Rebuild the product full-text index from the products table."""
+    from models.product import product_search
+    product_search.rebuild()
+
+@app.cli.command('rebuild-rating-aggregates')
+def rebuild_ratings():
+    """Recompute stored product rating aggregates from the reviews."""
+    from models.product import Product
+    from models.review import Review
+    rebuild_rating_aggregates(db, Product, Review)
+
+@app.cli.command('generate-image-variants')
+def generate_image_variants():
+    """Build thumbnail and WebP variants for uploads that do not have them yet."""
+    uploads = os.path.join(app.static_folder, 'uploads')
+    for filename in sorted(os.listdir(uploads)):
+        relative_path = f'uploads/{filename}'
+        if os.path.isfile(os.path.join(uploads, filename)) and not load_variants(app.static_folder, relative_path):
+            generate_variants(app.static_folder, relative_path)
+            print(f'Generated variants for {relative_path}')
+
+@app.cli.command('backfill-order-sellers')
+def backfill_sellers():
+    """Fill order_sellers for orders placed before the table existed."""
+    from models.order import Order, OrderItem, OrderSeller
+    from models.product import Product
+    added = backfill_order_sellers(db, Order, OrderItem, Product, OrderSeller)
+    print(f'Added {added} order-seller rows')
+
+@app.cli.command('dispatch-outbox')
+@click.argument('consumer')
+@click.option('--file', 'path', help='Append events as JSON lines to this file')
+@click.option('--webhook', help='POST event batches to this URL')
+@click.option('--once', is_flag=True, help='Stop once the outbox is drained')
+def dispatch_outbox(consumer, path, webhook, once):
+    """Deliver outbox events to a file or webhook, resuming from CONSUMER's cursor."""
+    if bool(path) == bool(webhook):
+        raise click.UsageError('Pass exactly one of --file and --webhook')
+    sink = FileSink(path) if path else WebhookSink(webhook)
+    print(f'Sent {outbox().dispatcher(consumer, sink).run(once=once)} events')
+
+@app.cli.command('prune-outbox')
+@click.option('--days', default=7, help='Keep delivered events younger than this')
+def prune_outbox(days):
+    """Delete outbox events that every consumer has received."""
+    print(f'Removed {outbox().prune(timedelta(days=days))} events')
+
+@app.cli.command('rebuild-sales-rollups')
+def rebuild_sales():
+    """Recompute the daily sales rollups from orders that are not cancelled."""
+    from models.order import Order, OrderItem, ProductSalesDaily, SellerSalesDaily
+    from models.product import Product
+    rebuild_sales_rollups(db, ProductSalesDaily, SellerSalesDaily, Order, OrderItem, Product)
+
+@app.cli.command('collect-media-garbage')
+def collect_media_garbage():
+    """Delete stored images (and their variants) that no product references."""
+    from utils.media import media_store
+    print(f'Removed {media_store().collect_garbage()} unreferenced files')
+
 # Health check endpoint
 @app.route('/api/health')
 def health_check():
@@ -0,0 +1,81 @@
+"""Measure statements and latency of POST /api/orders/ for growing order sizes.
+
+Usage::
+
+    python -m benchmark_orders [--sizes 1 10 100] [--repeat 20]
+
+Seeds a throwaway SQLite database with a farmer, a buyer and enough products
+for the largest order, then places orders of each size through the test
+client. The statement count comes from the app's own query counter, so it
+covers everything the request runs, rendering the response included.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+def seed(db, products):
+    from sqlalchemy import insert
+    from models.product import Product
+    from models.user import User
+
+    farmer = User(username='farmer', email='farmer@example.com', role='farmer')
+    buyer = User(username='buyer', email='buyer@example.com', role='buyer')
+    db.session.add_all([farmer, buyer])
+    db.session.flush()
+    db.session.execute(insert(Product), [{
+        'name': f'Product {i}', 'description': 'Fresh produce from the farm',
+        'price': 1.5 + i % 40, 'quantity': 10 ** 9, 'unit': 'kg',
+        'category': 'vegetables', 'seller_id': farmer.id,
+    } for i in range(products)])
+    db.session.commit()
+    return buyer.id
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100], help='items per order')
+    parser.add_argument('--repeat', type=int, default=20, help='orders placed per size')
+    options = parser.parse_args(argv)
+
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+
+    from flask_jwt_extended import create_access_token
+    from app import app, db
+    import models.order, models.review  # noqa: F401 - register the remaining tables
+
+    # The query counter reports X-Query-Count in testing mode
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        buyer_id = seed(db, max(options.sizes))
+        headers = {'Authorization': f'Bearer {create_access_token(identity=buyer_id)}'}
+
+    client = app.test_client()
+    print(f"{'items':>6} {'statements':>11} {'median ms':>10} {'p95 ms':>8}")
+    for size in options.sizes:
+        payload = {
+            'shipping_address': '1 Market Street',
+            'items': [{'product_id': product_id, 'quantity': 1} for product_id in range(1, size + 1)],
+        }
+        timings = []
+        statements = set()
+        for _ in range(options.repeat):
+            start = time.perf_counter()
+            response = client.post('/api/orders/', json=payload, headers=headers)
+            timings.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 201:
+                print(f'Order of {size} items failed: {response.status_code} {response.get_data(as_text=True)}')
+                return 1
+            statements.add(response.headers['X-Query-Count'])
+
+        p95 = sorted(timings)[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+        print(f"{size:>6} {'/'.join(sorted(statements)):>11} {statistics.median(timings):>10.2f} {p95:>8.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
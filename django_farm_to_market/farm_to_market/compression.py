@@ -0,0 +1,89 @@
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional, gzip is used without it
+    brotli = None
+
+re_accepts_brotli = _lazy_re_compile(r'\bbr\b')
+
+DEFAULT_CONTENT_TYPES = (
+    'application/json',
+    'application/javascript',
+    'image/svg+xml',
+    'text/css',
+    'text/csv',
+    'text/html',
+    'text/javascript',
+    'text/plain',
+)
+
+
+def _brotli_sequence(chunks, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for chunk in chunks:
+        if chunk:
+            yield compressor.process(chunk) + compressor.flush()
+    yield compressor.finish()
+
+
+async def _brotli_async_sequence(chunks, quality):
+    compressor = brotli.Compressor(quality=quality)
+    async for chunk in chunks:
+        if chunk:
+            yield compressor.process(chunk) + compressor.flush()
+    yield compressor.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """``GZipMiddleware`` with Brotli, a size threshold and a content-type allow-list.
+
+    Responses whose type is not in ``COMPRESS_CONTENT_TYPES`` (images, files
+    that are already compressed) or that are shorter than
+    ``COMPRESS_MIN_SIZE`` bytes are left alone. Clients that accept ``br``
+    get Brotli when the ``brotli`` package is installed; everyone else gets
+    Django's gzip encoding. Streaming responses are compressed chunk by chunk.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.min_size = getattr(settings, 'COMPRESS_MIN_SIZE', 500)
+        self.content_types = frozenset(getattr(settings, 'COMPRESS_CONTENT_TYPES', DEFAULT_CONTENT_TYPES))
+        self.brotli_quality = getattr(settings, 'COMPRESS_BROTLI_QUALITY', 4)
+
+    def _compressible(self, response):
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        if content_type not in self.content_types or not 200 <= response.status_code < 300:
+            return False
+        return response.streaming or len(response.content) >= self.min_size
+
+    def process_response(self, request, response):
+        if not self._compressible(response):
+            return response
+        if brotli is None or response.has_header('Content-Encoding'):
+            return super().process_response(request, response)
+        if not re_accepts_brotli.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = _brotli_async_sequence(response.streaming_content, self.brotli_quality)
+            else:
+                response.streaming_content = _brotli_sequence(response.streaming_content, self.brotli_quality)
+            del response.headers['Content-Length']
+        else:
+            compressed_content = brotli.compress(response.content, quality=self.brotli_quality)
+            if len(compressed_content) >= len(response.content):
+                return response
+            response.content = compressed_content
+            response.headers['Content-Length'] = str(len(response.content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
@@ -0,0 +1,63 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+
+def make_etag(*parts):
+    raw = '|'.join('' if part is None else str(part) for part in parts)
+    return 'W/' + quote_etag(hashlib.sha1(raw.encode()).hexdigest()[:24])
+
+
+class ConditionalGetMixin:
+    """ETag / Last-Modified support for list and retrieve actions.
+
+    Validators are built from the ``updated_at`` watermark of the filtered
+    queryset (plus its count and highest id, so deletions are noticed), or of
+    the single object, so an unchanged resource gets a 304 before anything is
+    serialized. Lists get an ETag only: a deletion or a different filter can
+    leave the newest ``updated_at`` unchanged, so If-Modified-Since would
+    answer 304 for a list that changed.
+    """
+
+    last_modified_field = 'updated_at'
+
+    def _conditional(self, request, etag, last_modified):
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+    def _with_validators(self, response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        watermark = queryset.order_by().aggregate(
+            count=Count('pk'),
+            max_id=Max('pk'),
+            last_modified=Max(self.last_modified_field)
+        )
+        # The visible set depends on who is asking, so the user is part of the tag
+        etag = make_etag(
+            request.get_full_path(), request.user.pk,
+            watermark['count'], watermark['max_id'], watermark['last_modified']
+        )
+        response = self._conditional(request, etag, None)
+        if response is not None:
+            return response
+        response = super().list(request, *args, **kwargs)
+        return self._with_validators(response, etag, None)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        last_modified = getattr(instance, self.last_modified_field)
+        etag = make_etag(instance.pk, last_modified)
+        response = self._conditional(request, etag, last_modified)
+        if response is not None:
+            return response
+        serializer = self.get_serializer(instance)
+        return self._with_validators(Response(serializer.data), etag, last_modified)
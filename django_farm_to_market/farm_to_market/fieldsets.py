@@ -0,0 +1,121 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import permissions, serializers
+
+
+def _lookups(value):
+    if value is None:
+        return ()
+    return (value,) if isinstance(value, str) else value
+
+
+class SparseFieldsSerializerMixin:
+    """Serializer that can be limited to a subset of its fields.
+
+    ``SparseFieldsetMixin`` passes ``fields`` from the request; nested
+    serializers are left whole.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                if not self.fields[name].write_only:
+                    self.fields.pop(name)
+
+
+class SparseFieldsetMixin:
+    """``?fields=id,name,price`` and ``?expand=farmer`` for read-only actions.
+
+    ``fields`` keeps only those keys and ``expand`` adds nested objects to
+    them. The queryset is narrowed to match: ``only()`` the columns behind the
+    requested fields, and only the ``select_related``/``prefetch_related``
+    lookups declared for requested relations, so a trimmed response is also
+    cheaper to query. Without either parameter nothing changes.
+    """
+
+    # response field -> select_related / prefetch_related lookups it needs
+    sparse_select_related = {}
+    sparse_prefetch_related = {}
+    # response field -> model fields it reads, when not a field of the same name
+    sparse_columns = {}
+
+    def requested_fields(self):
+        if self.request.method not in permissions.SAFE_METHODS:
+            return None
+        if not hasattr(self, '_requested_fields'):
+            self._requested_fields = self._parse_fields()
+        return self._requested_fields
+
+    def _parse_fields(self):
+        fields = self.request.query_params.get('fields')
+        expand = self.request.query_params.get('expand')
+        if not fields and not expand:
+            return None
+
+        readable = [
+            name for name, field in self.get_serializer_class()().fields.items()
+            if not field.write_only
+        ]
+        requested = {name.strip() for name in (fields or '').split(',') if name.strip()}
+        if not fields:
+            requested = set(readable)
+        requested |= {name.strip() for name in (expand or '').split(',') if name.strip()}
+
+        unknown = requested - set(readable)
+        if unknown:
+            raise serializers.ValidationError({'fields': f"Unknown fields: {', '.join(sorted(unknown))}"})
+        return [name for name in readable if name in requested]
+
+    def _model_columns(self, model, fields):
+        columns = {'pk', getattr(self, 'last_modified_field', 'pk')}
+        # Cursor pagination and ordering read these from every row
+        ordering = getattr(self, 'ordering', None) or ()
+        ordering = (ordering,) if isinstance(ordering, str) else ordering
+        columns.update(name.lstrip('-') for name in ordering)
+        columns.update(getattr(self, 'ordering_fields', None) or ())
+
+        for name in fields:
+            if name in self.sparse_columns:
+                columns.update(self.sparse_columns[name])
+            elif name in self.sparse_select_related:
+                columns.add(name)
+            elif name not in self.sparse_prefetch_related:
+                try:
+                    field = model._meta.get_field(name)
+                except FieldDoesNotExist:
+                    continue
+                if field.concrete:
+                    columns.add(name)
+        columns.discard('pk')
+        return columns
+
+    def get_queryset(self):
+        return self.narrow_queryset(super().get_queryset())
+
+    def narrow_queryset(self, queryset):
+        """Apply the requested fieldset; views overriding get_queryset call this."""
+        fields = self.requested_fields()
+        if fields is None:
+            return queryset
+
+        queryset = queryset.select_related(None).prefetch_related(None)
+        select = [
+            lookup for name in fields
+            for lookup in _lookups(self.sparse_select_related.get(name))
+        ]
+        prefetch = [
+            lookup for name in fields
+            for lookup in _lookups(self.sparse_prefetch_related.get(name))
+        ]
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset.only(*self._model_columns(queryset.model, fields))
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.requested_fields()
+        if fields is not None:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
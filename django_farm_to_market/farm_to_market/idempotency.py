@@ -0,0 +1,81 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = 'Idempotency-Key'
+
+
+class IdempotentCreateMixin:
+    """``Idempotency-Key`` support for ``create``, so clients can retry POSTs.
+
+    The first request with a key claims it with ``cache.add`` (atomic in every
+    Django cache backend) and its response is stored for ``IDEMPOTENCY_TTL``
+    seconds; retries get that response back without running ``create`` again.
+    Concurrent duplicates wait for the first one to finish and replay it.
+    Keys are scoped to the user, and reusing one with a different body is a
+    422. Use a cache shared by all workers (``IDEMPOTENCY_CACHE``) in
+    production so duplicates coalesce across processes.
+    """
+
+    idempotency_lock_ttl = 60
+    idempotency_wait = 10
+    idempotency_poll_interval = 0.05
+
+    def create(self, request, *args, **kwargs):
+        idempotency_key = request.headers.get(HEADER)
+        if not idempotency_key:
+            return super().create(request, *args, **kwargs)
+
+        cache = caches[getattr(settings, 'IDEMPOTENCY_CACHE', 'default')]
+        key = f'idem:{request.user.pk}:{request.path}:{idempotency_key}'
+        fingerprint = hashlib.sha256(request.body).hexdigest()
+
+        while True:
+            entry = cache.get(key)
+            if entry is None and cache.add(key, ('pending', fingerprint), self.idempotency_lock_ttl):
+                break
+            if entry is None or entry[0] == 'pending':
+                entry = self._wait_for(cache, key)
+                if entry is None:
+                    # The other request failed and released the key; try to take it
+                    continue
+                if entry[0] == 'pending':
+                    return Response(
+                        {'error': f'A request with this {HEADER} is still in progress'},
+                        status=status.HTTP_409_CONFLICT
+                    )
+            if entry[1] != fingerprint:
+                return Response(
+                    {'error': f'{HEADER} was already used with a different request body'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            _, _, status_code, data, headers = entry
+            return Response(data, status=status_code, headers={**headers, 'Idempotent-Replayed': 'true'})
+
+        try:
+            response = super().create(request, *args, **kwargs)
+        except Exception:
+            cache.delete(key)
+            raise
+        if response.status_code >= 500:
+            cache.delete(key)
+        else:
+            headers = {name: response[name] for name in ('Location',) if response.has_header(name)}
+            cache.set(
+                key, ('done', fingerprint, response.status_code, response.data, headers),
+                getattr(settings, 'IDEMPOTENCY_TTL', 24 * 3600)
+            )
+        return response
+
+    def _wait_for(self, cache, key):
+        deadline = time.monotonic() + self.idempotency_wait
+        while time.monotonic() < deadline:
+            entry = cache.get(key)
+            if entry is None or entry[0] == 'done':
+                return entry
+            time.sleep(self.idempotency_poll_interval)
+        return cache.get(key)
@@ -0,0 +1,34 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class CursorPage(CursorPagination):
+    """Cursor pagination keyed on each viewset's ``ordering``.
+
+    Every page is a ``WHERE key < position ORDER BY key LIMIT n`` range read,
+    so with an index on the key page 500 costs the same as page 1. Clients
+    may ask for ``page_size`` up to ``API_MAX_PAGE_SIZE``, or up to the
+    viewset's own ``max_page_size`` when it sets one.
+    """
+
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 100)
+    ordering = ('-created_at', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.view = view
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_page_size(self, request):
+        self.max_page_size = getattr(self.view, 'max_page_size', self.max_page_size)
+        return super().get_page_size(request)
+
+    def get_ordering(self, request, queryset, view):
+        # Views with an OrderingFilter let it decide; it falls back to view.ordering
+        has_ordering_filter = any(
+            hasattr(backend, 'get_ordering') for backend in getattr(view, 'filter_backends', [])
+        )
+        ordering = getattr(view, 'ordering', None)
+        if ordering and not has_ordering_filter:
+            return (ordering,) if isinstance(ordering, str) else tuple(ordering)
+        return super().get_ordering(request, queryset, view)
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messages', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['receiver', 'is_read'], name='message_receiver_read_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', 'receiver', 'created_at'], name='message_conversation_idx'),
+        ),
+    ]
@@ -12,6 +12,11 @@ class Message(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        # Unread counts, and conversations read from either side by recency
+        indexes = [
+            models.Index(fields=['receiver', 'is_read'], name='message_receiver_read_idx'),
+            models.Index(fields=['sender', 'receiver', 'created_at'], name='message_conversation_idx'),
+        ]
 
     def __str__(self):
         return f"Message from {self.sender.username} to {self.receiver.username}" 
\ No newline at end of file
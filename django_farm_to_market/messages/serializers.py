@@ -1,8 +1,12 @@
 from rest_framework import serializers
+from django.contrib.auth import get_user_model
 from .models import Message
 from auth_app.serializers import UserSerializer
+from farm_to_market.fieldsets import SparseFieldsSerializerMixin
 
-class MessageSerializer(serializers.ModelSerializer):
+User = get_user_model()
+
+class MessageSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     sender = UserSerializer(read_only=True)
     receiver = UserSerializer(read_only=True)
     receiver_id = serializers.PrimaryKeyRelatedField(
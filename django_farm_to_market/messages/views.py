@@ -4,23 +4,28 @@ from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Message
 from .serializers import MessageSerializer
+from farm_to_market.fieldsets import SparseFieldsetMixin
+from farm_to_market.idempotency import IdempotentCreateMixin
 from django.db import models
 
 class IsParticipant(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         return obj.sender == request.user or obj.receiver == request.user
 
-class MessageViewSet(viewsets.ModelViewSet):
+class MessageViewSet(IdempotentCreateMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = MessageSerializer
     permission_classes = [permissions.IsAuthenticated, IsParticipant]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['is_read']
+    ordering = ('-created_at', '-id')
+    sparse_select_related = {'sender': 'sender', 'receiver': 'receiver'}
 
     def get_queryset(self):
         user = self.request.user
-        return Message.objects.filter(
+        queryset = Message.objects.filter(
             models.Q(sender=user) | models.Q(receiver=user)
-        )
+        ).select_related('sender', 'receiver')
+        return self.narrow_queryset(queryset)
 
     @action(detail=True, methods=['post'])
     def mark_as_read(self, request, pk=None):
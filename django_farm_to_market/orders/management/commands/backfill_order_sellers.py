@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from orders.models import Order, OrderSeller
+
+
+class Command(BaseCommand):
+    help = 'Fill order_sellers for orders placed before the table existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        pairs = Order.objects.filter(sellers__isnull=True).values_list(
+            'items__product__farmer_id', 'id', 'status', 'created_at'
+        ).distinct().order_by()
+
+        with transaction.atomic():
+            rows = [
+                OrderSeller(seller_id=seller_id, order_id=order_id, status=status, created_at=created_at)
+                for seller_id, order_id, status, created_at in pairs.iterator()
+                if seller_id is not None
+            ]
+            OrderSeller.objects.bulk_create(rows, batch_size=options['batch_size'], ignore_conflicts=True)
+
+        self.stdout.write(self.style.SUCCESS(f'Added {len(rows)} order-seller rows'))
@@ -0,0 +1,65 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from orders.views import OrderViewSet
+from products.models import Category, Product
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Report statements and latency of order creation for 1, 10 and 100-item orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        sizes = options['sizes']
+        # Everything, the seeded users and products included, is rolled back at the end
+        with transaction.atomic():
+            farmer = User.objects.create_user('benchmark-farmer', password=None, is_farmer=True)
+            buyer = User.objects.create_user('benchmark-buyer', password=None)
+            category = Category.objects.create(name='Benchmark')
+            products = Product.objects.bulk_create([
+                Product(
+                    name=f'Product {i}', description='Fresh produce from the farm', price=1 + i % 40,
+                    quantity=10 ** 9, category=category, farmer=farmer
+                ) for i in range(max(sizes))
+            ])
+
+            view = OrderViewSet.as_view({'post': 'create'})
+            factory = APIRequestFactory()
+            self.stdout.write(f"{'items':>6} {'statements':>11} {'median ms':>10} {'p95 ms':>8}")
+            for size in sizes:
+                payload = {
+                    'shipping_address': '1 Market Street',
+                    'items': [{'product_id': product.pk, 'quantity': 1} for product in products[:size]],
+                }
+                timings = []
+                statements = set()
+                for _ in range(options['repeat']):
+                    request = factory.post('/api/orders/', payload, format='json')
+                    force_authenticate(request, user=buyer)
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        response = view(request)
+                        response.render()
+                        timings.append((time.perf_counter() - start) * 1000)
+                    if response.status_code != 201:
+                        self.stderr.write(f'Order of {size} items failed: {response.status_code} {response.data}')
+                        transaction.set_rollback(True)
+                        return
+                    statements.add(len(queries.captured_queries))
+
+                p95 = sorted(timings)[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+                counts = '/'.join(str(count) for count in sorted(statements))
+                self.stdout.write(f'{size:>6} {counts:>11} {statistics.median(timings):>10.2f} {p95:>8.2f}')
+
+            transaction.set_rollback(True)
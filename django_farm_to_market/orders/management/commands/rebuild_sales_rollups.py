@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+from orders.models import OrderItem, ProductSalesDaily, SellerSalesDaily
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily sales rollups from orders that are not cancelled'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        lines = OrderItem.objects.exclude(order__status='cancelled').annotate(
+            seller=F('product__farmer_id'), day=TruncDate('order__created_at')
+        )
+        totals = {
+            'total_revenue': Sum(F('quantity') * F('price')),
+            'total_units': Sum('quantity'),
+            'orders': Count('order_id', distinct=True),
+        }
+
+        with transaction.atomic():
+            ProductSalesDaily.objects.all().delete()
+            SellerSalesDaily.objects.all().delete()
+            ProductSalesDaily.objects.bulk_create((
+                ProductSalesDaily(
+                    seller_id=row['seller'], product_id=row['product_id'], day=row['day'],
+                    revenue=row['total_revenue'], units=row['total_units'], order_count=row['orders']
+                )
+                for row in lines.values('seller', 'product_id', 'day').annotate(**totals).order_by().iterator()
+            ), batch_size=options['batch_size'])
+            SellerSalesDaily.objects.bulk_create((
+                SellerSalesDaily(
+                    seller_id=row['seller'], day=row['day'],
+                    revenue=row['total_revenue'], units=row['total_units'], order_count=row['orders']
+                )
+                for row in lines.values('seller', 'day').annotate(**totals).order_by().iterator()
+            ), batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {ProductSalesDaily.objects.count()} product-day and '
+            f'{SellerSalesDaily.objects.count()} seller-day rows'
+        ))
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:58
+# Populate the table for existing orders with `python manage.py backfill_order_sellers`.
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('orders', '0002_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSeller',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sold_orders', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sellers', to='orders.order')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('created_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='orderseller',
+            index=models.Index(fields=['seller', 'created_at', 'order'], name='order_seller_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderseller',
+            index=models.Index(fields=['seller', 'status', 'created_at'], name='order_seller_status_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='orderseller',
+            constraint=models.UniqueConstraint(fields=('seller', 'order'), name='order_seller_unique'),
+        ),
+    ]
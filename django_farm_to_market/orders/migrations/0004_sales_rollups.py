@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:58
+# Fill the rollups from existing orders with `python manage.py rebuild_sales_rollups`.
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('products', '0004_category_updated_at'),
+        ('orders', '0003_order_sellers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSalesDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('units', models.IntegerField(default=0)),
+                ('order_count', models.IntegerField(default=0)),
+                ('day', models.DateField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SellerSalesDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('units', models.IntegerField(default=0)),
+                ('order_count', models.IntegerField(default=0)),
+                ('day', models.DateField()),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='sellersalesdaily',
+            constraint=models.UniqueConstraint(fields=('seller', 'day'), name='seller_sales_daily_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='productsalesdaily',
+            index=models.Index(fields=['seller', 'day'], name='product_sales_seller_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='productsalesdaily',
+            constraint=models.UniqueConstraint(fields=('seller', 'product', 'day'), name='product_sales_daily_unique'),
+        ),
+    ]
@@ -1,5 +1,11 @@
-from django.db import models
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db import models, transaction
+from django.db.models import Case, Exists, F, OuterRef, Q, When
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from products.models import Product
 
 User = get_user_model()
@@ -20,9 +26,96 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Status -> statuses it may move to; delivered and cancelled are final
+    TRANSITIONS = {
+        'pending': {'confirmed', 'cancelled'},
+        'confirmed': {'shipped', 'cancelled'},
+        'shipped': {'delivered'},
+        'delivered': set(),
+        'cancelled': set(),
+    }
+
+    class Meta:
+        # A customer's orders, optionally by status, newest first
+        indexes = [
+            models.Index(fields=['customer', 'status', 'created_at'], name='order_customer_status_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.id} by {self.customer.username}"
 
+    @classmethod
+    def sources_of(cls, status):
+        """The statuses an order may be in to move to ``status``."""
+        return sorted(source for source, targets in cls.TRANSITIONS.items() if status in targets)
+
+    @classmethod
+    def transition(cls, seller, targets):
+        """Move ``{order_id: status}`` along TRANSITIONS for one seller's orders.
+
+        Orders are moved with one locked read and one UPDATE per target
+        status, filtered on the allowed source statuses and on the seller's
+        order_sellers row. Cancelled orders return their stock in one UPDATE
+        and are taken out of the sales rollups. Returns ``{order_id: error}``
+        for the orders that did not move.
+        """
+        owned = OrderSeller.objects.filter(order=OuterRef('pk'), seller=seller)
+        by_status = defaultdict(list)
+        for order_id, status in targets.items():
+            by_status[status].append(order_id)
+
+        moved = {}
+        with transaction.atomic():
+            now = timezone.now()
+            for status, order_ids in by_status.items():
+                sources = cls.sources_of(status)
+                if not sources:
+                    continue
+                movable = cls.objects.filter(pk__in=order_ids, status__in=sources).filter(Exists(owned))
+                locked = list(movable.select_for_update().values_list('pk', flat=True))
+                movable.filter(pk__in=locked).update(status=status, updated_at=now)
+                moved.update((order_id, status) for order_id in locked)
+
+            if moved:
+                OrderSeller.objects.filter(order_id__in=moved).update(status=Case(
+                    *(When(order_id=order_id, then=models.Value(status)) for order_id, status in moved.items()),
+                    output_field=models.CharField()
+                ))
+
+            # Cancelled orders give their stock back and leave the sales rollups
+            cancelled = [order_id for order_id, status in moved.items() if status == 'cancelled']
+            if cancelled:
+                lines = [
+                    (order_id, timezone.localdate(created_at), farmer_id, product_id, quantity, price)
+                    for order_id, created_at, farmer_id, product_id, quantity, price
+                    in OrderItem.objects.filter(order_id__in=cancelled).values_list(
+                        'order_id', 'order__created_at', 'product__farmer_id', 'product_id', 'quantity', 'price'
+                    )
+                ]
+                returned = defaultdict(int)
+                for _, _, _, product_id, quantity, _ in lines:
+                    returned[product_id] += quantity
+                Product.release_stock(returned)
+                record_sales(lines, sign=-1)
+
+        errors = {}
+        rejected = set(targets) - set(moved)
+        if rejected:
+            current = {
+                pk: (status, is_owned)
+                for pk, status, is_owned in cls.objects.filter(pk__in=rejected).annotate(
+                    is_owned=Exists(owned)
+                ).values_list('pk', 'status', 'is_owned')
+            }
+            for order_id in rejected:
+                if order_id not in current:
+                    errors[order_id] = 'Order not found'
+                elif not current[order_id][1]:
+                    errors[order_id] = 'Unauthorized to update this order'
+                else:
+                    errors[order_id] = f'Cannot change a {current[order_id][0]} order to {targets[order_id]}'
+        return errors
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -31,4 +124,136 @@ class OrderItem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.quantity} x {self.product.name} in Order {self.order.id}" 
\ No newline at end of file
+        return f"{self.quantity} x {self.product.name} in Order {self.order.id}"
+
+class OrderSeller(models.Model):
+    """One row per farmer with products in an order, written with the order.
+
+    Farmer inboxes and permission checks read this instead of joining orders
+    to their items and products and de-duplicating; ``status`` and
+    ``created_at`` are copies of the order's so they can be filtered and
+    sorted on the same index.
+    """
+    seller = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sold_orders')
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='sellers')
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['seller', 'order'], name='order_seller_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['seller', 'created_at', 'order'], name='order_seller_created_idx'),
+            models.Index(fields=['seller', 'status', 'created_at'], name='order_seller_status_idx'),
+        ]
+
+class SalesRollup(models.Model):
+    """Revenue, units and order count per ``key_fields``, excluding cancelled orders.
+
+    Rows are adjusted by ``record_sales`` as orders are placed and cancelled,
+    so sales statistics never read orders or their items. Days are the local
+    date (``TIME_ZONE``) the order was placed.
+    """
+    key_fields = ()
+
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.IntegerField(default=0)
+    order_count = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def add(cls, increments):
+        """Add ``{key: (revenue, units, orders)}`` to the rows with those keys.
+
+        Missing rows are inserted at zero, then one ``UPDATE ... SET revenue =
+        revenue + CASE ... END`` adds every increment, so concurrent orders on
+        the same day add up instead of overwriting each other.
+        """
+        if not increments:
+            return
+        matches = [Q(**dict(zip(cls.key_fields, key))) for key in increments]
+
+        def per_row(index, output_field):
+            return Case(
+                *(When(match, then=models.Value(totals[index])) for match, totals in zip(matches, increments.values())),
+                output_field=output_field
+            )
+
+        with transaction.atomic():
+            cls.objects.bulk_create(
+                [cls(**dict(zip(cls.key_fields, key))) for key in increments], ignore_conflicts=True
+            )
+            cls.objects.filter(reduce(or_, matches)).update(
+                revenue=F('revenue') + per_row(0, models.DecimalField(max_digits=14, decimal_places=2)),
+                units=F('units') + per_row(1, models.IntegerField()),
+                order_count=F('order_count') + per_row(2, models.IntegerField())
+            )
+
+class ProductSalesDaily(SalesRollup):
+    key_fields = ('seller_id', 'product_id', 'day')
+
+    seller = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    day = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['seller', 'product', 'day'], name='product_sales_daily_unique'),
+        ]
+        # A farmer's products over a date range
+        indexes = [
+            models.Index(fields=['seller', 'day'], name='product_sales_seller_day_idx'),
+        ]
+
+class SellerSalesDaily(SalesRollup):
+    """A farmer's sales on one day, with each order counted once."""
+    key_fields = ('seller_id', 'day')
+
+    seller = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    day = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['seller', 'day'], name='seller_sales_daily_unique'),
+        ]
+
+def sales_increments(lines, sign=1):
+    """Fold order lines into ``{key: (revenue, units, orders)}`` per rollup.
+
+    The rules, shared with ``sales_increments`` in the Flask apps'
+    utils/rollups.py (keep the two in step):
+
+    - ``lines`` are ``(order_id, day, seller_id, product_id, quantity, price)``
+      and ``day`` is the date the order was placed;
+    - revenue is ``quantity * price`` and units is ``quantity``, summed;
+    - an order counts once per (seller, product, day) and once per
+      (seller, day) however many of its lines fall there;
+    - cancelled orders are not counted: cancelling passes the order's lines
+      with ``sign=-1`` to take them back out.
+
+    Returns ``(per_product, per_seller)``, keyed like the rollups' ``key_fields``.
+    """
+    per_product = defaultdict(lambda: [0, 0, set()])
+    per_seller = defaultdict(lambda: [0, 0, set()])
+    for order_id, day, seller_id, product_id, quantity, price in lines:
+        for totals in (per_product[(seller_id, product_id, day)], per_seller[(seller_id, day)]):
+            totals[0] += quantity * price
+            totals[1] += quantity
+            totals[2].add(order_id)
+
+    def signed(groups):
+        return {
+            key: (sign * revenue, sign * units, sign * len(orders))
+            for key, (revenue, units, orders) in groups.items()
+        }
+
+    return signed(per_product), signed(per_seller)
+
+def record_sales(lines, sign=1):
+    """Apply ``sales_increments(lines, sign)`` to both rollups."""
+    per_product, per_seller = sales_increments(lines, sign)
+    ProductSalesDaily.add(per_product)
+    SellerSalesDaily.add(per_seller)
@@ -1,22 +1,27 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Order, OrderItem
+from .models import Order, OrderItem, OrderSeller, record_sales
+from products.models import InsufficientStock, Product
 from products.serializers import ProductSerializer
 from auth_app.serializers import UserSerializer
+from farm_to_market.fieldsets import SparseFieldsSerializerMixin
 
 class OrderItemSerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
-    product_id = serializers.PrimaryKeyRelatedField(
-        queryset=Product.objects.filter(is_available=True),
-        write_only=True,
-        source='product'
-    )
+    # Resolved to Product instances by OrderSerializer.validate_items, which
+    # loads every line's product in one query instead of one per line
+    product_id = serializers.IntegerField(write_only=True, source='product')
 
     class Meta:
         model = OrderItem
         fields = ('id', 'product', 'product_id', 'quantity', 'price', 'created_at')
         read_only_fields = ('id', 'price', 'created_at')
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
     customer = UserSerializer(read_only=True)
 
@@ -26,23 +31,63 @@ class OrderSerializer(serializers.ModelSerializer):
                  'items', 'created_at', 'updated_at')
         read_only_fields = ('id', 'total_amount', 'created_at', 'updated_at')
 
+    def validate_items(self, items):
+        if not items:
+            raise serializers.ValidationError('An order needs at least one item.')
+        product_ids = {item['product'] for item in items}
+        products = Product.objects.filter(is_available=True).select_related(
+            'farmer', 'category'
+        ).in_bulk(product_ids)
+        missing = product_ids - set(products)
+        if missing:
+            raise serializers.ValidationError(
+                f"Invalid product ids: {', '.join(map(str, sorted(missing)))}"
+            )
+        for item in items:
+            item['product'] = products[item['product']]
+        return items
+
+    @transaction.atomic
     def create(self, validated_data):
         items_data = validated_data.pop('items')
-        order = Order.objects.create(**validated_data)
-        
-        total_amount = 0
+
+        quantities = Counter()
         for item_data in items_data:
-            product = item_data['product']
-            quantity = item_data['quantity']
-            price = product.price
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                quantity=quantity,
-                price=price
-            )
-            total_amount += price * quantity
-        
-        order.total_amount = total_amount
-        order.save()
-        return order 
\ No newline at end of file
+            quantities[item_data['product'].pk] += item_data['quantity']
+        try:
+            Product.reserve_stock(quantities)
+        except InsufficientStock as exc:
+            names = ', '.join(dict.fromkeys(
+                item_data['product'].name for item_data in items_data
+                if item_data['product'].pk in exc.product_ids
+            ))
+            raise serializers.ValidationError({'items': f'Not enough quantity available for {names}'})
+
+        # Price the order up front so it is inserted once, then add every
+        # line with a single bulk INSERT
+        order = Order.objects.create(
+            total_amount=sum(item['product'].price * item['quantity'] for item in items_data),
+            **validated_data
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=item['product'], quantity=item['quantity'], price=item['product'].price)
+            for item in items_data
+        ])
+        OrderSeller.objects.bulk_create([
+            OrderSeller(seller_id=farmer_id, order=order, status=order.status, created_at=order.created_at)
+            for farmer_id in {item['product'].farmer_id for item in items_data}
+        ])
+        day = timezone.localdate(order.created_at)
+        record_sales([
+            (order.pk, day, item['product'].farmer_id, item['product'].pk, item['quantity'], item['product'].price)
+            for item in items_data
+        ])
+        # The response renders every item with its product; load them in one query
+        prefetch_related_objects([order], Prefetch(
+            'items', queryset=OrderItem.objects.select_related('product__farmer', 'product__category')
+        ))
+        return order
+
+class OrderStatusUpdateSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
@@ -1,25 +1,49 @@
+from datetime import date, timedelta
+
+from django.db.models import Sum
+from django.utils import timezone
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Order
-from .serializers import OrderSerializer
+from .models import Order, ProductSalesDaily, SellerSalesDaily
+from .serializers import OrderSerializer, OrderStatusUpdateSerializer
+from farm_to_market.fieldsets import SparseFieldsetMixin
+from farm_to_market.idempotency import IdempotentCreateMixin
 
 class IsOwnerOrFarmer(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         return obj.customer == request.user or request.user.is_farmer
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(IdempotentCreateMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrFarmer]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['status']
+    ordering = ('-created_at', '-id')
+    sparse_select_related = {'customer': 'customer'}
+    sparse_prefetch_related = {'items': ('items__product__farmer', 'items__product__category')}
+    # Largest batch accepted by PATCH /api/orders/status/
+    bulk_status_max_orders = 500
 
     def get_queryset(self):
         user = self.request.user
         if user.is_farmer:
-            return Order.objects.filter(items__product__farmer=user).distinct()
-        return Order.objects.filter(customer=user)
+            # One order_sellers row per (farmer, order), so no join through
+            # items and products and nothing to de-duplicate. ?status= is
+            # matched on that same row too, to stay on its index
+            lookups = {'sellers__seller': user}
+            if self.request.query_params.get('status'):
+                lookups['sellers__status'] = self.request.query_params['status']
+            queryset = Order.objects.filter(**lookups)
+        else:
+            queryset = Order.objects.filter(customer=user)
+        # Customer and items (with their product's farmer and category) are
+        # nested in every order; load them per page rather than per row
+        queryset = queryset.select_related('customer').prefetch_related(
+            'items__product__farmer', 'items__product__category'
+        )
+        return self.narrow_queryset(queryset)
 
     def perform_create(self, serializer):
         serializer.save(customer=self.request.user)
@@ -29,6 +53,12 @@ class OrderViewSet(viewsets.ModelViewSet):
         order = self.get_object()
         new_status = request.data.get('status')
         
+        if not request.user.is_farmer:
+            return Response(
+                {'error': 'Only farmers can update order status'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
         if not new_status:
             return Response(
                 {'error': 'Status is required'}, 
@@ -41,6 +71,103 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
             
-        order.status = new_status
-        order.save()
-        return Response({'status': 'updated'}) 
\ No newline at end of file
+        errors = Order.transition(request.user, {order.pk: new_status})
+        if errors:
+            return Response({'error': errors[order.pk]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'status': 'updated'})
+
+    @action(detail=False, methods=['patch'], url_path='status')
+    def bulk_update_status(self, request):
+        if not request.user.is_farmer:
+            return Response(
+                {'error': 'Only farmers can update order status'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        updates = request.data.get('updates')
+        if not isinstance(updates, list) or not updates:
+            return Response(
+                {'error': 'updates must be a non-empty list'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(updates) > self.bulk_status_max_orders:
+            return Response(
+                {'error': 'Too many updates in one request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = OrderStatusUpdateSerializer(data=updates, many=True)
+        serializer.is_valid(raise_exception=True)
+        targets = {item['id']: item['status'] for item in serializer.validated_data}
+        if len(targets) != len(updates):
+            return Response(
+                {'error': 'An order is listed more than once'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        failed = Order.transition(request.user, targets)
+        results = [
+            {'id': order_id, 'updated': False, 'error': failed[order_id]} if order_id in failed
+            else {'id': order_id, 'updated': True, 'status': new_status}
+            for order_id, new_status in targets.items()
+        ]
+        return Response(
+            {'results': results},
+            status=status.HTTP_207_MULTI_STATUS if failed else status.HTTP_200_OK
+        )
+
+    @action(detail=False, methods=['get'])
+    def analytics(self, request):
+        if not request.user.is_farmer:
+            return Response(
+                {'error': 'Only farmers can view sales analytics'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        # Inclusive range of order dates, the last 30 days by default
+        params = request.query_params
+        try:
+            end = date.fromisoformat(params['to']) if 'to' in params else timezone.localdate()
+            start = date.fromisoformat(params['from']) if 'from' in params else end - timedelta(days=29)
+        except ValueError:
+            return Response(
+                {'error': 'from and to must be dates in YYYY-MM-DD format'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if start > end:
+            return Response(
+                {'error': 'from must not be after to'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Only the rollups are read, never orders or their items, so a year
+        # of history costs two index range scans
+        days = list(SellerSalesDaily.objects.filter(
+            seller=request.user, day__range=(start, end), order_count__gt=0
+        ).order_by('day').values_list('day', 'revenue', 'units', 'order_count'))
+        products = ProductSalesDaily.objects.filter(
+            seller=request.user, day__range=(start, end)
+        ).values('product_id').annotate(
+            total_revenue=Sum('revenue'), total_units=Sum('units'), orders=Sum('order_count')
+        ).filter(orders__gt=0).order_by('-total_revenue', 'product_id')
+
+        return Response({
+            'from': start,
+            'to': end,
+            'totals': {
+                'revenue': sum(revenue for _, revenue, _, _ in days),
+                'units': sum(units for _, _, units, _ in days),
+                'orders': sum(orders for _, _, _, orders in days),
+            },
+            'days': [
+                {'day': day, 'revenue': revenue, 'units': units, 'orders': orders}
+                for day, revenue, units, orders in days
+            ],
+            'products': [
+                {
+                    'product_id': row['product_id'],
+                    'revenue': row['total_revenue'],
+                    'units': row['total_units'],
+                    'orders': row['orders'],
+                }
+                for row in products
+            ],
+        })
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from products.models import Product
+from reviews.models import Review
+
+RATING_FIELDS = ['rating_sum', 'rating_count'] + [f'rating_{rating}' for rating in range(1, 6)]
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored rating aggregates of every product from its reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        histogram = {
+            f'rating_{rating}': Count('id', filter=Q(rating=rating))
+            for rating in range(1, 6)
+        }
+        totals = Review.objects.values('product_id').annotate(
+            rating_sum=Sum('rating'),
+            rating_count=Count('id'),
+            **histogram
+        ).order_by()
+
+        with transaction.atomic():
+            Product.objects.update(**{field: 0 for field in RATING_FIELDS})
+            products = [
+                Product(pk=row['product_id'], **{field: row[field] for field in RATING_FIELDS})
+                for row in totals
+            ]
+            Product.objects.bulk_update(products, RATING_FIELDS, batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rating aggregates for {len(products)} products'))
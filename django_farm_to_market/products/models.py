@@ -1,12 +1,22 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, When
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
+class InsufficientStock(Exception):
+    """Raised when products cannot cover the quantities asked of them."""
+
+    def __init__(self, product_ids):
+        super().__init__(f'Not enough stock for products {sorted(product_ids)}')
+        self.product_ids = product_ids
+
 class Category(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -33,13 +43,91 @@ class Product(models.Model):
     farmer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='products')
     image = models.ImageField(upload_to='products/', null=True, blank=True)
     is_available = models.BooleanField(default=True)
+    # Denormalized review aggregates, kept in step by Review.save()/delete()
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Category pages filtered or sorted by price, and the default page order
+        indexes = [
+            models.Index(fields=['category', 'price'], name='product_category_price_idx'),
+            models.Index(fields=['created_at', 'id'], name='product_created_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
     @property
     def average_rating(self):
-        from django.db.models import Avg
-        return self.reviews.aggregate(Avg('rating'))['rating__avg'] or 0 
\ No newline at end of file
+        if not self.rating_count:
+            return 0
+        return round(self.rating_sum / self.rating_count, 2)
+
+    @property
+    def rating_histogram(self):
+        return {str(rating): getattr(self, f'rating_{rating}') for rating in range(1, 6)}
+
+    @classmethod
+    def apply_rating_change(cls, product_id, added=None, removed=None):
+        # Relative F() updates so concurrent reviews never lose each other's counts
+        changes = {}
+        sum_delta = (added or 0) - (removed or 0)
+        count_delta = (added is not None) - (removed is not None)
+        if sum_delta:
+            changes['rating_sum'] = F('rating_sum') + sum_delta
+        if count_delta:
+            changes['rating_count'] = F('rating_count') + count_delta
+        if added != removed:
+            if added is not None:
+                changes[f'rating_{added}'] = F(f'rating_{added}') + 1
+            if removed is not None:
+                changes[f'rating_{removed}'] = F(f'rating_{removed}') - 1
+        if changes:
+            cls.objects.filter(pk=product_id).update(updated_at=timezone.now(), **changes)
+
+    @classmethod
+    def reserve_stock(cls, quantities):
+        """Take ``{product_id: quantity}`` out of stock, all or nothing.
+
+        A single ``UPDATE ... SET quantity = quantity - n WHERE quantity >= n``
+        covers every product, so concurrent orders cannot oversell. The row
+        locks it takes belong to the surrounding transaction (``atomic()``
+        only adds a savepoint when there is one), so they are held until that
+        commits. If any product is short nothing changes and
+        ``InsufficientStock`` lists the ones that were.
+        """
+        if not quantities:
+            return
+        requested = Case(
+            *(When(pk=pk, then=quantity) for pk, quantity in quantities.items()),
+            output_field=models.PositiveIntegerField()
+        )
+        with transaction.atomic():
+            updated = cls.objects.filter(pk__in=quantities, quantity__gte=requested).update(
+                quantity=F('quantity') - requested, updated_at=timezone.now()
+            )
+            if updated != len(quantities):
+                available = dict(cls.objects.filter(pk__in=quantities).values_list('pk', 'quantity'))
+                # Raising inside atomic() rolls the partial update back
+                raise InsufficientStock([
+                    pk for pk, quantity in quantities.items() if available.get(pk, 0) < quantity
+                ])
+
+    @classmethod
+    def release_stock(cls, quantities):
+        """Return ``{product_id: quantity}`` to stock, e.g. for cancelled orders."""
+        if quantities:
+            cls.objects.filter(pk__in=quantities).update(
+                quantity=F('quantity') + Case(
+                    *(When(pk=pk, then=quantity) for pk, quantity in quantities.items()),
+                    output_field=models.PositiveIntegerField()
+                ),
+                updated_at=timezone.now()
+            ) 
\ No newline at end of file
@@ -1,13 +1,14 @@
 from rest_framework import serializers
 from .models import Product, Category
 from auth_app.serializers import UserSerializer
+from farm_to_market.fieldsets import SparseFieldsSerializerMixin
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = '__all__'
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     farmer = UserSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
@@ -21,9 +22,19 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = ('id', 'name', 'description', 'price', 'quantity', 'unit',
                  'category', 'category_id', 'farmer', 'image', 
-                 'is_available', 'average_rating', 'created_at', 'updated_at')
-        read_only_fields = ('id', 'created_at', 'updated_at', 'average_rating')
+                 'is_available', 'average_rating', 'rating_count', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'created_at', 'updated_at', 'average_rating', 'rating_count')
 
     def create(self, validated_data):
         validated_data['farmer'] = self.context['request'].user
-        return super().create(validated_data) 
\ No newline at end of file
+        return super().create(validated_data)
+
+class BulkProductUpdateSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    quantity = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, attrs):
+        if 'price' not in attrs and 'quantity' not in attrs:
+            raise serializers.ValidationError('Nothing to update.')
+        return attrs 
\ No newline at end of file
@@ -0,0 +1,103 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from products.models import Category, Product
+
+User = get_user_model()
+
+
+class ProductQueryCountTests(TestCase):
+    """List and retrieve run a fixed number of queries whatever the page size.
+
+    A list is one conditional-GET watermark query plus one query for the rows,
+    and retrieve is the row alone, with farmer and category joined in; an N+1
+    on either relation shows up here as a count that grows with the page.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        farmers = [
+            User.objects.create_user(f'farmer{i}', password=None, is_farmer=True) for i in range(3)
+        ]
+        categories = [Category.objects.create(name=f'Category {i}') for i in range(3)]
+        cls.buyer = User.objects.create_user('buyer', password=None)
+        cls.farmer = farmers[0]
+        Product.objects.bulk_create([
+            Product(
+                name=f'Product {i}', description='Fresh produce from the farm', price=1 + i % 7,
+                quantity=10, category=categories[i % 3], farmer=farmers[i % 3]
+            ) for i in range(40)
+        ])
+        cls.product = Product.objects.first()
+
+    def list_products(self, client, page_size):
+        with self.assertNumQueries(2):
+            response = client.get(reverse('product-list'), {'page_size': page_size})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), page_size)
+
+    def test_list_anonymous(self):
+        for page_size in (5, 30):
+            with self.subTest(page_size=page_size):
+                self.list_products(APIClient(), page_size)
+
+    def test_list_authenticated(self):
+        for user in (self.buyer, self.farmer):
+            client = APIClient()
+            client.force_authenticate(user)
+            for page_size in (5, 30):
+                with self.subTest(user=user.username, page_size=page_size):
+                    self.list_products(client, page_size)
+
+    def test_retrieve(self):
+        with self.assertNumQueries(1):
+            response = APIClient().get(reverse('product-detail', args=[self.product.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['farmer']['id'], self.product.farmer_id)
+
+
+class BulkUpdateTests(TestCase):
+    """A farmer's batch is one conditional UPDATE that skips other farmers' products."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Vegetables')
+        cls.farmer = User.objects.create_user('farmer', password=None, is_farmer=True)
+        other = User.objects.create_user('other', password=None, is_farmer=True)
+        cls.own = [
+            Product.objects.create(
+                name=f'Own {i}', description='Fresh', price=1, quantity=10, category=category, farmer=cls.farmer
+            ) for i in range(2)
+        ]
+        cls.foreign = Product.objects.create(
+            name='Foreign', description='Fresh', price=1, quantity=10, category=category, farmer=other
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.farmer)
+
+    def bulk(self, updates):
+        return self.client.patch(reverse('product-bulk-update'), {'updates': updates}, format='json')
+
+    def test_owned_products_in_one_update(self):
+        updates = [{'id': self.own[0].pk, 'price': '2.50'}, {'id': self.own[1].pk, 'quantity': 3}]
+        # SELECT ... FOR UPDATE of the farmer's rows and one UPDATE, inside
+        # a savepoint because the test itself runs in a transaction
+        with self.assertNumQueries(4):
+            response = self.bulk(updates)
+        self.assertEqual(response.data, {'updated': sorted(p.pk for p in self.own), 'not_updated': []})
+        self.own[0].refresh_from_db()
+        self.own[1].refresh_from_db()
+        self.assertEqual(str(self.own[0].price), '2.50')
+        self.assertEqual(self.own[1].quantity, 3)
+
+    def test_other_farmers_products_are_left_alone(self):
+        response = self.bulk([
+            {'id': self.own[0].pk, 'price': '4.00'}, {'id': self.foreign.pk, 'price': '4.00'}, {'id': 999, 'quantity': 1}
+        ])
+        self.assertEqual(response.data, {'updated': [self.own[0].pk], 'not_updated': [self.foreign.pk, 999]})
+        self.foreign.refresh_from_db()
+        self.assertEqual(str(self.foreign.price), '1.00')
@@ -1,9 +1,13 @@
-from rest_framework import viewsets, permissions, filters
+from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import models, transaction
+from django.utils import timezone
 from .models import Product, Category
-from .serializers import ProductSerializer, CategorySerializer
+from .serializers import ProductSerializer, CategorySerializer, BulkProductUpdateSerializer
+from farm_to_market.conditional import ConditionalGetMixin
+from farm_to_market.fieldsets import SparseFieldsetMixin
 
 class IsFarmerOrReadOnly(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -15,27 +19,33 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
-        return obj.farmer == request.user
+        return obj.farmer_id == request.user.pk
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     filter_backends = [filters.SearchFilter]
     search_fields = ['name', 'description']
+    ordering = ('name', 'id')
 
-class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all()
+class ProductViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
+    # The serializer nests farmer and category; join them into the same query.
+    # average_rating and rating_count come from columns on the product row.
+    queryset = Product.objects.select_related('farmer', 'category')
     serializer_class = ProductSerializer
     permission_classes = [IsFarmerOrReadOnly, IsOwnerOrReadOnly]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['category', 'is_available', 'farmer']
     search_fields = ['name', 'description']
     ordering_fields = ['price', 'created_at', 'name']
+    ordering = ('-created_at', '-id')
+    sparse_select_related = {'farmer': 'farmer', 'category': 'category'}
+    sparse_columns = {'average_rating': ('rating_sum', 'rating_count')}
 
     def get_queryset(self):
         queryset = super().get_queryset()
-        if not self.request.user.is_farmer:
+        if not getattr(self.request.user, 'is_farmer', False):
             return queryset.filter(is_available=True)
         return queryset
 
@@ -44,4 +54,49 @@ class ProductViewSet(viewsets.ModelViewSet):
         product = self.get_object()
         product.is_available = not product.is_available
         product.save()
-        return Response({'status': 'availability toggled'}) 
\ No newline at end of file
+        return Response({'status': 'availability toggled'})
+
+    @action(detail=False, methods=['patch'], url_path='bulk')
+    def bulk_update(self, request):
+        updates = request.data.get('updates')
+        if not isinstance(updates, list) or not updates:
+            return Response(
+                {'error': 'updates must be a non-empty list'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = BulkProductUpdateSerializer(data=updates, many=True)
+        serializer.is_valid(raise_exception=True)
+        items = {item['id']: item for item in serializer.validated_data}
+
+        # One UPDATE with a CASE per column, over the farmer's own products only
+        now = timezone.now()
+        changes = {'updated_at': now}
+        prices = [
+            models.When(pk=pk, then=models.Value(item['price']))
+            for pk, item in items.items() if 'price' in item
+        ]
+        quantities = [
+            models.When(pk=pk, then=models.Value(item['quantity']))
+            for pk, item in items.items() if 'quantity' in item
+        ]
+        if prices:
+            changes['price'] = models.Case(
+                *prices, default=models.F('price'),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2)
+            )
+        if quantities:
+            changes['quantity'] = models.Case(
+                *quantities, default=models.F('quantity'), output_field=models.PositiveIntegerField()
+            )
+
+        # Lock the farmer's own rows first so the ids reported are exactly the
+        # rows the UPDATE wrote, whatever else commits meanwhile
+        with transaction.atomic():
+            owned = Product.objects.filter(pk__in=items, farmer=request.user)
+            updated = sorted(owned.select_for_update().values_list('pk', flat=True))
+            Product.objects.filter(pk__in=updated).update(**changes)
+
+        return Response({
+            'updated': updated,
+            'not_updated': sorted(set(items) - set(updated))
+        }) 
\ No newline at end of file
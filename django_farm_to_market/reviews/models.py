@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from products.models import Product
 
@@ -15,6 +15,37 @@ class Review(models.Model):
     class Meta:
         unique_together = ('product', 'user')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['product', 'created_at'], name='review_product_created_idx'),
+        ]
 
     def __str__(self):
-        return f"Review by {self.user.username} for {self.product.name}" 
\ No newline at end of file
+        return f"Review by {self.user.username} for {self.product.name}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Remember the stored rating so save() can move it between buckets
+        instance = super().from_db(db, field_names, values)
+        if 'product_id' in field_names and 'rating' in field_names:
+            instance._stored = (instance.product_id, instance.rating)
+        return instance
+
+    def save(self, *args, **kwargs):
+        stored = getattr(self, '_stored', None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if stored is None:
+                Product.apply_rating_change(self.product_id, added=self.rating)
+            elif stored[0] != self.product_id:
+                Product.apply_rating_change(stored[0], removed=stored[1])
+                Product.apply_rating_change(self.product_id, added=self.rating)
+            elif stored[1] != self.rating:
+                Product.apply_rating_change(self.product_id, added=self.rating, removed=stored[1])
+        self._stored = (self.product_id, self.rating)
+
+    def delete(self, *args, **kwargs):
+        stored = getattr(self, '_stored', (self.product_id, self.rating))
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            Product.apply_rating_change(stored[0], removed=stored[1])
+        return result 
\ No newline at end of file
@@ -17,6 +17,7 @@ class ReviewViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['product', 'rating']
+    ordering = ('-created_at', '-id')
 
     def get_queryset(self):
         return Review.objects.all()
@@ -45,6 +46,6 @@ class ReviewViewSet(viewsets.ModelViewSet):
                 {'error': 'product_id is required'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
-        reviews = Review.objects.filter(product_id=product_id)
+        reviews = self.paginate_queryset(Review.objects.filter(product_id=product_id))
         serializer = self.get_serializer(reviews, many=True)
-        return Response(serializer.data) 
\ No newline at end of file
+        return self.get_paginated_response(serializer.data) 
\ No newline at end of file
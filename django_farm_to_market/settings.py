@@ -32,6 +32,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'farm_to_market.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -93,8 +94,44 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # Every list is paginated by an opaque cursor rather than page numbers
+    'DEFAULT_PAGINATION_CLASS': 'farm_to_market.pagination.CursorPage',
+    'PAGE_SIZE': 20,
 }
 
+# Largest page_size a client may request from a list endpoint
+API_MAX_PAGE_SIZE = 100
+
+# Response compression (farm_to_market.compression.CompressionMiddleware):
+# bodies shorter than COMPRESS_MIN_SIZE bytes are sent as they are
+COMPRESS_MIN_SIZE = 500
+COMPRESS_CONTENT_TYPES = [
+    'application/json',
+    'application/javascript',
+    'image/svg+xml',
+    'text/css',
+    'text/csv',
+    'text/html',
+    'text/javascript',
+    'text/plain',
+]
+
+# Idempotency-Key responses (farm_to_market.idempotency) live in a database
+# cache table so every worker sees the same keys; create it with
+# `python manage.py createcachetable`
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'idempotency': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'idempotency_keys',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+IDEMPOTENCY_CACHE = 'idempotency'
+IDEMPOTENCY_TTL = 24 * 3600
+
 # JWT settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
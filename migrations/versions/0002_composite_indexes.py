@@ -0,0 +1,43 @@
+"""indexes for the catalog, order and review queries
+
+Keyset pagination and the category, seller, buyer and review filters read
+these instead of scanning their tables. On a large PostgreSQL table consider
+creating them by hand with CREATE INDEX CONCURRENTLY before upgrading; the
+IF NOT EXISTS checks below then skip them.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 12:10:02.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_products_created_at_id', 'products', ['created_at', 'id']),
+    ('ix_products_price_id', 'products', ['price', 'id']),
+    ('ix_products_category_price', 'products', ['category', 'price']),
+    ('ix_products_seller_id', 'products', ['seller_id']),
+    ('ix_orders_buyer_id_status_created_at', 'orders', ['buyer_id', 'status', 'created_at']),
+    ('ix_order_items_order_id', 'order_items', ['order_id']),
+    ('ix_order_items_product_id', 'order_items', ['product_id']),
+    ('ix_reviews_product_id_created_at', 'reviews', ['product_id', 'created_at']),
+    ('ix_reviews_user_id_product_id', 'reviews', ['user_id', 'product_id']),
+]
+
+
+def upgrade():
+    # `flask create-indexes` may already have built some of them
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
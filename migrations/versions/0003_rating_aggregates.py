@@ -0,0 +1,33 @@
+"""rating aggregates on products
+
+Stored review counts and sums per product, so ratings are not averaged on
+every read. Existing products start at zero; fill them from the reviews with
+``flask rebuild-rating-aggregates``.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 12:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+COLUMNS = ['rating_sum', 'rating_count', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5']
+
+
+def upgrade():
+    for name in COLUMNS:
+        op.add_column('products', sa.Column(name, sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        for name in reversed(COLUMNS):
+            batch_op.drop_column(name)
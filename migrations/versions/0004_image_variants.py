@@ -0,0 +1,28 @@
+"""image variants
+
+Products gain ``image_variants``, filled by ``flask generate-image-variants``
+for existing uploads.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 12:10:01.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('products', sa.Column('image_variants', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_column('image_variants')
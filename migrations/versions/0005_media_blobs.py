@@ -0,0 +1,39 @@
+"""content-addressed media
+
+``media_blobs`` counts references to each stored file.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 12:10:02.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('media_blobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('digest', sa.String(length=64), nullable=False),
+    sa.Column('path', sa.String(length=200), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('digest'),
+    sa.UniqueConstraint('path')
+    )
+    op.create_index('ix_media_blobs_ref_count_updated_at', 'media_blobs', ['ref_count', 'updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_media_blobs_ref_count_updated_at', table_name='media_blobs')
+    op.drop_table('media_blobs')
@@ -0,0 +1,40 @@
+"""order_sellers
+
+One row per farmer with products in an order, for farmer inboxes and
+permission checks. Fill it for existing orders with
+``flask backfill-order-sellers``.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 12:10:03.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('order_sellers',
+    sa.Column('seller_id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+    sa.ForeignKeyConstraint(['seller_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('seller_id', 'order_id')
+    )
+    op.create_index('ix_order_sellers_seller_id_created_at', 'order_sellers', ['seller_id', 'created_at', 'order_id'], unique=False)
+    op.create_index('ix_order_sellers_seller_id_status_created_at', 'order_sellers', ['seller_id', 'status', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_order_sellers_seller_id_status_created_at', table_name='order_sellers')
+    op.drop_index('ix_order_sellers_seller_id_created_at', table_name='order_sellers')
+    op.drop_table('order_sellers')
@@ -0,0 +1,42 @@
+"""transactional outbox
+
+Events recorded with order and review changes, and one delivery cursor per
+consumer.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 12:10:04.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('outbox_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('topic', sa.String(length=50), nullable=False),
+    sa.Column('aggregate_id', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sqlite_autoincrement=True
+    )
+    op.create_table('outbox_cursors',
+    sa.Column('consumer', sa.String(length=100), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('consumer')
+    )
+
+
+def downgrade():
+    op.drop_table('outbox_cursors')
+    op.drop_table('outbox_events')
@@ -0,0 +1,49 @@
+"""daily sales rollups
+
+Per-product and per-seller sales by day for farmer analytics. Fill them
+from existing orders with ``flask rebuild-sales-rollups``.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 12:10:05.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('product_sales_daily',
+    sa.Column('seller_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('units', sa.Float(), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['seller_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('seller_id', 'product_id', 'day')
+    )
+    op.create_index('ix_product_sales_daily_seller_id_day', 'product_sales_daily', ['seller_id', 'day'], unique=False)
+    op.create_table('seller_sales_daily',
+    sa.Column('seller_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('units', sa.Float(), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['seller_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('seller_id', 'day')
+    )
+
+
+def downgrade():
+    op.drop_table('seller_sales_daily')
+    op.drop_index('ix_product_sales_daily_seller_id_day', table_name='product_sales_daily')
+    op.drop_table('product_sales_daily')
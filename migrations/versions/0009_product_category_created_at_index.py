@@ -0,0 +1,30 @@
+"""index for the newest products in a category
+
+A category search in the default newest order had to walk the whole
+(created_at, id) index; (category, created_at, id) seeks straight to it.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 13:05:12.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # A database built with db.create_all() from the current models already has it
+    op.create_index(
+        'ix_products_category_created_at_id', 'products', ['category', 'created_at', 'id'],
+        unique=False, if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_index('ix_products_category_created_at_id', table_name='products')
@@ -0,0 +1,18 @@
+from app import db
+from datetime import datetime
+
+class MediaBlob(db.Model):
+    __tablename__ = 'media_blobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    digest = db.Column(db.String(64), unique=True, nullable=False)  # SHA-256 of the file
+    path = db.Column(db.String(200), unique=True, nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Garbage collection looks for unreferenced blobs by age
+    __table_args__ = (
+        db.Index('ix_media_blobs_ref_count_updated_at', 'ref_count', 'updated_at'),
+    )
@@ -15,6 +15,25 @@ class Order(db.Model):
     # Relationships
     items = db.relationship('OrderItem', backref='order', lazy=True)
     
+    # Status -> statuses it may move to; delivered and cancelled are final
+    TRANSITIONS = {
+        'pending': {'confirmed', 'cancelled'},
+        'confirmed': {'shipped', 'cancelled'},
+        'shipped': {'delivered'},
+        'delivered': set(),
+        'cancelled': set(),
+    }
+    
+    # A buyer's orders, optionally by status, newest first
+    __table_args__ = (
+        db.Index('ix_orders_buyer_id_status_created_at', 'buyer_id', 'status', 'created_at'),
+    )
+    
+    @classmethod
+    def sources_of(cls, status):
+        """The statuses an order may be in to move to ``status``."""
+        return sorted(source for source, targets in cls.TRANSITIONS.items() if status in targets)
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -22,8 +41,8 @@ class Order(db.Model):
             'status': self.status,
             'total_amount': self.total_amount,
             'shipping_address': self.shipping_address,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat(),
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
             'items': [item.to_dict() for item in self.items]
         }
 
@@ -36,6 +55,12 @@ class OrderItem(db.Model):
     quantity = db.Column(db.Float, nullable=False)
     price_at_time = db.Column(db.Float, nullable=False)  # Price when ordered
     
+    # Loading an order's items, and finding the orders of a farmer's products
+    __table_args__ = (
+        db.Index('ix_order_items_order_id', 'order_id'),
+        db.Index('ix_order_items_product_id', 'product_id'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -43,4 +68,60 @@ class OrderItem(db.Model):
             'product_id': self.product_id,
             'quantity': self.quantity,
             'price_at_time': self.price_at_time
-        } 
\ No newline at end of file
+        }
+
+class OrderSeller(db.Model):
+    """One row per farmer with products in an order, written with the order.
+
+    Farmer inboxes and permission checks read this instead of joining orders
+    to their items and products and de-duplicating. ``status`` and
+    ``created_at`` are copies of the order's, so a farmer's orders by status
+    and date come straight off an index.
+    """
+    __tablename__ = 'order_sellers'
+    
+    seller_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), primary_key=True)
+    status = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    
+    # A farmer's inbox newest first, optionally narrowed to one status
+    __table_args__ = (
+        db.Index('ix_order_sellers_seller_id_created_at', 'seller_id', 'created_at', 'order_id'),
+        db.Index('ix_order_sellers_seller_id_status_created_at', 'seller_id', 'status', 'created_at'),
+    )
+    
+    @classmethod
+    def is_seller(cls, seller_id, order_id):
+        return db.session.get(cls, (seller_id, order_id)) is not None
+
+class ProductSalesDaily(db.Model):
+    """Revenue, units and orders of one farmer's product on one day.
+
+    Kept up to date by ``utils.rollups.apply_sales`` when orders are placed
+    or cancelled, so sales statistics never read orders or their items.
+    Cancelled orders are not counted; days are the UTC date of the order.
+    """
+    __tablename__ = 'product_sales_daily'
+    
+    seller_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    units = db.Column(db.Float, nullable=False, default=0)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    # A farmer's products over a date range
+    __table_args__ = (
+        db.Index('ix_product_sales_daily_seller_id_day', 'seller_id', 'day'),
+    )
+
+class SellerSalesDaily(db.Model):
+    """A farmer's sales on one day, with each order counted once."""
+    __tablename__ = 'seller_sales_daily'
+    
+    seller_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    units = db.Column(db.Float, nullable=False, default=0)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,21 @@
+from app import db
+from datetime import datetime
+
+class OutboxEvent(db.Model):
+    __tablename__ = 'outbox_events'
+    # AUTOINCREMENT: without it SQLite reuses ids once pruning empties the
+    # table, and a reused id falls behind every consumer's cursor
+    __table_args__ = {'sqlite_autoincrement': True}
+    
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(50), nullable=False)  # e.g. order.created, review.deleted
+    aggregate_id = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class OutboxCursor(db.Model):
+    __tablename__ = 'outbox_cursors'
+    
+    consumer = db.Column(db.String(100), primary_key=True)
+    position = db.Column(db.Integer, nullable=False, default=0)  # id of the last delivered event
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
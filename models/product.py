@@ -1,5 +1,7 @@
 from app import db
 from datetime import datetime
+from utils.fieldsets import Field, Fieldset, column, timestamp
+from utils.search import ProductSearchIndex
 
 class Product(db.Model):
     __tablename__ = 'products'
@@ -12,25 +14,67 @@ class Product(db.Model):
     unit = db.Column(db.String(20), nullable=False)  # kg, piece, etc.
     category = db.Column(db.String(50))
     image_url = db.Column(db.String(200))
+    # {format: {width: url}} of resized copies, filled in by utils.images
+    image_variants = db.Column(db.JSON)
     seller_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Denormalized review aggregates, maintained by utils.ratings
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_1 = db.Column(db.Integer, nullable=False, default=0)
+    rating_2 = db.Column(db.Integer, nullable=False, default=0)
+    rating_3 = db.Column(db.Integer, nullable=False, default=0)
+    rating_4 = db.Column(db.Integer, nullable=False, default=0)
+    rating_5 = db.Column(db.Integer, nullable=False, default=0)
+    
     # Relationships
     orders = db.relationship('OrderItem', backref='product', lazy=True)
     reviews = db.relationship('Review', backref='product', lazy=True)
     
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'description': self.description,
-            'price': self.price,
-            'quantity': self.quantity,
-            'unit': self.unit,
-            'category': self.category,
-            'image_url': self.image_url,
-            'seller_id': self.seller_id,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
-        } 
\ No newline at end of file
+    # Keyset pagination indexes for the catalog sort orders, plus the
+    # category filter in price and newest order, and the seller's
+    # own listings
+    __table_args__ = (
+        db.Index('ix_products_created_at_id', 'created_at', 'id'),
+        db.Index('ix_products_price_id', 'price', 'id'),
+        db.Index('ix_products_category_price', 'category', 'price'),
+        db.Index('ix_products_category_created_at_id', 'category', 'created_at', 'id'),
+        db.Index('ix_products_seller_id', 'seller_id'),
+    )
+    
+    @property
+    def average_rating(self):
+        if not self.rating_count:
+            return 0
+        return round(self.rating_sum / self.rating_count, 2)
+    
+    @property
+    def rating_histogram(self):
+        return {str(rating): getattr(self, f'rating_{rating}') for rating in range(1, 6)}
+    
+    def to_dict(self, fields=None):
+        return PRODUCT_FIELDS.render(self, fields)
+
+# Keys of Product.to_dict(); list endpoints let clients pick them with ?fields=
+PRODUCT_FIELDS = Fieldset(
+    id=column(Product.id),
+    name=column(Product.name),
+    description=column(Product.description),
+    price=column(Product.price),
+    quantity=column(Product.quantity),
+    unit=column(Product.unit),
+    category=column(Product.category),
+    image_url=column(Product.image_url),
+    image_variants=column(Product.image_variants),
+    seller_id=column(Product.seller_id),
+    average_rating=Field(lambda product: product.average_rating, Product.rating_sum, Product.rating_count),
+    rating_count=column(Product.rating_count),
+    created_at=timestamp(Product.created_at),
+    updated_at=timestamp(Product.updated_at),
+)
+
+# Full-text index over product names and descriptions, synced on every flush
+product_search = ProductSearchIndex(db, Product)
+product_search.register()
@@ -12,6 +12,12 @@ class Review(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # A product's reviews by date, and the one-review-per-buyer check
+    __table_args__ = (
+        db.Index('ix_reviews_product_id_created_at', 'product_id', 'created_at'),
+        db.Index('ix_reviews_user_id_product_id', 'user_id', 'product_id'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -19,6 +25,6 @@ class Review(db.Model):
             'product_id': self.product_id,
             'rating': self.rating,
             'comment': self.comment,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
         } 
\ No newline at end of file
@@ -1,39 +1,63 @@
-from flask import Blueprint, request, jsonify
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models.order import Order, OrderItem
+from models.order import Order, OrderItem, OrderSeller, ProductSalesDaily, SellerSalesDaily
 from models.product import Product
 from models.user import User
 from app import db
+from sqlalchemy import case, exists, func, insert, select, update
+from sqlalchemy.orm import selectinload
+from utils.idempotency import idempotent
+from utils.order_sellers import record_order_sellers
+from utils.outbox import outbox
+from utils.query_budget import query_budget
+from utils.rollups import apply_sales, sales_lines, sales_statements
+from utils.stock import InsufficientStock, order_quantities, release_stock, reserve_stock
 
 orders_bp = Blueprint('orders', __name__)
 
 @orders_bp.route('/', methods=['GET'])
 @jwt_required()
+@query_budget(3)
 def get_orders():
     user_id = get_jwt_identity()
     user = User.query.get(user_id)
     
+    status = request.args.get('status')
+    
     if user.role == 'farmer':
-        # Get orders for products sold by the farmer
-        orders = Order.query.join(OrderItem).join(Product).filter(
-            Product.seller_id == user_id
-        ).distinct().all()
+        # Orders with the farmer's products, read off the order_sellers index
+        query = Order.query.join(OrderSeller, OrderSeller.order_id == Order.id).filter(
+            OrderSeller.seller_id == user_id
+        )
+        if status:
+            query = query.filter(OrderSeller.status == status)
+        query = query.order_by(OrderSeller.created_at.desc(), OrderSeller.order_id.desc())
     else:
         # Get orders made by the buyer
-        orders = Order.query.filter_by(buyer_id=user_id).all()
+        query = Order.query.filter_by(buyer_id=user_id)
+        if status:
+            query = query.filter(Order.status == status)
+        query = query.order_by(Order.created_at.desc(), Order.id.desc())
+    
+    # Load every order's items in one extra SELECT instead of one per order
+    orders = query.options(selectinload(Order.items)).all()
     
     return jsonify([order.to_dict() for order in orders]), 200
 
 @orders_bp.route('/<int:order_id>', methods=['GET'])
 @jwt_required()
+@query_budget(4)
 def get_order(order_id):
     user_id = get_jwt_identity()
     user = User.query.get(user_id)
-    order = Order.query.get_or_404(order_id)
+    order = Order.query.options(selectinload(Order.items)).get_or_404(order_id)
     
     # Check if user has permission to view this order
     if user.role == 'farmer':
-        if not any(item.product.seller_id == user_id for item in order.items):
+        if not OrderSeller.is_seller(user_id, order.id):
             return jsonify({'error': 'Unauthorized to view this order'}), 403
     elif order.buyer_id != user_id:
         return jsonify({'error': 'Unauthorized to view this order'}), 403
@@ -42,6 +66,8 @@ def get_order(order_id):
 
 @orders_bp.route('/', methods=['POST'])
 @jwt_required()
+@idempotent
+@query_budget(lambda: 11 + sales_statements(db))
 def create_order():
     user_id = get_jwt_identity()
     user = User.query.get(user_id)
@@ -50,36 +76,82 @@ def create_order():
         return jsonify({'error': 'Only buyers can create orders'}), 403
     
     data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    items = data.get('items') or []
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'An order needs at least one item'}), 400
+    if not isinstance(data.get('shipping_address'), str) or not data['shipping_address'].strip():
+        return jsonify({'error': 'A shipping address is required'}), 400
+    if not all(isinstance(item, dict) for item in items):
+        return jsonify({'error': 'Every item must be an object'}), 400
+    if not all(
+        isinstance(item.get('product_id'), int) and not isinstance(item['product_id'], bool) for item in items
+    ):
+        return jsonify({'error': 'Every item needs an integer product_id'}), 400
+    if not all(
+        isinstance(item.get('quantity'), (int, float)) and not isinstance(item['quantity'], bool)
+        and item['quantity'] > 0 for item in items
+    ):
+        return jsonify({'error': 'Item quantities must be positive numbers'}), 400
+    
+    # Every product in one IN query instead of a lookup per line
+    product_ids = {item['product_id'] for item in items}
+    products = {
+        product.id: product
+        for product in Product.query.filter(Product.id.in_(product_ids))
+    }
+    missing = product_ids - set(products)
+    if missing:
+        return jsonify({'error': f'Products not found: {sorted(missing)}'}), 404
     
-    # Create order
+    # Decrement stock for every item in one conditional UPDATE; if any product
+    # is short nothing is taken and the order is not created
+    try:
+        reserve_stock(db, Product, order_quantities(
+            (item['product_id'], item['quantity']) for item in items
+        ))
+    except InsufficientStock as exc:
+        names = ', '.join(products[product_id].name for product_id in exc.product_ids)
+        db.session.rollback()
+        return jsonify({'error': f'Not enough quantity available for {names}'}), 400
+    
+    # The total is known before the order row is written, so it is inserted once
+    # and its items follow in a single multi-row INSERT
     order = Order(
         buyer_id=user_id,
         shipping_address=data['shipping_address'],
-        total_amount=0  # Will be calculated
+        total_amount=sum(products[item['product_id']].price * item['quantity'] for item in items)
     )
-    
-    total_amount = 0
-    
-    # Create order items
-    for item_data in data['items']:
-        product = Product.query.get_or_404(item_data['product_id'])
-        
-        if product.quantity < item_data['quantity']:
-            return jsonify({'error': f'Not enough quantity available for {product.name}'}), 400
-        
-        order_item = OrderItem(
-            product_id=product.id,
-            quantity=item_data['quantity'],
-            price_at_time=product.price
-        )
-        
-        total_amount += product.price * item_data['quantity']
-        product.quantity -= item_data['quantity']
-        
-        order.items.append(order_item)
-    
-    order.total_amount = total_amount
     db.session.add(order)
+    db.session.flush()
+    sellers = {products[item['product_id']].seller_id for item in items}
+    record_order_sellers(db, OrderSeller, order, sellers)
+    order_items = [{
+        'order_id': order.id,
+        'product_id': item['product_id'],
+        'quantity': item['quantity'],
+        'price_at_time': products[item['product_id']].price
+    } for item in items]
+    db.session.execute(insert(OrderItem), order_items)
+    apply_sales(db, ProductSalesDaily, SellerSalesDaily, [
+        (order.id, order.created_at.date(), products[item['product_id']].seller_id,
+         item['product_id'], item['quantity'], item['price_at_time'])
+        for item in order_items
+    ])
+    # Written in the same transaction, so the event exists exactly when the order does
+    outbox().record('order.created', order.id, {
+        'order_id': order.id,
+        'buyer_id': order.buyer_id,
+        'seller_ids': sorted(sellers),
+        'status': order.status,
+        'total_amount': order.total_amount,
+        'created_at': order.created_at,
+        'items': [
+            {key: item[key] for key in ('product_id', 'quantity', 'price_at_time')}
+            for item in order_items
+        ]
+    })
     db.session.commit()
     
     return jsonify({
@@ -87,8 +159,89 @@ def create_order():
         'order': order.to_dict()
     }), 201
 
+def transition_orders(seller_id, targets):
+    """Move ``{order_id: status}`` along Order.TRANSITIONS for one seller's orders.
+    
+    Each target status is one ``UPDATE ... WHERE id IN (...) AND status IN
+    (allowed sources) AND <seller owns the order>``, so ownership and the
+    transition graph are checked by the same statement that applies them and
+    a concurrent change cannot slip in between. Cancelled orders return their
+    stock with one UPDATE and are taken out of the sales rollups, and every
+    move is recorded in the outbox.
+    Returns ``{order_id: error}`` for the orders that did not move; the
+    caller commits.
+    """
+    owned = exists().where(OrderSeller.order_id == Order.id, OrderSeller.seller_id == seller_id)
+    by_status = defaultdict(list)
+    for order_id, status in targets.items():
+        by_status[status].append(order_id)
+    
+    moved = {}
+    for status, order_ids in by_status.items():
+        sources = Order.sources_of(status)
+        if not sources:
+            continue
+        result = db.session.execute(
+            update(Order)
+            .where(Order.id.in_(order_ids), Order.status.in_(sources), owned)
+            .values(status=status)
+            .returning(Order.id),
+            execution_options={'synchronize_session': False}
+        )
+        moved.update((order_id, status) for order_id in result.scalars())
+    
+    outbox().record_many('order.status_changed', [
+        (order_id, {'order_id': order_id, 'seller_id': seller_id, 'status': status})
+        for order_id, status in moved.items()
+    ])
+    
+    if moved:
+        db.session.execute(
+            update(OrderSeller)
+            .where(OrderSeller.order_id.in_(moved))
+            .values(status=case(moved, value=OrderSeller.order_id)),
+            execution_options={'synchronize_session': False}
+        )
+    
+    # Cancelled orders give their stock back and leave the sales rollups
+    cancelled = [order_id for order_id, status in moved.items() if status == 'cancelled']
+    if cancelled:
+        lines = db.session.execute(
+            sales_lines(Order, OrderItem, Product).where(OrderItem.order_id.in_(cancelled))
+        ).all()
+        release_stock(db, Product, order_quantities(
+            (product_id, quantity) for _, _, _, product_id, quantity, _ in lines
+        ))
+        apply_sales(db, ProductSalesDaily, SellerSalesDaily, lines, sign=-1)
+    
+    # Explain the orders that did not move in one more query
+    errors = {}
+    rejected = set(targets) - set(moved)
+    if rejected:
+        current = {
+            order_id: (status, is_owned)
+            for order_id, status, is_owned in db.session.execute(
+                select(Order.id, Order.status, owned).where(Order.id.in_(rejected))
+            )
+        }
+        for order_id in rejected:
+            if order_id not in current:
+                errors[order_id] = 'Order not found'
+            elif not current[order_id][1]:
+                errors[order_id] = 'Unauthorized to update this order'
+            else:
+                errors[order_id] = f'Cannot change a {current[order_id][0]} order to {targets[order_id]}'
+    
+    # Objects already in the session reload the new status on next access
+    for order_id in moved:
+        order = db.session.identity_map.get(db.session.identity_key(Order, order_id))
+        if order is not None:
+            db.session.expire(order, ['status', 'updated_at'])
+    return errors
+
 @orders_bp.route('/<int:order_id>/status', methods=['PUT'])
 @jwt_required()
+@query_budget(lambda: 10 + sales_statements(db))
 def update_order_status(order_id):
     user_id = get_jwt_identity()
     user = User.query.get(user_id)
@@ -98,19 +251,120 @@ def update_order_status(order_id):
         return jsonify({'error': 'Only farmers can update order status'}), 403
     
     # Check if user is the seller of any product in the order
-    if not any(item.product.seller_id == user_id for item in order.items):
+    if not OrderSeller.is_seller(user_id, order.id):
         return jsonify({'error': 'Unauthorized to update this order'}), 403
     
     data = request.get_json()
-    new_status = data['status']
+    new_status = data.get('status') if isinstance(data, dict) else None
     
-    if new_status not in ['pending', 'confirmed', 'shipped', 'delivered', 'cancelled']:
+    if not isinstance(new_status, str) or new_status not in Order.TRANSITIONS:
         return jsonify({'error': 'Invalid status'}), 400
     
-    order.status = new_status
+    errors = transition_orders(user_id, {order.id: new_status})
+    if errors:
+        db.session.rollback()
+        return jsonify({'error': errors[order.id]}), 400
     db.session.commit()
     
     return jsonify({
         'message': 'Order status updated successfully',
         'order': order.to_dict()
-    }), 200 
\ No newline at end of file
+    }), 200
+
+@orders_bp.route('/status', methods=['PATCH'])
+@jwt_required()
+@query_budget(lambda: 10 + sales_statements(db))
+def bulk_update_order_status():
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    
+    if user.role != 'farmer':
+        return jsonify({'error': 'Only farmers can update order status'}), 403
+    
+    data = request.get_json()
+    updates = data.get('updates') if isinstance(data, dict) else None
+    if not isinstance(updates, list) or not updates:
+        return jsonify({'error': 'updates must be a non-empty list'}), 400
+    if len(updates) > current_app.config['BULK_STATUS_MAX_ORDERS']:
+        return jsonify({'error': 'Too many updates in one request'}), 400
+    
+    targets = {}
+    errors = []
+    for index, item in enumerate(updates):
+        if not isinstance(item, dict) or not isinstance(item.get('id'), int) or isinstance(item['id'], bool):
+            errors.append({'index': index, 'error': 'Each update needs an integer id'})
+        elif not isinstance(item.get('status'), str) or item['status'] not in Order.TRANSITIONS:
+            errors.append({'index': index, 'error': 'Invalid status'})
+        elif item['id'] in targets:
+            errors.append({'index': index, 'error': 'Order listed more than once'})
+        else:
+            targets[item['id']] = item['status']
+    
+    if errors:
+        return jsonify({'error': 'Invalid updates', 'details': errors}), 400
+    
+    failed = transition_orders(user_id, targets)
+    db.session.commit()
+    
+    results = [
+        {'id': order_id, 'updated': False, 'error': failed[order_id]} if order_id in failed
+        else {'id': order_id, 'updated': True, 'status': status}
+        for order_id, status in targets.items()
+    ]
+    return jsonify({
+        'message': 'Order statuses updated',
+        'results': results
+    }), 207 if failed else 200
+
+def sales_totals(revenue, units, order_count):
+    # Rollups of floats drift in the last digits as orders are added and cancelled
+    return {'revenue': round(revenue, 2), 'units': round(units, 3), 'orders': order_count}
+
+@orders_bp.route('/analytics', methods=['GET'])
+@jwt_required()
+@query_budget(3)
+def get_sales_analytics():
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    
+    if user.role != 'farmer':
+        return jsonify({'error': 'Only farmers can view sales analytics'}), 403
+    
+    # Inclusive range of order dates (UTC), the last 30 days by default
+    try:
+        end = date.fromisoformat(request.args['to']) if 'to' in request.args else datetime.utcnow().date()
+        start = date.fromisoformat(request.args['from']) if 'from' in request.args else end - timedelta(days=29)
+    except ValueError:
+        return jsonify({'error': 'from and to must be dates in YYYY-MM-DD format'}), 400
+    if start > end:
+        return jsonify({'error': 'from must not be after to'}), 400
+    
+    # Both reads are range scans of the rollup indexes; orders and their
+    # items are never touched, so a year costs the same as a week
+    days = db.session.execute(
+        select(SellerSalesDaily.day, SellerSalesDaily.revenue, SellerSalesDaily.units, SellerSalesDaily.order_count)
+        .where(
+            SellerSalesDaily.seller_id == user_id,
+            SellerSalesDaily.day.between(start, end),
+            SellerSalesDaily.order_count > 0
+        )
+        .order_by(SellerSalesDaily.day)
+    ).all()
+    revenue = func.sum(ProductSalesDaily.revenue)
+    products = db.session.execute(
+        select(ProductSalesDaily.product_id, revenue, func.sum(ProductSalesDaily.units), func.sum(ProductSalesDaily.order_count))
+        .where(ProductSalesDaily.seller_id == user_id, ProductSalesDaily.day.between(start, end))
+        .group_by(ProductSalesDaily.product_id)
+        .having(func.sum(ProductSalesDaily.order_count) > 0)
+        .order_by(revenue.desc(), ProductSalesDaily.product_id)
+    ).all()
+    
+    return jsonify({
+        'from': start,
+        'to': end,
+        'totals': sales_totals(
+            sum(row.revenue for row in days), sum(row.units for row in days), sum(row.order_count for row in days)
+        ),
+        'days': [{'day': day, **sales_totals(*totals)} for day, *totals in days],
+        'products': [{'product_id': product_id, **sales_totals(*totals)} for product_id, *totals in products]
+    }), 200
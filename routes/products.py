@@ -1,20 +1,81 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models.product import Product
+from models.product import PRODUCT_FIELDS, Product, product_search
 from models.user import User
 from app import db
+from utils.conditional import make_etag, not_modified, with_validators
+from utils.fieldsets import InvalidFields
+from utils.images import allowed_image, load_variants, process_image, static_url
+from utils.media import media_store
+from utils.pagination import InvalidCursor, get_page_size, paginate_keyset
 
 products_bp = Blueprint('products', __name__)
 
+# Keyset sort orders: (sort key, descending). Product.id breaks ties.
+SORT_ORDERS = {
+    'newest': (Product.created_at, True),
+    'oldest': (Product.created_at, False),
+    'price_asc': (Product.price, False),
+    'price_desc': (Product.price, True),
+}
+
+def paginated_response(query, matches=None):
+    # The body stays a plain list; the cursor for the next page goes in a header
+    sort = request.args.get('sort', 'relevance' if matches is not None else 'newest')
+    if sort not in SORT_ORDERS and not (sort == 'relevance' and matches is not None):
+        return jsonify({'error': 'Invalid sort order'}), 400
+    
+    cursor = request.args.get('cursor')
+    limit = get_page_size(request.args)
+    try:
+        fields = PRODUCT_FIELDS.select(request.args)
+    except InvalidFields as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Only the columns behind the requested fields (and the sort key and
+    # updated_at for the ETag) are selected
+    sort_key = SORT_ORDERS[sort][0] if sort in SORT_ORDERS else Product.id
+    query = query.options(*PRODUCT_FIELDS.options(fields, Product.id, Product.updated_at, sort_key))
+    try:
+        if sort == 'relevance':
+            products, next_cursor = product_search.search_page(
+                query, matches, cursor=cursor, limit=limit
+            )
+        else:
+            key, descending = SORT_ORDERS[sort]
+            products, next_cursor = paginate_keyset(
+                query, sort, key, Product.id,
+                descending=descending, cursor=cursor, limit=limit
+            )
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Validated like the API list: an ETag over the request, the page's rows
+    # and the next cursor, and no Last-Modified
+    etag = make_etag(
+        request.path, sorted(request.args.items(multi=True)),
+        [(product.id, product.updated_at) for product in products],
+        next_cursor
+    )
+    response = not_modified(etag) or with_validators(
+        jsonify([product.to_dict(fields) for product in products]), etag
+    )
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
 @products_bp.route('/', methods=['GET'])
 def get_products():
-    products = Product.query.all()
-    return jsonify([product.to_dict() for product in products]), 200
+    return paginated_response(Product.query)
 
 @products_bp.route('/<int:product_id>', methods=['GET'])
 def get_product(product_id):
     product = Product.query.get_or_404(product_id)
-    return jsonify(product.to_dict()), 200
+    etag = make_etag(product.id, product.updated_at)
+    cached = not_modified(etag, product.updated_at)
+    if cached:
+        return cached
+    return with_validators(jsonify(product.to_dict()), etag, product.updated_at)
 
 @products_bp.route('/', methods=['POST'])
 @jwt_required()
@@ -38,6 +99,9 @@ def create_product():
     )
     
     db.session.add(product)
+    # Count the reference like update, upload and delete do, so the file is
+    # not collected while this product still points at it
+    media_store().acquire(media_store().path_from_url(product.image_url))
     db.session.commit()
     
     return jsonify({
@@ -69,6 +133,9 @@ def update_product(product_id):
     if 'category' in data:
         product.category = data['category']
     if 'image_url' in data:
+        if data['image_url'] != product.image_url:
+            media_store().replace(product.image_url, data['image_url'])
+            product.image_variants = None
         product.image_url = data['image_url']
     
     db.session.commit()
@@ -78,6 +145,64 @@ def update_product(product_id):
         'product': product.to_dict()
     }), 200
 
+def variant_urls(variants):
+    return {
+        image_format: {str(width): static_url(path) for width, path in paths.items()}
+        for image_format, paths in variants.items()
+    }
+
+@products_bp.route('/<int:product_id>/image', methods=['POST'])
+@jwt_required()
+def upload_product_image(product_id):
+    user_id = get_jwt_identity()
+    product = Product.query.get_or_404(product_id)
+    
+    if product.seller_id != user_id:
+        return jsonify({'error': 'Unauthorized to update this product'}), 403
+    
+    image = request.files.get('image')
+    if image is None or not image.filename:
+        return jsonify({'error': 'No image uploaded'}), 400
+    if not allowed_image(image.filename):
+        return jsonify({'error': 'Only PNG, JPG, GIF and WebP images are allowed'}), 400
+    
+    # Identical bytes map to the same stored file, so a re-upload costs no disk
+    relative_path = media_store().put(image)
+    image_url = static_url(relative_path)
+    if product.image_url == image_url:
+        db.session.commit()
+        return jsonify({
+            'message': 'Image uploaded successfully',
+            'product': product.to_dict()
+        }), 200
+    
+    media_store().replace(product.image_url, image_url)
+    product.image_url = image_url
+    variants = load_variants(current_app.static_folder, relative_path)
+    product.image_variants = variant_urls(variants) if variants else None
+    db.session.commit()
+    
+    if variants:
+        return jsonify({
+            'message': 'Image uploaded successfully',
+            'product': product.to_dict()
+        }), 200
+    
+    def record_variants(variants):
+        # Skip the write if the product got another image in the meantime
+        Product.query.filter_by(id=product_id, image_url=image_url).update({
+            'image_variants': variant_urls(variants)
+        })
+        db.session.commit()
+    
+    # Resizing happens on the worker pool, so the upload returns right away
+    process_image(relative_path, record_variants)
+    
+    return jsonify({
+        'message': 'Image uploaded successfully',
+        'product': product.to_dict()
+    }), 202
+
 @products_bp.route('/<int:product_id>', methods=['DELETE'])
 @jwt_required()
 def delete_product(product_id):
@@ -87,6 +212,7 @@ def delete_product(product_id):
     if product.seller_id != user_id:
         return jsonify({'error': 'Unauthorized to delete this product'}), 403
     
+    media_store().release(media_store().path_from_url(product.image_url))
     db.session.delete(product)
     db.session.commit()
     
@@ -99,14 +225,11 @@ def search_products():
     
     products_query = Product.query
     
-    if query:
-        products_query = products_query.filter(
-            Product.name.ilike(f'%{query}%') |
-            Product.description.ilike(f'%{query}%')
-        )
+    matches = product_search.match(query) if query else None
+    if matches is not None:
+        products_query = product_search.filter(products_query, matches)
     
     if category:
-        products_query = products_query.filter_by(category=category)
+        products_query = products_query.filter(Product.category == category)
     
-    products = products_query.all()
-    return jsonify([product.to_dict() for product in products]), 200 
\ No newline at end of file
+    return paginated_response(products_query, matches) 
\ No newline at end of file
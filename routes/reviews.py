@@ -4,6 +4,8 @@ from models.review import Review
 from models.product import Product
 from models.order import Order, OrderItem
 from app import db
+from utils.outbox import outbox
+from utils.ratings import apply_rating_change, valid_rating
 
 reviews_bp = Blueprint('reviews', __name__)
 
@@ -41,8 +43,8 @@ def create_review(product_id):
     
     data = request.get_json()
     
-    if not 1 <= data['rating'] <= 5:
-        return jsonify({'error': 'Rating must be between 1 and 5'}), 400
+    if not valid_rating(data.get('rating')):
+        return jsonify({'error': 'Rating must be an integer between 1 and 5'}), 400
     
     review = Review(
         user_id=user_id,
@@ -52,6 +54,9 @@ def create_review(product_id):
     )
     
     db.session.add(review)
+    apply_rating_change(db, Product, product_id, added=review.rating)
+    db.session.flush()
+    outbox().record('review.created', review.id, review.to_dict())
     db.session.commit()
     
     return jsonify({
@@ -71,13 +76,16 @@ def update_review(review_id):
     data = request.get_json()
     
     if 'rating' in data:
-        if not 1 <= data['rating'] <= 5:
-            return jsonify({'error': 'Rating must be between 1 and 5'}), 400
+        if not valid_rating(data['rating']):
+            return jsonify({'error': 'Rating must be an integer between 1 and 5'}), 400
+        apply_rating_change(db, Product, review.product_id, added=data['rating'], removed=review.rating)
         review.rating = data['rating']
     
     if 'comment' in data:
         review.comment = data['comment']
     
+    db.session.flush()
+    outbox().record('review.updated', review.id, review.to_dict())
     db.session.commit()
     
     return jsonify({
@@ -94,6 +102,8 @@ def delete_review(review_id):
     if review.user_id != user_id:
         return jsonify({'error': 'Unauthorized to delete this review'}), 403
     
+    apply_rating_change(db, Product, review.product_id, removed=review.rating)
+    outbox().record('review.deleted', review.id, review.to_dict())
     db.session.delete(review)
     db.session.commit()
     
@@ -0,0 +1,196 @@
+import itertools
+import os
+import tempfile
+
+import pytest
+
+
+def _database_url(name):
+    return 'sqlite:///' + os.path.join(tempfile.mkdtemp(), f'{name}.db')
+
+
+_shops = itertools.count()
+
+
+def _headers(app, user_id):
+    from flask_jwt_extended import create_access_token
+    with app.app_context():
+        return {'Authorization': f'Bearer {create_access_token(identity=user_id)}'}
+
+
+@pytest.fixture(scope='session')
+def root_app():
+    """The root app on a throwaway database, with TESTING on so budgets raise."""
+    # Both apps read DATABASE_URL when they are first imported
+    os.environ['DATABASE_URL'] = _database_url('root')
+    from app import app, db
+    import models.order, models.review  # noqa: F401 - register the remaining tables
+
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+@pytest.fixture(scope='session')
+def api_app():
+    os.environ['DATABASE_URL'] = _database_url('api')
+    from api.app import app, db
+
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+@pytest.fixture(scope='session')
+def root_data(root_app):
+    """Two farmers and two buyers, 30 products and 15 three-item orders.
+
+    Orders are placed through the API so order_sellers and the sales rollups
+    are filled the way production fills them.
+    """
+    from app import db
+    from models.product import Product
+    from models.user import User
+
+    with root_app.app_context():
+        users = [
+            User(username=name, email=f'{name}@example.com', role=name.rstrip('12'))
+            for name in ('farmer1', 'farmer2', 'buyer1', 'buyer2')
+        ]
+        db.session.add_all(users)
+        db.session.flush()
+        farmers, buyers = [user.id for user in users[:2]], [user.id for user in users[2:]]
+        products = [
+            Product(
+                name=f'Product {i}', description='Fresh produce from the farm', price=1 + i % 7,
+                quantity=1000, unit='kg', category='vegetables', seller_id=farmers[i % 2]
+            ) for i in range(30)
+        ]
+        db.session.add_all(products)
+        db.session.commit()
+        product_ids = [product.id for product in products]
+
+    headers = {user_id: _headers(root_app, user_id) for user_id in farmers + buyers}
+    client = root_app.test_client()
+    orders = []
+    for i in range(15):
+        response = client.post('/api/orders/', json={
+            'shipping_address': '1 Market Street',
+            'items': [{'product_id': product_ids[(i + k) % 30], 'quantity': 1 + k} for k in range(3)],
+        }, headers=headers[buyers[i % 2]])
+        assert response.status_code == 201, response.get_json()
+        orders.append(response.get_json()['order']['id'])
+
+    return {
+        'farmer': headers[farmers[0]],
+        'buyer': headers[buyers[0]],
+        'orders': orders,
+        'products': product_ids,
+    }
+
+
+@pytest.fixture
+def shop(root_app):
+    """Users and products of the root app that only the requesting test writes to.
+
+    Two farmers and two buyers; each farmer sells three products priced 2 to
+    7 with 10 units in stock. Users are keyed farmer1, farmer2, buyer1, buyer2.
+    """
+    from app import db
+    from models.product import Product
+    from models.user import User
+
+    n = next(_shops)
+    with root_app.app_context():
+        users = {
+            name: User(username=f'{name}-{n}', email=f'{name}-{n}@example.com', role=name.rstrip('12'))
+            for name in ('farmer1', 'farmer2', 'buyer1', 'buyer2')
+        }
+        db.session.add_all(users.values())
+        db.session.flush()
+        products = [
+            Product(
+                name=f'Shop {n} product {i}', description='Fresh produce from the farm', price=2 + i,
+                quantity=10, unit='kg', category='vegetables', seller_id=users[f'farmer{1 + i // 3}'].id
+            ) for i in range(6)
+        ]
+        db.session.add_all(products)
+        db.session.commit()
+        ids = {name: user.id for name, user in users.items()}
+        product_ids = [product.id for product in products]
+
+    return {
+        'users': ids,
+        'headers': {name: _headers(root_app, user_id) for name, user_id in ids.items()},
+        'products': product_ids,
+    }
+
+
+@pytest.fixture
+def place_order(root_app):
+    """Post an order of ``(product_id, quantity)`` items to the root app.
+
+    Returns the response; ``key`` is sent as the ``Idempotency-Key`` header.
+    """
+    def place(headers, *items, key=None):
+        if key is not None:
+            headers = {**headers, 'Idempotency-Key': key}
+        return root_app.test_client().post('/api/orders/', json={
+            'shipping_address': '1 Market Street',
+            'items': [{'product_id': product_id, 'quantity': quantity} for product_id, quantity in items],
+        }, headers=headers)
+    return place
+
+
+@pytest.fixture(scope='session')
+def api_data(api_app):
+    """Two farmers and two buyers, 30 products, 20 orders, messages and reviews."""
+    from werkzeug.security import generate_password_hash
+    from api.app import db
+    from api.models import Message, Order, Product, Review, User
+
+    with api_app.app_context():
+        users = [
+            User(
+                username=name, email=f'{name}@example.com',
+                password=generate_password_hash('password'), role=name.rstrip('12')
+            ) for name in ('farmer1', 'farmer2', 'buyer1', 'buyer2')
+        ]
+        db.session.add_all(users)
+        db.session.flush()
+        farmers, buyers = [user.id for user in users[:2]], [user.id for user in users[2:]]
+        products = [
+            Product(
+                name=f'Product {i}', description='Fresh produce from the farm', price=1 + i % 7,
+                quantity=1000, category='vegetables', region='Central', seller_id=farmers[i % 2]
+            ) for i in range(30)
+        ]
+        db.session.add_all(products)
+        db.session.flush()
+        db.session.add_all([
+            Order(
+                buyer_id=buyers[i % 2], product_id=products[i].id, quantity=2,
+                total_price=products[i].price * 2, status='completed'
+            ) for i in range(20)
+        ])
+        db.session.add_all([
+            Message(sender_id=buyers[i % 2], receiver_id=farmers[i % 2], content=f'Message {i}')
+            for i in range(20)
+        ] + [
+            Message(sender_id=farmers[0], receiver_id=buyers[0], content=f'Reply {i}')
+            for i in range(10)
+        ])
+        db.session.add_all([
+            Review(user_id=buyers[i % 2], product_id=products[i].id, rating=1 + i % 5, comment='Good')
+            for i in range(20)
+        ])
+        db.session.commit()
+        product_ids = [product.id for product in products]
+
+    return {
+        'farmer': _headers(api_app, farmers[0]),
+        'buyer': _headers(api_app, buyers[0]),
+        'products': product_ids,
+    }
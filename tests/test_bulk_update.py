@@ -0,0 +1,21 @@
+"""Bulk product updates reject the values order creation and imports reject."""
+import pytest
+
+
+BAD_UPDATES = [
+    '{"id": true, "quantity": 5}',
+    '{"id": %(id)d, "price": true}',
+    '{"id": %(id)d, "price": NaN}',
+    '{"id": %(id)d, "price": Infinity}',
+    '{"id": %(id)d, "price": -Infinity}',
+]
+
+
+@pytest.mark.parametrize('item', BAD_UPDATES)
+def test_bulk_update_rejects_bad_values(api_app, api_data, item):
+    body = '{"updates": [%s]}' % (item % {'id': api_data['products'][0]})
+    response = api_app.test_client().patch(
+        '/api/products/bulk', data=body, content_type='application/json', headers=api_data['farmer']
+    )
+    # orjson refuses NaN and Infinity outright; the stdlib parser leaves them to the view
+    assert response.status_code == 400
@@ -0,0 +1,75 @@
+"""The product list is validated by its ETag alone.
+
+Its newest ``updated_at`` can stay the same while the list changes (a
+product is deleted, or a different filter matches older products), so a
+Last-Modified date would let If-Modified-Since answer 304 for a stale list.
+"""
+from email.utils import formatdate
+
+
+def test_list_has_no_last_modified(api_app, api_data):
+    client = api_app.test_client()
+    response = client.get('/api/products?category=vegetables')
+    assert response.status_code == 200
+    assert 'ETag' in response.headers
+    assert 'Last-Modified' not in response.headers
+
+    # Even a date in the future does not make the list fresh
+    future = formatdate(2 ** 32, usegmt=True)
+    response = client.get('/api/products?category=vegetables', headers={'If-Modified-Since': future})
+    assert response.status_code == 200
+
+
+def test_list_etag(api_app, api_data):
+    client = api_app.test_client()
+    etag = client.get('/api/products?category=vegetables').headers['ETag']
+    response = client.get('/api/products?category=vegetables', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert 'Last-Modified' not in response.headers
+    response = client.get('/api/products?category=fruits', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+
+
+def test_product_keeps_last_modified(api_app, api_data):
+    response = api_app.test_client().get(f"/api/products/{api_data['products'][0]}")
+    assert response.status_code == 200
+    assert 'Last-Modified' in response.headers
+
+
+def test_list_etag_follows_the_page(api_app, api_data):
+    from datetime import datetime, timedelta
+    from api.app import db
+    from api.models import Product
+    from utils.cache import invalidate_cache
+
+    client = api_app.test_client()
+    etag = client.get('/api/products?sort=oldest&limit=5').headers['ETag']
+    with api_app.app_context():
+        product = db.session.get(Product, api_data['products'][0])
+        product.updated_at = datetime.utcnow() + timedelta(minutes=1)
+        db.session.commit()
+        invalidate_cache('products')
+    response = client.get('/api/products?sort=oldest&limit=5', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_root_app_list_etag(root_app, root_data):
+    client = root_app.test_client()
+    response = client.get('/api/products/?limit=5')
+    assert 'Last-Modified' not in response.headers
+    etag = response.headers['ETag']
+    response = client.get('/api/products/?limit=5', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert 'X-Next-Cursor' in response.headers
+    response = client.get('/api/products/search?limit=5', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+
+
+def test_root_app_product_validators(root_app, root_data):
+    client = root_app.test_client()
+    url = f"/api/products/{root_data['products'][0]}"
+    response = client.get(url)
+    assert response.status_code == 200
+    assert client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+    assert client.get(url, headers={'If-Modified-Since': response.headers['Last-Modified']}).status_code == 304
@@ -0,0 +1,85 @@
+"""Retrying a POST with the same Idempotency-Key replays the first response."""
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func, select
+
+
+def orders_and_stock(root_app, buyer_id, product_id):
+    from app import db
+    from models.order import Order
+    from models.product import Product
+
+    with root_app.app_context():
+        orders = db.session.execute(select(func.count(Order.id)).where(Order.buyer_id == buyer_id)).scalar()
+        return orders, db.session.get(Product, product_id).quantity
+
+
+def test_retry_replays_the_first_order(root_app, shop, place_order):
+    product_id = shop['products'][0]
+    first = place_order(shop['headers']['buyer1'], (product_id, 2), key='retry-1')
+    second = place_order(shop['headers']['buyer1'], (product_id, 2), key='retry-1')
+
+    assert first.status_code == second.status_code == 201
+    assert 'Idempotent-Replayed' not in first.headers
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert second.get_json() == first.get_json()
+    assert orders_and_stock(root_app, shop['users']['buyer1'], product_id) == (1, 8)
+
+
+def test_key_reused_with_another_body_conflicts(root_app, shop, place_order):
+    product_id = shop['products'][0]
+    assert place_order(shop['headers']['buyer1'], (product_id, 2), key='reuse-1').status_code == 201
+    response = place_order(shop['headers']['buyer1'], (product_id, 3), key='reuse-1')
+    assert response.status_code == 422
+    assert orders_and_stock(root_app, shop['users']['buyer1'], product_id) == (1, 8)
+
+
+def test_keys_are_scoped_to_the_user(root_app, shop, place_order):
+    product_id = shop['products'][0]
+    for buyer in ('buyer1', 'buyer2'):
+        response = place_order(shop['headers'][buyer], (product_id, 2), key='shared-key')
+        assert response.status_code == 201
+        assert 'Idempotent-Replayed' not in response.headers
+    assert orders_and_stock(root_app, shop['users']['buyer2'], product_id) == (1, 6)
+
+
+def test_concurrent_retries_place_one_order(root_app, shop, place_order):
+    product_id = shop['products'][0]
+
+    def attempt(_):
+        response = place_order(shop['headers']['buyer1'], (product_id, 2), key='race-1')
+        return response.status_code, response.get_json()['order']['id']
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        results = list(pool.map(attempt, range(5)))
+    assert {status for status, _ in results} == {201}
+    assert len({order_id for _, order_id in results}) == 1
+    assert orders_and_stock(root_app, shop['users']['buyer1'], product_id) == (1, 8)
+
+
+def test_key_still_in_progress_is_409(root_app, shop, place_order, monkeypatch):
+    store = root_app.extensions['idempotency_store']
+    monkeypatch.setattr(store, 'wait', 0)
+    # Another worker holds the key and has not answered yet
+    store.claim(f"idem:{shop['users']['buyer1']}:POST:/api/orders/:busy-1", 'fingerprint')
+
+    response = place_order(shop['headers']['buyer1'], (shop['products'][0], 2), key='busy-1')
+    assert response.status_code == 409
+
+
+def test_message_retry_is_sent_once(api_app, api_data):
+    from api.models import Message, User
+
+    client = api_app.test_client()
+    with api_app.app_context():
+        receiver_id = User.query.filter_by(username='farmer2').one().id
+        before = Message.query.count()
+    headers = {**api_data['buyer'], 'Idempotency-Key': 'message-1'}
+    body = {'receiver_id': receiver_id, 'content': 'Are the tomatoes ripe?'}
+
+    first = client.post('/api/messages', json=body, headers=headers)
+    second = client.post('/api/messages', json=body, headers=headers)
+    assert first.status_code == second.status_code == 201
+    assert second.get_json()['data']['id'] == first.get_json()['data']['id']
+    with api_app.app_context():
+        assert Message.query.count() == before + 1
@@ -0,0 +1,26 @@
+"""A CSV that breaks partway reports what was committed before the bad line."""
+import csv
+
+
+def test_malformed_csv_reports_committed_rows(api_app, api_data, monkeypatch):
+    from api.models import Product
+
+    monkeypatch.setitem(api_app.config, 'IMPORT_BATCH_SIZE', 2)
+    rows = ['name,description,price,quantity,category']
+    rows += [f'Imported {i},Fresh,2.5,10,vegetables' for i in range(5)]
+    # A field over csv's size limit cannot be read
+    rows.append('Too long,' + 'x' * (csv.field_size_limit() + 1) + ',1,1,vegetables')
+    rows.append('Never read,Fresh,1,1,vegetables')
+    body = '\n'.join(rows).encode()
+
+    response = api_app.test_client().post(
+        '/api/products/import?format=csv', data=body, content_type='text/csv', headers=api_data['farmer']
+    )
+    assert response.status_code == 400
+    report = response.get_json()
+    assert report['imported'] == 5
+    assert report['stopped']['line'] == 7
+    assert report['error'].startswith('Malformed CSV')
+    with api_app.app_context():
+        assert Product.query.filter(Product.name.like('Imported %')).count() == 5
+        assert Product.query.filter_by(name='Never read').count() == 0
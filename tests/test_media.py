@@ -0,0 +1,50 @@
+"""Re-uploading an orphaned blob keeps collect_garbage away from it."""
+import io
+import os
+from datetime import datetime, timedelta
+
+from werkzeug.datastructures import FileStorage
+
+
+def upload(data):
+    return FileStorage(stream=io.BytesIO(data), filename='photo.png')
+
+
+def test_reused_orphan_is_not_collected(root_app, tmp_path):
+    from app import db
+    from models.media import MediaBlob
+    from utils.media import MediaStore
+
+    store = MediaStore(db, MediaBlob, str(tmp_path))
+    data = b'orphaned photo bytes'
+    with root_app.app_context():
+        path = store.put(upload(data))
+        db.session.commit()
+        # Nothing references it and it is past the grace period
+        blob = MediaBlob.query.filter_by(path=path).one()
+        blob.updated_at = datetime.utcnow() - timedelta(days=1)
+        db.session.commit()
+
+        assert store.put(upload(data)) == path
+        store.acquire(path)
+        db.session.commit()
+
+        store.collect_garbage(grace=timedelta(hours=1))
+        assert MediaBlob.query.filter_by(path=path).one().ref_count == 1
+    assert os.path.exists(tmp_path / path)
+
+
+def test_old_orphans_are_collected(root_app, tmp_path):
+    from app import db
+    from models.media import MediaBlob
+    from utils.media import MediaStore
+
+    store = MediaStore(db, MediaBlob, str(tmp_path))
+    with root_app.app_context():
+        path = store.put(upload(b'unused photo bytes'))
+        MediaBlob.query.filter_by(path=path).one().updated_at = datetime.utcnow() - timedelta(days=1)
+        db.session.commit()
+
+        assert store.collect_garbage(grace=timedelta(hours=1)) >= 1
+        assert MediaBlob.query.filter_by(path=path).first() is None
+    assert not os.path.exists(tmp_path / path)
@@ -0,0 +1,113 @@
+"""Order status changes follow Order.TRANSITIONS and only the order's sellers make them."""
+import pytest
+
+
+@pytest.fixture
+def orders(shop, place_order):
+    """Two orders of buyer1: one from farmer1's products, one from farmer2's."""
+    ids = []
+    for product_id in (shop['products'][0], shop['products'][3]):
+        response = place_order(shop['headers']['buyer1'], (product_id, 1))
+        assert response.status_code == 201
+        ids.append(response.get_json()['order']['id'])
+    return ids
+
+
+def set_status(client, headers, order_id, status):
+    return client.put(f'/api/orders/{order_id}/status', json={'status': status}, headers=headers)
+
+
+def statuses(root_app, *order_ids):
+    from app import db
+    from models.order import Order, OrderSeller
+
+    with root_app.app_context():
+        return [
+            (db.session.get(Order, order_id).status, OrderSeller.query.filter_by(order_id=order_id).one().status)
+            for order_id in order_ids
+        ]
+
+
+def test_legal_path_to_delivered(root_app, shop, orders):
+    client = root_app.test_client()
+    for status in ('confirmed', 'shipped', 'delivered'):
+        response = set_status(client, shop['headers']['farmer1'], orders[0], status)
+        assert response.status_code == 200
+        assert response.get_json()['order']['status'] == status
+    # order_sellers follows the order, for the farmer's inbox filters
+    assert statuses(root_app, orders[0]) == [('delivered', 'delivered')]
+
+
+@pytest.mark.parametrize('path, illegal', [
+    ((), 'shipped'),
+    ((), 'delivered'),
+    (('confirmed', 'shipped'), 'cancelled'),
+    (('confirmed', 'shipped', 'delivered'), 'pending'),
+    (('cancelled',), 'confirmed'),
+])
+def test_illegal_transition_is_rejected(root_app, shop, orders, path, illegal):
+    client = root_app.test_client()
+    for status in path:
+        assert set_status(client, shop['headers']['farmer1'], orders[0], status).status_code == 200
+    current = path[-1] if path else 'pending'
+
+    response = set_status(client, shop['headers']['farmer1'], orders[0], illegal)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == f'Cannot change a {current} order to {illegal}'
+    assert statuses(root_app, orders[0]) == [(current, current)]
+
+
+def test_unknown_status_is_rejected(root_app, shop, orders):
+    response = set_status(root_app.test_client(), shop['headers']['farmer1'], orders[0], 'lost')
+    assert response.status_code == 400
+
+
+def test_malformed_status_body_is_rejected(root_app, shop, orders):
+    client = root_app.test_client()
+    url = f'/api/orders/{orders[0]}/status'
+    for body in ({}, ['confirmed'], {'status': ['confirmed']}):
+        assert client.put(url, json=body, headers=shop['headers']['farmer1']).status_code == 400
+    assert statuses(root_app, orders[0]) == [('pending', 'pending')]
+
+
+def test_only_the_orders_seller_can_change_it(root_app, shop, orders):
+    client = root_app.test_client()
+    assert set_status(client, shop['headers']['farmer2'], orders[0], 'confirmed').status_code == 403
+    assert set_status(client, shop['headers']['buyer1'], orders[0], 'cancelled').status_code == 403
+    assert statuses(root_app, orders[0]) == [('pending', 'pending')]
+
+
+def test_bulk_reports_each_order(root_app, shop, orders):
+    response = root_app.test_client().patch('/api/orders/status', json={'updates': [
+        {'id': orders[0], 'status': 'confirmed'},
+        {'id': orders[1], 'status': 'confirmed'},
+        {'id': 10 ** 9, 'status': 'confirmed'},
+    ]}, headers=shop['headers']['farmer1'])
+
+    assert response.status_code == 207
+    results = {result['id']: result for result in response.get_json()['results']}
+    assert results[orders[0]] == {'id': orders[0], 'updated': True, 'status': 'confirmed'}
+    assert results[orders[1]]['error'] == 'Unauthorized to update this order'
+    assert results[10 ** 9]['error'] == 'Order not found'
+    assert statuses(root_app, *orders) == [('confirmed', 'confirmed'), ('pending', 'pending')]
+
+
+def test_bulk_rejects_illegal_moves_per_order(root_app, shop, orders):
+    client = root_app.test_client()
+    assert set_status(client, shop['headers']['farmer1'], orders[0], 'cancelled').status_code == 200
+    response = client.patch('/api/orders/status', json={'updates': [
+        {'id': orders[0], 'status': 'confirmed'},
+    ]}, headers=shop['headers']['farmer1'])
+    assert response.status_code == 207
+    assert response.get_json()['results'][0]['error'] == 'Cannot change a cancelled order to confirmed'
+
+
+def test_bulk_rejects_malformed_updates(root_app, shop, orders):
+    client = root_app.test_client()
+    for updates in (
+        [], [{'id': orders[0], 'status': 'lost'}], [{'id': orders[0], 'status': 'confirmed'}] * 2,
+        [{'id': True, 'status': 'confirmed'}], [{'id': orders[0], 'status': ['confirmed']}],
+    ):
+        response = client.patch('/api/orders/status', json={'updates': updates}, headers=shop['headers']['farmer1'])
+        assert response.status_code == 400
+    assert statuses(root_app, orders[0]) == [('pending', 'pending')]
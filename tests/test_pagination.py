@@ -0,0 +1,41 @@
+"""Cursors are client input: a key of the wrong type is a 400, never a 500."""
+import base64
+import json
+
+import pytest
+
+
+def cursor(sort, keys):
+    raw = json.dumps({'s': sort, 'k': keys}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+BAD_KEYS = [
+    ('price_asc', [{'x': 1}, [2]]),
+    ('price_desc', ['cheap', 2]),
+    ('price_asc', [True, 2]),
+    ('price_asc', [float('nan'), 2]),
+    ('price_asc', [3.5, True]),
+    ('price_asc', [3.5, 2.5]),
+    ('newest', ['2026-01-01T00:00:00', '2']),
+    ('oldest', [12, 2]),
+]
+
+
+@pytest.mark.parametrize('sort,keys', BAD_KEYS)
+def test_root_app_rejects_mistyped_cursor(root_app, root_data, sort, keys):
+    response = root_app.test_client().get(f'/api/products/?sort={sort}&cursor={cursor(sort, keys)}')
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('sort,keys', BAD_KEYS)
+def test_api_app_rejects_mistyped_cursor(api_app, api_data, sort, keys):
+    response = api_app.test_client().get(f'/api/products?sort={sort}&cursor={cursor(sort, keys)}')
+    assert response.status_code == 400
+
+
+def test_next_cursor_still_pages(api_app, api_data):
+    client = api_app.test_client()
+    first = client.get('/api/products?sort=price_asc&limit=5').get_json()
+    second = client.get(f"/api/products?sort=price_asc&limit=5&cursor={first['next_cursor']}")
+    assert second.status_code == 200
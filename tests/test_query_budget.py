@@ -0,0 +1,106 @@
+"""Every view with ``@query_budget`` stays within it on a seeded database.
+
+The apps run with ``TESTING`` on, so a view that goes over its budget raises
+``QueryBudgetExceeded`` out of the test client and fails the test. The data
+has enough rows per user that an N+1 would run far more statements than any
+budget allows.
+"""
+import pytest
+from flask import Flask, jsonify
+from flask_sqlalchemy import SQLAlchemy
+
+from utils.query_budget import QueryBudgetExceeded, init_query_counter, query_budget
+
+
+def assert_within_budget(response, status=200):
+    assert response.status_code == status, response.get_json()
+    assert 'X-Query-Count' in response.headers
+
+
+class TestRootApp:
+    def test_get_orders(self, root_app, root_data):
+        client = root_app.test_client()
+        for role in ('farmer', 'buyer'):
+            assert_within_budget(client.get('/api/orders/', headers=root_data[role]))
+            assert_within_budget(client.get('/api/orders/?status=pending', headers=root_data[role]))
+
+    def test_get_order(self, root_app, root_data):
+        client = root_app.test_client()
+        for role in ('farmer', 'buyer'):
+            assert_within_budget(client.get(f"/api/orders/{root_data['orders'][0]}", headers=root_data[role]))
+
+    def test_create_order(self, root_app, root_data):
+        response = root_app.test_client().post('/api/orders/', json={
+            'shipping_address': '1 Market Street',
+            'items': [{'product_id': product_id, 'quantity': 1} for product_id in root_data['products']],
+        }, headers=root_data['buyer'])
+        assert_within_budget(response, 201)
+
+    def test_bulk_update_order_status(self, root_app, root_data):
+        client = root_app.test_client()
+        # Farmer 1 owns products in every order, so all of them move
+        updates = [{'id': order_id, 'status': 'confirmed'} for order_id in root_data['orders'][:10]]
+        updates += [{'id': order_id, 'status': 'cancelled'} for order_id in root_data['orders'][10:]]
+        response = client.patch('/api/orders/status', json={'updates': updates}, headers=root_data['farmer'])
+        assert_within_budget(response)
+
+    def test_get_sales_analytics(self, root_app, root_data):
+        response = root_app.test_client().get('/api/orders/analytics', headers=root_data['farmer'])
+        assert_within_budget(response)
+        assert response.get_json()['products']
+
+
+class TestApiApp:
+    def test_get_products(self, api_app, api_data):
+        client = api_app.test_client()
+        for query in ('', '?sort=price_asc', '?category=vegetables&fields=id,name,seller'):
+            assert_within_budget(client.get(f'/api/products{query}'))
+
+    def test_get_product_facets(self, api_app, api_data):
+        assert_within_budget(api_app.test_client().get('/api/products/facets'))
+
+    def test_get_product(self, api_app, api_data):
+        assert_within_budget(api_app.test_client().get(f"/api/products/{api_data['products'][0]}"))
+
+    def test_bulk_update_products(self, api_app, api_data):
+        updates = [{'id': product_id, 'quantity': 500} for product_id in api_data['products']]
+        response = api_app.test_client().patch(
+            '/api/products/bulk', json={'updates': updates}, headers=api_data['farmer']
+        )
+        assert_within_budget(response)
+
+    def test_get_orders(self, api_app, api_data):
+        client = api_app.test_client()
+        for role in ('farmer', 'buyer'):
+            assert_within_budget(client.get('/api/orders?expand=buyer,seller', headers=api_data[role]))
+
+    def test_get_order(self, api_app, api_data):
+        assert_within_budget(api_app.test_client().get('/api/orders/1', headers=api_data['buyer']))
+
+    def test_get_messages(self, api_app, api_data):
+        client = api_app.test_client()
+        assert_within_budget(client.get('/api/messages?expand=sender,receiver', headers=api_data['farmer']))
+
+
+def test_over_budget_view_raises():
+    app = Flask(__name__)
+    app.config.update(TESTING=True, SQLALCHEMY_DATABASE_URI='sqlite://')
+    db = SQLAlchemy(app)
+    init_query_counter(app)
+
+    class Item(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+
+    @app.route('/items')
+    @query_budget(1)
+    def items():
+        # One SELECT per item: the N+1 the budget is there to catch
+        return jsonify([db.session.get(Item, item_id) is not None for item_id in range(1, 4)])
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Item(id=item_id) for item_id in range(1, 4)])
+        db.session.commit()
+
+    with pytest.raises(QueryBudgetExceeded, match='ran 3 SQL statements, over its budget of 1'):
+        app.test_client().get('/items')
@@ -0,0 +1,120 @@
+"""Daily sales rollups follow orders as they are placed and cancelled, and a rebuild agrees."""
+from datetime import datetime
+
+from sqlalchemy import select
+
+
+def order_id(response):
+    assert response.status_code == 201
+    return response.get_json()['order']['id']
+
+
+def rollups(root_app, seller_ids=None):
+    """``({(seller, product, day): totals}, {(seller, day): totals})`` of the counted rows."""
+    from app import db
+    from models.order import ProductSalesDaily, SellerSalesDaily
+
+    def rows(model, keys):
+        query = select(model).where(model.order_count > 0)
+        if seller_ids is not None:
+            query = query.where(model.seller_id.in_(seller_ids))
+        return {
+            tuple(getattr(row, key) for key in keys): (round(row.revenue, 2), round(row.units, 3), row.order_count)
+            for row in db.session.execute(query).scalars()
+        }
+
+    with root_app.app_context():
+        return (
+            rows(ProductSalesDaily, ('seller_id', 'product_id', 'day')),
+            rows(SellerSalesDaily, ('seller_id', 'day')),
+        )
+
+
+def test_orders_add_and_cancelling_removes(root_app, shop, place_order):
+    client = root_app.test_client()
+    farmer1, farmer2 = shop['users']['farmer1'], shop['users']['farmer2']
+    p0, p1, _, p3 = shop['products'][:4]
+    today = datetime.utcnow().date()
+
+    # p0 costs 2, p1 3 and p3 5; an order counts once per product and per seller
+    first = order_id(place_order(shop['headers']['buyer1'], (p0, 2), (p1, 1), (p0, 1)))
+    order_id(place_order(shop['headers']['buyer2'], (p0, 1), (p3, 2)))
+    per_product, per_seller = rollups(root_app, [farmer1, farmer2])
+    assert per_product == {
+        (farmer1, p0, today): (8, 4, 2),
+        (farmer1, p1, today): (3, 1, 1),
+        (farmer2, p3, today): (10, 2, 1),
+    }
+    assert per_seller == {(farmer1, today): (11, 5, 2), (farmer2, today): (10, 2, 1)}
+
+    response = client.put(
+        f'/api/orders/{first}/status', json={'status': 'cancelled'}, headers=shop['headers']['farmer1']
+    )
+    assert response.status_code == 200
+    per_product, per_seller = rollups(root_app, [farmer1, farmer2])
+    assert per_product == {(farmer1, p0, today): (2, 1, 1), (farmer2, p3, today): (10, 2, 1)}
+    assert per_seller == {(farmer1, today): (2, 1, 1), (farmer2, today): (10, 2, 1)}
+
+    analytics = client.get('/api/orders/analytics', headers=shop['headers']['farmer1']).get_json()
+    assert analytics['totals'] == {'revenue': 2, 'units': 1, 'orders': 1}
+    assert analytics['products'] == [{'product_id': p0, 'revenue': 2, 'units': 1, 'orders': 1}]
+
+
+def test_rebuild_matches_incremental_updates(root_app, shop, place_order):
+    from app import db
+    from models.order import Order, OrderItem, ProductSalesDaily, SellerSalesDaily
+    from models.product import Product
+    from utils.rollups import rebuild_sales_rollups
+
+    client = root_app.test_client()
+    p0, p1, _, p3 = shop['products'][:4]
+    cancelled = order_id(place_order(shop['headers']['buyer1'], (p0, 1), (p1, 2)))
+    order_id(place_order(shop['headers']['buyer1'], (p1, 1), (p3, 1)))
+    order_id(place_order(shop['headers']['buyer2'], (p0, 3)))
+    assert client.put(
+        f'/api/orders/{cancelled}/status', json={'status': 'cancelled'}, headers=shop['headers']['farmer1']
+    ).status_code == 200
+
+    # Every order in the database was placed through the API, so the whole table must agree
+    incremental = rollups(root_app)
+    with root_app.app_context():
+        rebuild_sales_rollups(db, ProductSalesDaily, SellerSalesDaily, Order, OrderItem, Product)
+    assert rollups(root_app) == incremental
+
+
+def test_databases_without_upsert_add_the_same(root_app, shop, place_order, monkeypatch):
+    from app import db
+    from utils.rollups import sales_statements
+
+    monkeypatch.setattr('utils.rollups.UPSERTS', {})
+    with root_app.app_context():
+        budget = 11 + sales_statements(db)
+        cancel_budget = 10 + sales_statements(db)
+    assert budget == 19
+    farmer1 = shop['users']['farmer1']
+    p0, p1 = shop['products'][:2]
+    today = datetime.utcnow().date()
+
+    # The first order's rows are new and the second's exist; either way the
+    # fallback runs a fixed number of statements, which create_order budgets for
+    responses = (
+        place_order(shop['headers']['buyer1'], (p0, 2), (p1, 1)),
+        place_order(shop['headers']['buyer2'], (p0, 1)),
+    )
+    for response in responses:
+        order_id(response)
+        assert int(response.headers['X-Query-Count']) <= budget
+    per_product, per_seller = rollups(root_app, [farmer1])
+    assert per_product == {(farmer1, p0, today): (6, 3, 2), (farmer1, p1, today): (3, 1, 1)}
+    assert per_seller == {(farmer1, today): (9, 4, 2)}
+
+    # Cancelling runs the fallback too, within update_order_status's budget
+    response = root_app.test_client().put(
+        f'/api/orders/{order_id(responses[1])}/status', json={'status': 'cancelled'},
+        headers=shop['headers']['farmer1']
+    )
+    assert response.status_code == 200
+    assert int(response.headers['X-Query-Count']) <= cancel_budget
+    per_product, per_seller = rollups(root_app, [farmer1])
+    assert per_product == {(farmer1, p0, today): (4, 2, 1), (farmer1, p1, today): (3, 1, 1)}
+    assert per_seller == {(farmer1, today): (7, 3, 1)}
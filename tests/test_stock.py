@@ -0,0 +1,92 @@
+"""Orders take stock with one conditional UPDATE and never oversell."""
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func, select
+
+
+def stock(root_app, *product_ids):
+    from app import db
+    from models.product import Product
+
+    with root_app.app_context():
+        return [db.session.get(Product, product_id).quantity for product_id in product_ids]
+
+
+def order_count(root_app, buyer_id):
+    from app import db
+    from models.order import Order
+
+    with root_app.app_context():
+        return db.session.execute(select(func.count(Order.id)).where(Order.buyer_id == buyer_id)).scalar()
+
+
+def test_order_takes_stock(root_app, shop, place_order):
+    first, second = shop['products'][:2]
+    response = place_order(shop['headers']['buyer1'], (first, 4), (second, 10))
+    assert response.status_code == 201
+    assert stock(root_app, first, second) == [6, 0]
+
+
+def test_oversell_is_rejected_and_rolled_back(root_app, shop, place_order):
+    first, second = shop['products'][:2]
+    response = place_order(shop['headers']['buyer1'], (first, 4), (second, 11))
+    assert response.status_code == 400
+    assert 'Shop' in response.get_json()['error']
+    # The line that did fit was not taken either, and no order was written
+    assert stock(root_app, first, second) == [10, 10]
+    assert order_count(root_app, shop['users']['buyer1']) == 0
+
+
+def test_repeated_lines_reserve_their_sum(root_app, shop, place_order):
+    product_id = shop['products'][0]
+    response = place_order(shop['headers']['buyer1'], (product_id, 6), (product_id, 6))
+    assert response.status_code == 400
+    assert stock(root_app, product_id) == [10]
+
+
+def test_later_orders_see_earlier_reservations(root_app, shop, place_order):
+    product_id = shop['products'][0]
+    assert place_order(shop['headers']['buyer1'], (product_id, 6)).status_code == 201
+    assert place_order(shop['headers']['buyer2'], (product_id, 6)).status_code == 400
+    assert stock(root_app, product_id) == [4]
+
+
+def test_concurrent_orders_do_not_oversell(root_app, shop, place_order):
+    product_id = shop['products'][0]
+    headers = [shop['headers']['buyer1'], shop['headers']['buyer2']] * 3
+
+    def buy(buyer_headers):
+        return place_order(buyer_headers, (product_id, 3)).status_code
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        statuses = list(pool.map(buy, headers))
+    assert sorted(statuses) == [201] * 3 + [400] * 3
+    assert stock(root_app, product_id) == [1]
+
+
+def test_cancelling_returns_stock(root_app, shop, place_order):
+    client = root_app.test_client()
+    product_id = shop['products'][0]
+    order = place_order(shop['headers']['buyer1'], (product_id, 4)).get_json()['order']
+    response = client.put(
+        f"/api/orders/{order['id']}/status", json={'status': 'cancelled'}, headers=shop['headers']['farmer1']
+    )
+    assert response.status_code == 200
+    assert stock(root_app, product_id) == [10]
+
+
+def test_bool_quantity_is_rejected(root_app, shop, place_order, api_app, api_data):
+    product_id = shop['products'][0]
+    response = place_order(shop['headers']['buyer1'], (product_id, True))
+    assert response.status_code == 400
+    assert stock(root_app, product_id) == [10]
+
+    response = api_app.test_client().post('/api/orders', json={
+        'product_id': api_data['products'][0], 'quantity': True
+    }, headers=api_data['buyer'])
+    assert response.status_code == 400
+
+
+def test_bool_product_id_is_rejected(root_app, shop, place_order):
+    response = place_order(shop['headers']['buyer1'], (True, 1))
+    assert response.status_code == 400
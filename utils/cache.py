@@ -0,0 +1,281 @@
+import base64
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from flask import current_app, make_response, request
+from werkzeug.http import parse_date, unquote_etag
+
+from utils.conditional import not_modified
+
+
+class MemoryCache:
+    """Thread-safe in-process LRU cache whose entries also expire after a TTL."""
+
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._store(key, value, expires_at)
+
+    def add(self, key, value, ttl=None):
+        """Set ``key`` only if it holds no live entry; return whether it was set."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] >= now:
+                return False
+            self._store(key, value, now + (self.ttl if ttl is None else ttl))
+            return True
+
+    def _store(self, key, value, expires_at):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _encode(value):
+    def default(obj):
+        if isinstance(obj, bytes):
+            return {'__bytes__': base64.b64encode(obj).decode('ascii')}
+        raise TypeError(f'Cannot cache a {type(obj).__name__}')
+    return json.dumps(value, default=default, separators=(',', ':'))
+
+
+def _decode(raw):
+    def object_hook(obj):
+        if obj.keys() == {'__bytes__'}:
+            return base64.b64decode(obj['__bytes__'])
+        return obj
+    return json.loads(raw, object_hook=object_hook)
+
+
+class SQLiteCache:
+    """Cache kept in a SQLite file, so every worker process on a host shares it.
+
+    Values are stored as JSON, with ``bytes`` base64-encoded and tuples read
+    back as lists, so whatever is in the file decodes to plain data and never
+    runs code; a row that does not decode is a miss.
+    """
+
+    def __init__(self, path, max_entries=10000, ttl=60):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT value FROM cache WHERE key = ? AND expires_at >= ?',
+            (key, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        try:
+            return _decode(row[0])
+        except (TypeError, ValueError):
+            return None
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        connection = self._connection()
+        connection.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, _encode(value), expires_at)
+        )
+        # Every so often drop expired entries and trim the oldest beyond the cap
+        self._writes += 1
+        if self._writes % 100 == 0:
+            connection.execute('DELETE FROM cache WHERE expires_at < ?', (time.time(),))
+            connection.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+
+    def add(self, key, value, ttl=None):
+        """Set ``key`` only if it holds no live entry; return whether it was set."""
+        now = time.time()
+        connection = self._connection()
+        # Each statement is atomic, so of several processes adding the same key
+        # only one INSERT lands
+        connection.execute('DELETE FROM cache WHERE key = ? AND expires_at < ?', (key, now))
+        cursor = connection.execute(
+            'INSERT OR IGNORE INTO cache (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, _encode(value), now + (self.ttl if ttl is None else ttl))
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key):
+        self._connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+
+class NullCache:
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def add(self, key, value, ttl=None):
+        return True
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+
+class ResponseCache:
+    """Caches whole responses under keys that embed per-tag generations.
+
+    Invalidating a tag stores a fresh generation token for it, which changes
+    the key of every response cached under that tag; the old entries are
+    never read again and simply age out. Because the tokens live in the same
+    backend, a shared backend invalidates across all workers at once.
+    """
+
+    # Generation tokens must outlive the responses that depend on them
+    GENERATION_TTL = 7 * 24 * 3600
+
+    def __init__(self, backend, ttl=60):
+        self.backend = backend
+        self.ttl = ttl
+
+    def generation(self, tag):
+        # A missing token (never set, expired or evicted) is replaced by a new
+        # one rather than a fixed default, so old entries can never come back
+        token = self.backend.get(f'gen:{tag}')
+        if token is None:
+            token = uuid.uuid4().hex
+            self.backend.set(f'gen:{tag}', token, ttl=self.GENERATION_TTL)
+        return token
+
+    def key(self, path, args, tags):
+        # Query parameters are sorted so ?a=1&b=2 and ?b=2&a=1 share an entry
+        query = urlencode(sorted(args.items(multi=True)))
+        generations = ','.join(f'{tag}@{self.generation(tag)}' for tag in tags)
+        return f'{path}?{query}#{generations}'
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self.backend.set(f'gen:{tag}', uuid.uuid4().hex, ttl=self.GENERATION_TTL)
+
+
+def make_backend(name, path=None, max_entries=1024, ttl=60):
+    """Build the 'memory', 'sqlite' or 'none' backend named in the config."""
+    if name == 'sqlite':
+        return SQLiteCache(path, ttl=ttl)
+    if name == 'memory':
+        return MemoryCache(max_entries=max_entries, ttl=ttl)
+    if name == 'none':
+        return NullCache()
+    raise ValueError(f'Unknown cache backend: {name}')
+
+
+def init_response_cache(app):
+    ttl = app.config.get('RESPONSE_CACHE_TTL', 60)
+    backend = make_backend(
+        app.config.get('RESPONSE_CACHE_BACKEND', 'memory'),
+        path=app.config.get('RESPONSE_CACHE_PATH'),
+        max_entries=app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 1024),
+        ttl=ttl,
+    )
+    app.extensions['response_cache'] = ResponseCache(backend, ttl=ttl)
+
+
+def invalidate_cache(*tags):
+    cache = current_app.extensions.get('response_cache')
+    if cache is not None:
+        cache.invalidate(*tags)
+
+
+def cached_response(*tags, ttl=None):
+    """Cache a view's successful anonymous GET responses.
+
+    ``tags`` are format strings filled from the view arguments, for example
+    ``'product:{product_id}'``; call ``invalidate_cache`` with the same tags
+    from the write paths that change the underlying rows.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = current_app.extensions.get('response_cache')
+            if cache is None or request.method != 'GET' or 'Authorization' in request.headers:
+                return view(*args, **kwargs)
+
+            key = cache.key(request.path, request.args, [tag.format(**kwargs) for tag in tags])
+            entry = cache.backend.get(key)
+            if entry is not None:
+                body, headers = entry
+                etag, _ = unquote_etag(headers.get('ETag'))
+                if etag:
+                    cached = not_modified(etag, parse_date(headers.get('Last-Modified')))
+                    if cached:
+                        return cached
+                response = current_app.response_class(body, status=200, headers=headers)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                headers = {
+                    name: response.headers[name]
+                    for name in ('Content-Type', 'ETag', 'Last-Modified')
+                    if name in response.headers
+                }
+                cache.backend.set(key, (response.get_data(), headers), ttl=ttl or cache.ttl)
+                response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
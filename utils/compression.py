@@ -0,0 +1,133 @@
+import gzip
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional, gzip is used without it
+    brotli = None
+
+DEFAULT_MIMETYPES = (
+    'application/json',
+    'application/x-ndjson',
+    'application/javascript',
+    'image/svg+xml',
+    'text/css',
+    'text/csv',
+    'text/html',
+    'text/javascript',
+    'text/plain',
+)
+
+
+class _Compressor:
+    """Incremental encoder for one response body in either encoding."""
+
+    def __init__(self, encoding, gzip_level, brotli_quality):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits=31 writes the gzip header and trailer around the deflate stream
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self._brotli.process(data)
+        return self._zlib.compress(data)
+
+    def flush(self):
+        if self.encoding == 'br':
+            return self._brotli.flush()
+        return self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+def _compress_stream(chunks, compressor):
+    # Flush after every chunk so a streamed export still reaches the client
+    # batch by batch instead of sitting in the encoder's buffer
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            if chunk:
+                yield compressor.compress(chunk) + compressor.flush()
+        yield compressor.finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+class ResponseCompressor:
+    """Brotli or gzip encode text responses the client accepts compressed.
+
+    Only bodies whose mimetype is in ``mimetypes`` are touched; images and
+    other already-compressed files pass through. Buffered bodies shorter
+    than ``min_size`` are sent as they are, since the headers would outweigh
+    the saving. Streamed bodies are compressed chunk by chunk.
+    """
+
+    def __init__(self, min_size=500, mimetypes=DEFAULT_MIMETYPES, gzip_level=6, brotli_quality=4):
+        self.min_size = min_size
+        self.mimetypes = frozenset(mimetypes)
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    def _compressible(self, response):
+        return (
+            response.mimetype in self.mimetypes
+            and 200 <= response.status_code < 300
+            and response.status_code != 204
+            and 'Content-Encoding' not in response.headers
+            # send_file responses hand the file straight to the server
+            and not response.direct_passthrough
+        )
+
+    def __call__(self, response):
+        if request.method == 'HEAD' or not self._compressible(response):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+            response.response = _compress_stream(response.response, compressor)
+            response.headers.pop('Content-Length', None)
+        else:
+            body = response.get_data()
+            if len(body) < self.min_size:
+                return response
+            if encoding == 'br':
+                compressed = brotli.compress(body, quality=self.brotli_quality)
+            else:
+                compressed = gzip.compress(body, self.gzip_level, mtime=0)
+            if len(compressed) >= len(body):
+                return response
+            response.set_data(compressed)
+
+        response.headers['Content-Encoding'] = encoding
+        # The encoded bytes differ, so a strong validator no longer matches them
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def init_compression(app):
+    compressor = ResponseCompressor(
+        min_size=app.config.get('COMPRESS_MIN_SIZE', 500),
+        mimetypes=app.config.get('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES),
+        gzip_level=app.config.get('COMPRESS_GZIP_LEVEL', 6),
+        brotli_quality=app.config.get('COMPRESS_BROTLI_QUALITY', 4),
+    )
+    app.extensions['response_compressor'] = compressor
+    app.after_request(compressor)
@@ -0,0 +1,48 @@
+import hashlib
+from datetime import timezone
+
+from flask import make_response, request
+
+
+def make_etag(*parts):
+    """Hash cheap validators (ids, counts, timestamps) into an ETag value."""
+    raw = '|'.join('' if part is None else str(part) for part in parts)
+    return hashlib.sha1(raw.encode()).hexdigest()[:24]
+
+
+def _as_utc(value):
+    # Timestamps are stored as naive UTC; HTTP dates have one-second precision
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def not_modified(etag, last_modified=None):
+    """Return a 304 response when the client's copy is current, else None.
+
+    If-None-Match wins over If-Modified-Since, as RFC 9110 requires.
+    """
+    last_modified = _as_utc(last_modified)
+
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified is not None:
+        fresh = last_modified <= request.if_modified_since
+    else:
+        fresh = False
+
+    if not fresh:
+        return None
+
+    response = make_response('', 304)
+    return with_validators(response, etag, last_modified)
+
+
+def with_validators(response, etag, last_modified=None):
+    response = make_response(response)
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = _as_utc(last_modified)
+    return response
@@ -0,0 +1,118 @@
+import functools
+import hashlib
+import time
+
+from flask import current_app, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+
+from utils.cache import make_backend
+
+HEADER = 'Idempotency-Key'
+# Headers of the first response that a replay repeats
+REPLAYED_HEADERS = ('Content-Type', 'Location', 'ETag')
+
+
+class IdempotencyStore:
+    """Remembers the response to each ``Idempotency-Key`` for ``ttl`` seconds.
+
+    A key is claimed with the backend's atomic ``add`` before the view runs,
+    so of several concurrent requests with the same key exactly one executes;
+    the others wait up to ``wait`` seconds for its response and replay it.
+    Claims expire after ``lock_ttl`` so a worker that dies mid-request does
+    not block the key for the whole ``ttl``.
+    """
+
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, backend, ttl=24 * 3600, lock_ttl=60, wait=10):
+        self.backend = backend
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.wait = wait
+
+    def claim(self, key, fingerprint):
+        return self.backend.add(key, ('pending', fingerprint), ttl=self.lock_ttl)
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def complete(self, key, fingerprint, response):
+        headers = {name: response.headers[name] for name in REPLAYED_HEADERS if name in response.headers}
+        entry = ('done', fingerprint, response.status_code, response.get_data(), headers)
+        self.backend.set(key, entry, ttl=self.ttl)
+
+    def release(self, key):
+        self.backend.delete(key)
+
+    def wait_for(self, key):
+        """Poll until the request holding ``key`` finishes; None if it never does."""
+        deadline = time.monotonic() + self.wait
+        while time.monotonic() < deadline:
+            entry = self.backend.get(key)
+            if entry is None or entry[0] == 'done':
+                return entry
+            time.sleep(self.POLL_INTERVAL)
+        return self.backend.get(key)
+
+
+def _replay(entry):
+    _, _, status, body, headers = entry
+    response = current_app.response_class(body, status=status, headers=headers)
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view):
+    """Let clients retry a POST safely by sending an ``Idempotency-Key`` header.
+
+    Keys are scoped to the authenticated user and the path, so apply this
+    below ``@jwt_required()``. Reusing a key with a different body is a 422;
+    responses of 5xx are not stored, so those can be retried with the same key.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        store = current_app.extensions.get('idempotency_store')
+        idempotency_key = request.headers.get(HEADER)
+        if store is None or not idempotency_key:
+            return view(*args, **kwargs)
+
+        key = f'idem:{get_jwt_identity()}:{request.method}:{request.path}:{idempotency_key}'
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+
+        while True:
+            entry = store.get(key)
+            if entry is None and store.claim(key, fingerprint):
+                break
+            if entry is None or entry[0] == 'pending':
+                entry = store.wait_for(key)
+                if entry is None:
+                    # The other request failed and released the key; try to take it
+                    continue
+                if entry[0] == 'pending':
+                    return jsonify({'error': f'A request with this {HEADER} is still in progress'}), 409
+            if entry[1] != fingerprint:
+                return jsonify({'error': f'{HEADER} was already used with a different request body'}), 422
+            return _replay(entry)
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            store.release(key)
+            raise
+        if response.status_code >= 500 or response.is_streamed:
+            store.release(key)
+        else:
+            store.complete(key, fingerprint, response)
+        return response
+    return wrapper
+
+
+def init_idempotency(app):
+    backend = make_backend(
+        app.config.get('IDEMPOTENCY_BACKEND', 'memory'),
+        path=app.config.get('IDEMPOTENCY_PATH'),
+        max_entries=app.config.get('IDEMPOTENCY_MAX_ENTRIES', 10000),
+    )
+    app.extensions['idempotency_store'] = IdempotencyStore(
+        backend, ttl=app.config.get('IDEMPOTENCY_TTL', 24 * 3600)
+    )
@@ -0,0 +1,140 @@
+import functools
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from PIL import Image, ImageOps
+
+# Thumbnail widths in pixels; widths larger than the original are clamped
+VARIANT_WIDTHS = (160, 320, 640)
+
+# Format name -> (file extension, Pillow save options)
+VARIANT_FORMATS = {
+    'webp': ('webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+
+
+def allowed_image(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def static_url(relative_path):
+    # Built from the app rather than url_for so it also works in worker threads
+    return f'{current_app.static_url_path}/{relative_path}'
+
+
+def _manifest_path(static_folder, relative_path):
+    folder, filename = os.path.split(relative_path)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(static_folder, folder, 'variants', f'{stem}.json')
+
+
+def generate_variants(static_folder, relative_path, widths=VARIANT_WIDTHS):
+    """Write resized WebP and JPEG copies of an image next to the original.
+
+    Returns ``{format: {width: relative_path}}`` and also stores it as a small
+    JSON manifest beside the variants, which is what the templates read.
+    """
+    folder, filename = os.path.split(relative_path)
+    stem = os.path.splitext(filename)[0]
+    variant_folder = os.path.join(folder, 'variants')
+    os.makedirs(os.path.join(static_folder, variant_folder), exist_ok=True)
+
+    variants = {name: {} for name in VARIANT_FORMATS}
+    with Image.open(os.path.join(static_folder, relative_path)) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        # JPEG has no alpha channel, so transparent areas are flattened onto white
+        if image.mode == 'RGBA':
+            flat = Image.new('RGB', image.size, 'white')
+            flat.paste(image, mask=image.getchannel('A'))
+        else:
+            flat = image
+
+        for width in sorted({min(width, image.width) for width in widths}):
+            height = max(1, round(image.height * width / image.width))
+            for name, (extension, options) in VARIANT_FORMATS.items():
+                source = image if name == 'webp' else flat
+                resized = source.resize((width, height), Image.LANCZOS) if width != image.width else source
+                target = f'{variant_folder}/{stem}-{width}.{extension}'
+                # Write to a temporary name first so readers never see a partial file
+                temporary = os.path.join(static_folder, target + '.tmp')
+                resized.save(temporary, format=name.upper(), **options)
+                os.replace(temporary, os.path.join(static_folder, target))
+                variants[name][width] = target
+
+    manifest = _manifest_path(static_folder, relative_path)
+    with open(manifest + '.tmp', 'w') as handle:
+        json.dump(variants, handle)
+    os.replace(manifest + '.tmp', manifest)
+    return variants
+
+
+@functools.lru_cache(maxsize=4096)
+def _read_manifest(path, mtime_ns):
+    # mtime is part of the key, so a regenerated manifest is read again
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def load_variants(static_folder, relative_path):
+    path = _manifest_path(static_folder, relative_path)
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return {}
+    return _read_manifest(path, mtime_ns)
+
+
+def image_srcset(relative_path, image_format='jpeg'):
+    """Template helper: the ``srcset`` for an image's variants, or '' if none exist yet."""
+    if not relative_path:
+        return ''
+    variants = load_variants(current_app.static_folder, relative_path).get(image_format, {})
+    return ', '.join(
+        f'{static_url(path)} {width}w'
+        for width, path in sorted(variants.items(), key=lambda item: int(item[0]))
+    )
+
+
+class ImagePipeline:
+    """Generates image variants on a pool of worker threads.
+
+    Pillow releases the GIL while it decodes, resizes and encodes, so a small
+    thread pool keeps several uploads processing in parallel while the upload
+    request itself returns as soon as the original is on disk.
+    """
+
+    def __init__(self, app, max_workers=2):
+        self.app = app
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image-variants')
+
+    def submit(self, relative_path, on_complete=None):
+        """Queue variant generation; ``on_complete(variants)`` runs in an app context."""
+        return self.executor.submit(self._run, relative_path, on_complete)
+
+    def _run(self, relative_path, on_complete):
+        with self.app.app_context():
+            try:
+                variants = generate_variants(self.app.static_folder, relative_path)
+                if on_complete is not None:
+                    on_complete(variants)
+                return variants
+            except Exception:
+                self.app.logger.exception('Could not generate variants for %s', relative_path)
+                raise
+
+
+def init_image_pipeline(app):
+    app.extensions['image_pipeline'] = ImagePipeline(
+        app, max_workers=app.config.get('IMAGE_WORKERS', 2)
+    )
+    app.jinja_env.globals['image_srcset'] = image_srcset
+
+
+def process_image(relative_path, on_complete=None):
+    return current_app.extensions['image_pipeline'].submit(relative_path, on_complete)
@@ -0,0 +1,72 @@
+import dataclasses
+import decimal
+import uuid
+from datetime import date, datetime, time
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def _default(obj):
+    # Types neither encoder handles natively. Dates are ISO 8601 so responses
+    # look the same whichever encoder is in use.
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider that encodes with orjson when it is installed.
+
+    orjson serializes dicts, lists and datetimes in C, several times faster
+    than the stdlib encoder on list endpoints. Without it, or when a caller
+    passes encoder options orjson does not understand, the stdlib encoder is
+    used with the same ``default`` so the output is identical.
+    """
+
+    default = staticmethod(_default)
+
+    def _orjson_options(self, indent=False):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {'indent', 'separators'}:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(
+            obj, default=_default, option=self._orjson_options(indent=bool(kwargs.get('indent')))
+        ).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        # Encode straight to bytes rather than through an intermediate str
+        body = orjson.dumps(obj, default=_default, option=self._orjson_options(indent))
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+
+def init_json_provider(app):
+    app.json = FastJSONProvider(app)
@@ -0,0 +1,176 @@
+import hashlib
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app, request
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+
+# Content-addressed URLs never change meaning, so clients may keep them for a year
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+CHUNK_SIZE = 64 * 1024
+
+
+class MediaStore:
+    """Stores uploads under the SHA-256 of their bytes, sharded by hash prefix.
+
+    ``media/ab/cd/abcd....png`` is written once however many times the same
+    photo is uploaded. ``blob_model`` keeps one row per file with a reference
+    count, and ``collect_garbage`` removes files nothing points at any more.
+    """
+
+    def __init__(self, db, blob_model, static_folder, folder='media'):
+        self.db = db
+        self.blob_model = blob_model
+        self.static_folder = static_folder
+        self.folder = folder
+
+    def path_for(self, digest, extension):
+        return f'{self.folder}/{digest[:2]}/{digest[2:4]}/{digest}.{extension}'
+
+    def put(self, file_storage):
+        """Store an upload and return its relative path under the static folder."""
+        extension = file_storage.filename.rsplit('.', 1)[1].lower()
+        os.makedirs(os.path.join(self.static_folder, self.folder), exist_ok=True)
+        temporary = os.path.join(self.static_folder, self.folder, f'.upload-{uuid.uuid4().hex}')
+
+        # Hash while writing so the upload is read only once
+        digest = hashlib.sha256()
+        size = 0
+        with open(temporary, 'wb') as handle:
+            for chunk in iter(lambda: file_storage.stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                handle.write(chunk)
+                size += len(chunk)
+        digest = digest.hexdigest()
+
+        existing = self._touch(digest)
+        if existing is not None:
+            os.remove(temporary)
+            return existing
+
+        relative_path = self.path_for(digest, extension)
+        target = os.path.join(self.static_folder, relative_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # A file already at the path has no row, so collect_garbage may be
+        # about to remove it; the fresh copy gets a new mtime
+        os.replace(temporary, target)
+        try:
+            with self.db.session.begin_nested():
+                self.db.session.add(self.blob_model(digest=digest, path=relative_path, size=size))
+        except IntegrityError:
+            # A concurrent upload of the same bytes recorded it first
+            return self._touch(digest)
+        return relative_path
+
+    def _touch(self, digest):
+        """Return the stored path for ``digest``, or None, marking the blob as just used.
+
+        Finding and touching the row in one statement keeps an orphan that is
+        being reused out of ``collect_garbage`` until this transaction's
+        reference is committed: garbage collection either skips it as recent
+        or has already deleted it, and then this returns None.
+        """
+        return self.db.session.execute(
+            update(self.blob_model)
+            .where(self.blob_model.digest == digest)
+            .values(updated_at=datetime.utcnow())
+            .returning(self.blob_model.path)
+        ).scalar()
+
+    def path_from_url(self, url):
+        """Return the store path behind a static URL, or None for other URLs."""
+        prefix = f'{current_app.static_url_path}/{self.folder}/'
+        if not url or not url.startswith(prefix):
+            return None
+        return url[len(current_app.static_url_path) + 1:]
+
+    def _adjust(self, relative_path, delta):
+        if relative_path:
+            self.db.session.execute(
+                update(self.blob_model)
+                .where(self.blob_model.path == relative_path)
+                .values(
+                    ref_count=self.blob_model.ref_count + delta,
+                    updated_at=datetime.utcnow()
+                )
+            )
+
+    def acquire(self, relative_path):
+        self._adjust(relative_path, 1)
+
+    def release(self, relative_path):
+        self._adjust(relative_path, -1)
+
+    def replace(self, old_url, new_url):
+        """Move a reference from one image URL to another in the current transaction."""
+        if old_url != new_url:
+            self.release(self.path_from_url(old_url))
+            self.acquire(self.path_from_url(new_url))
+
+    def _remove_files(self, relative_path):
+        folder, filename = os.path.split(os.path.join(self.static_folder, relative_path))
+        stem = os.path.splitext(filename)[0]
+        variants = os.path.join(folder, 'variants')
+        paths = [os.path.join(folder, filename)]
+        if os.path.isdir(variants):
+            paths += [
+                os.path.join(variants, name) for name in os.listdir(variants)
+                if name.startswith(f'{stem}-') or name == f'{stem}.json'
+            ]
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def collect_garbage(self, grace=timedelta(hours=1)):
+        """Delete unreferenced files and their variants; return how many went.
+
+        ``grace`` keeps files whose last reference change is recent, so an
+        upload whose product update has not committed yet is never removed.
+        """
+        cutoff = datetime.utcnow() - grace
+        # The rows are chosen by the DELETE itself, so a blob an upload has
+        # just touched is never among them. They stay locked until the commit,
+        # so such an upload waits for the files to go and then stores its own
+        orphans = self.db.session.execute(
+            delete(self.blob_model)
+            .where(self.blob_model.ref_count <= 0, self.blob_model.updated_at < cutoff)
+            .returning(self.blob_model.path)
+        ).scalars().all()
+        for path in orphans:
+            self._remove_files(path)
+        self.db.session.commit()
+
+        # Files left behind by requests that failed before recording a row
+        known = {path for path, in self.db.session.query(self.blob_model.path)}
+        removed = len(orphans)
+        root = os.path.join(self.static_folder, self.folder)
+        for directory, subdirectories, filenames in os.walk(root):
+            subdirectories[:] = [name for name in subdirectories if name != 'variants']
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                relative_path = os.path.relpath(path, self.static_folder).replace(os.sep, '/')
+                if relative_path not in known and os.path.getmtime(path) < time.time() - grace.total_seconds():
+                    self._remove_files(relative_path)
+                    removed += 1
+        return removed
+
+
+def init_media_store(app, db, blob_model):
+    app.extensions['media_store'] = MediaStore(db, blob_model, app.static_folder)
+    media_prefix = f'{app.static_url_path}/media/'
+
+    @app.after_request
+    def cache_media_forever(response):
+        if request.path.startswith(media_prefix) and response.status_code in (200, 304):
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+def media_store():
+    return current_app.extensions['media_store']
@@ -0,0 +1,38 @@
+from sqlalchemy import exists, insert, select
+
+
+def record_order_sellers(db, seller_model, order, seller_ids):
+    """Write the order_sellers rows of a new order in one multi-row INSERT.
+
+    ``status`` and ``created_at`` are copied from the order so a farmer's
+    inbox can be filtered and sorted without joining back to it.
+    """
+    db.session.execute(insert(seller_model), [{
+        'seller_id': seller_id,
+        'order_id': order.id,
+        'status': order.status,
+        'created_at': order.created_at
+    } for seller_id in seller_ids])
+
+
+def backfill_order_sellers(db, order_model, item_model, product_model, seller_model):
+    """Add the missing order_sellers rows of existing orders; return how many.
+
+    One ``INSERT ... SELECT DISTINCT`` over the orders' items and products
+    skips (seller, order) pairs that already have a row, so it is safe to run
+    again after a partial backfill.
+    """
+    missing = select(
+        product_model.seller_id, order_model.id, order_model.status, order_model.created_at
+    ).distinct().join(
+        item_model, item_model.order_id == order_model.id
+    ).join(
+        product_model, product_model.id == item_model.product_id
+    ).where(~exists().where(
+        seller_model.order_id == order_model.id, seller_model.seller_id == product_model.seller_id
+    ))
+    result = db.session.execute(insert(seller_model).from_select(
+        ['seller_id', 'order_id', 'status', 'created_at'], missing
+    ))
+    db.session.commit()
+    return result.rowcount
@@ -0,0 +1,256 @@
+import json
+import logging
+import os
+import time
+import urllib.request
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, select, text
+
+logger = logging.getLogger(__name__)
+
+
+class CallbackSink:
+    """Hands each batch to ``callback(events)`` in this process."""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def send(self, events):
+        self.callback(events)
+
+
+class FileSink:
+    """Appends one JSON line per event, synced to disk before the cursor moves."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, events):
+        with open(self.path, 'a', encoding='utf-8') as handle:
+            for event in events:
+                handle.write(json.dumps(event) + '\n')
+            handle.flush()
+            os.fsync(handle.fileno())
+
+
+class WebhookSink:
+    """POSTs each batch as ``{"events": [...]}``; a non-2xx answer fails the batch."""
+
+    def __init__(self, url, timeout=10, headers=None):
+        self.url = url
+        self.timeout = timeout
+        self.headers = headers or {}
+
+    def send(self, events):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({'events': events}).encode('utf-8'),
+            headers={'Content-Type': 'application/json', **self.headers},
+            method='POST'
+        )
+        # urlopen raises HTTPError for 4xx/5xx answers
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class Outbox:
+    """Events written in the same transaction as the change they describe.
+
+    Routes call ``record`` before committing, so an event exists exactly when
+    its order, message or review change does. Consumers read the table through
+    an ``OutboxDispatcher`` instead of polling the application tables.
+    """
+
+    def __init__(self, db, event_model, cursor_model, batch_size=100):
+        self.db = db
+        self.event_model = event_model
+        self.cursor_model = cursor_model
+        self.batch_size = batch_size
+
+    def record(self, topic, aggregate_id, payload):
+        self.record_many(topic, [(aggregate_id, payload)])
+
+    def record_many(self, topic, events):
+        """Queue ``(aggregate_id, payload)`` pairs with one multi-row INSERT."""
+        now = datetime.utcnow()
+        rows = [{
+            'topic': topic,
+            'aggregate_id': aggregate_id,
+            'payload': current_app.json.dumps(payload),
+            'created_at': now
+        } for aggregate_id, payload in events]
+        if rows:
+            self.db.session.execute(insert(self.event_model), rows)
+
+    def dispatcher(self, consumer, sink, **options):
+        options.setdefault('batch_size', self.batch_size)
+        return OutboxDispatcher(self.db, self.event_model, self.cursor_model, sink, consumer, **options)
+
+    def prune(self, older_than=timedelta(days=7)):
+        """Delete old events every consumer has already received; return how many.
+
+        The last delivered event is kept, so the table is never emptied and a
+        database that hands out max(id) + 1 cannot give a new event an id
+        the cursors have already passed.
+        """
+        delivered = self.db.session.execute(select(func.min(self.cursor_model.position))).scalar()
+        if delivered is None:
+            return 0
+        result = self.db.session.execute(
+            delete(self.event_model).where(
+                self.event_model.id < delivered,
+                self.event_model.created_at < datetime.utcnow() - older_than
+            )
+        )
+        self.db.session.commit()
+        return result.rowcount
+
+
+class OutboxDispatcher:
+    """Delivers outbox events to ``sink`` in id order, at least once.
+
+    ``consumer`` names a row of the cursor table holding the id of the last
+    event the sink accepted. Each batch is read after that id and the cursor
+    only moves once ``sink.send`` returns, so after a crash or a failing sink
+    the batch is sent again rather than lost; sinks should skip event ids they
+    have already seen. Consumers with their own cursors read independently.
+
+    An id is taken when its row is inserted but only becomes visible when its
+    transaction commits, so a batch stops at a gap in the ids until no
+    transaction that could still fill it is running:
+
+    - SQLite runs one write transaction at a time, so once a later id is
+      visible the writer of an earlier one has finished: the gap is a
+      rolled-back or pruned id and is skipped straight away.
+    - PostgreSQL: when a gap is first seen the dispatcher notes the next
+      transaction id. Whatever transaction took an id in the gap started
+      before that, so the gap is skipped once every transaction older than
+      the noted id has finished, however long it stayed open.
+    - Other databases fall back on time: the gap is skipped once the event
+      after it is ``gap_timeout`` old. This is a guess; a transaction that
+      stays open longer than that after recording its event commits behind
+      the cursor, and the event is never delivered.
+    """
+
+    def __init__(self, db, event_model, cursor_model, sink, consumer,
+                 batch_size=100, gap_timeout=timedelta(seconds=30)):
+        self.db = db
+        self.event_model = event_model
+        self.cursor_model = cursor_model
+        self.sink = sink
+        self.consumer = consumer
+        self.batch_size = batch_size
+        self.gap_timeout = gap_timeout
+        # First id of a gap -> next transaction id when it was seen (PostgreSQL)
+        self._horizons = {}
+
+    def position(self):
+        cursor = self.db.session.get(self.cursor_model, self.consumer)
+        return cursor.position if cursor else 0
+
+    def _dialect(self):
+        return self.db.session.get_bind().dialect.name
+
+    def _snapshot(self):
+        """PostgreSQL's oldest running and next transaction ids."""
+        return self.db.session.execute(text(
+            'SELECT pg_snapshot_xmin(s)::text::bigint, pg_snapshot_xmax(s)::text::bigint '
+            'FROM pg_current_snapshot() AS s'
+        )).one()
+
+    def _gap_settled(self, gap, event, oldest_running):
+        dialect = self._dialect()
+        if dialect == 'sqlite':
+            return True
+        if dialect == 'postgresql':
+            horizon = self._horizons.get(gap)
+            if horizon is None:
+                # Noted after the events were read, so it is past any transaction holding the gap
+                self._horizons[gap] = self._snapshot()[1]
+                return False
+            return oldest_running >= horizon
+        return event.created_at <= datetime.utcnow() - self.gap_timeout
+
+    def _deliverable(self, position, events, oldest_running):
+        ready = []
+        expected = position + 1
+        for event in events:
+            if event.id != expected and not self._gap_settled(expected, event, oldest_running):
+                break
+            ready.append(event)
+            expected = event.id + 1
+        return ready
+
+    @staticmethod
+    def _message(event):
+        return {
+            'id': event.id,
+            'topic': event.topic,
+            'aggregate_id': event.aggregate_id,
+            'payload': json.loads(event.payload),
+            'created_at': event.created_at.isoformat()
+        }
+
+    def _checkpoint(self, position):
+        cursor = self.db.session.get(self.cursor_model, self.consumer)
+        if cursor is None:
+            self.db.session.add(self.cursor_model(consumer=self.consumer, position=position))
+        else:
+            cursor.position = position
+        self.db.session.commit()
+
+    def dispatch_batch(self):
+        """Send the next batch and move the cursor past it; return its size."""
+        position = self.position()
+        # Taken before the events are read: a transaction that finishes later
+        # may also have committed too late for the read
+        oldest_running = self._snapshot()[0] if self._dialect() == 'postgresql' else None
+        events = self.db.session.execute(
+            select(self.event_model)
+            .where(self.event_model.id > position)
+            .order_by(self.event_model.id)
+            .limit(self.batch_size)
+        ).scalars().all()
+        events = self._deliverable(position, events, oldest_running)
+        if not events:
+            # End the read transaction so the next poll sees new commits
+            self.db.session.rollback()
+            return 0
+        self.sink.send([self._message(event) for event in events])
+        self._checkpoint(events[-1].id)
+        self._horizons = {gap: horizon for gap, horizon in self._horizons.items() if gap > events[-1].id}
+        return len(events)
+
+    def run(self, poll_interval=1.0, max_backoff=60.0, once=False):
+        """Drain the outbox, then keep polling unless ``once``; return events sent."""
+        sent = 0
+        backoff = poll_interval
+        while True:
+            try:
+                count = self.dispatch_batch()
+            except Exception:
+                self.db.session.rollback()
+                if once:
+                    raise
+                logger.exception('Outbox consumer %s failed; retrying in %.0fs', self.consumer, backoff)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, max_backoff)
+                continue
+            sent += count
+            backoff = poll_interval
+            if count < self.batch_size:
+                if once:
+                    return sent
+                time.sleep(poll_interval)
+
+
+def init_outbox(app, db, event_model, cursor_model):
+    app.extensions['outbox'] = Outbox(
+        db, event_model, cursor_model, batch_size=app.config.get('OUTBOX_BATCH_SIZE', 100)
+    )
+
+
+def outbox():
+    return current_app.extensions['outbox']
@@ -0,0 +1,120 @@
+import base64
+import json
+import math
+from datetime import datetime
+from numbers import Real
+
+from sqlalchemy import DateTime, Float, Integer, Numeric, and_, or_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def get_page_size(args, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    # Clamp the requested page size so a client cannot ask for the whole table
+    limit = args.get('limit', default, type=int)
+    if limit is None or limit < 1:
+        return default
+    return min(limit, maximum)
+
+
+def encode_cursor(sort, values):
+    """Pack the sort name and the last row's key values into an opaque token."""
+    payload = {
+        's': sort,
+        'k': [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, sort):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+    except ValueError:
+        raise InvalidCursor('Invalid cursor')
+
+    if not isinstance(payload, dict) or not isinstance(payload.get('k'), list):
+        raise InvalidCursor('Invalid cursor')
+    if payload.get('s') != sort:
+        raise InvalidCursor('Cursor does not match the requested sort order')
+
+    return payload['k']
+
+
+def _coerce(column, value):
+    # Cursors come from the client, so a key of the wrong type must be a 400
+    # here rather than a bind error when the query runs
+    column_type = getattr(column, 'type', None)
+    if value is None:
+        return value
+    if isinstance(column_type, DateTime):
+        try:
+            return datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise InvalidCursor('Invalid cursor')
+    if isinstance(column_type, Integer):
+        if not _is_int(value):
+            raise InvalidCursor('Invalid cursor')
+    elif isinstance(column_type, (Numeric, Float)):
+        if isinstance(value, bool) or not isinstance(value, Real) or not math.isfinite(value):
+            raise InvalidCursor('Invalid cursor')
+    return value
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def paginate_keyset(query, sort, key, tiebreaker, descending=False, cursor=None,
+                    limit=DEFAULT_PAGE_SIZE, row_keys=None):
+    """Return one page of ``query`` ordered by ``(key, tiebreaker)`` plus the next cursor.
+
+    The cursor is turned into a ``WHERE (key, id) > (:key, :id)`` predicate so
+    every page is an index range scan of ``limit`` rows, however deep it is.
+    ``row_keys`` returns ``(key, id)`` for a result row when ``key`` is not a
+    plain attribute of the row (e.g. a relevance score).
+    """
+    if cursor:
+        values = decode_cursor(cursor, sort)
+        if len(values) != 2:
+            raise InvalidCursor('Invalid cursor')
+        if not _is_int(values[1]):
+            raise InvalidCursor('Invalid cursor')
+        last_key, last_id = _coerce(key, values[0]), values[1]
+
+        if descending:
+            query = query.filter(or_(
+                key < last_key,
+                and_(key == last_key, tiebreaker < last_id)
+            ))
+        else:
+            query = query.filter(or_(
+                key > last_key,
+                and_(key == last_key, tiebreaker > last_id)
+            ))
+
+    if descending:
+        query = query.order_by(key.desc(), tiebreaker.desc())
+    else:
+        query = query.order_by(key.asc(), tiebreaker.asc())
+
+    # Fetch one extra row to find out whether there is a next page
+    rows = query.limit(limit + 1).all()
+    items = rows[:limit]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        if row_keys is None:
+            keys = [getattr(last, key.key), getattr(last, tiebreaker.key)]
+        else:
+            keys = list(row_keys(last))
+        next_cursor = encode_cursor(sort, keys)
+
+    return items, next_cursor
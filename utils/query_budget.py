@@ -0,0 +1,59 @@
+import functools
+import logging
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+
+def init_query_counter(app):
+    """Count SQL statements per request and report them in debug and tests.
+
+    Views declare how many statements they may run with ``@query_budget``.
+    Going over budget raises in testing (or with ``QUERY_BUDGET_STRICT``) so
+    an N+1 regression fails the test run, and only logs a warning otherwise.
+    """
+    if not event.contains(Engine, 'before_cursor_execute', _count_statement):
+        event.listen(Engine, 'before_cursor_execute', _count_statement)
+
+    @app.after_request
+    def add_query_count_header(response):
+        if app.debug or app.testing:
+            response.headers['X-Query-Count'] = str(g.get('query_count', 0))
+        return response
+
+
+def query_budget(limit):
+    """Allow a view ``limit`` SQL statements per request.
+
+    ``limit`` may be a callable, evaluated on each request, for views whose
+    statement count depends on the database they run against.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            start = g.get('query_count', 0)
+            response = view(*args, **kwargs)
+            used = g.get('query_count', 0) - start
+            budget = limit() if callable(limit) else limit
+
+            if used > budget:
+                message = f'{request.endpoint} ran {used} SQL statements, over its budget of {budget}'
+                if current_app.config.get('QUERY_BUDGET_STRICT', current_app.testing):
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+
+            return response
+        return wrapper
+    return decorator
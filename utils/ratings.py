@@ -0,0 +1,65 @@
+from sqlalchemy import func, select, update
+
+RATING_VALUES = range(1, 6)
+
+
+def valid_rating(value):
+    """True for an integer star rating from 1 to 5; floats and booleans are not ratings."""
+    return isinstance(value, int) and not isinstance(value, bool) and value in RATING_VALUES
+
+
+def apply_rating_change(db, product_model, product_id, added=None, removed=None):
+    """Adjust a product's stored review aggregates in the current transaction.
+
+    ``added`` is the rating being written and ``removed`` the rating being
+    replaced or deleted; pass both for an edit. The change is a single
+    ``UPDATE ... SET rating_sum = rating_sum + :delta`` so concurrent reviews
+    never overwrite each other's counts.
+    """
+    for rating in (added, removed):
+        if rating is not None and not valid_rating(rating):
+            raise ValueError(f'Invalid rating {rating!r}; expected an integer from 1 to 5')
+
+    values = {}
+    sum_delta = (added or 0) - (removed or 0)
+    count_delta = (added is not None) - (removed is not None)
+
+    if sum_delta:
+        values[product_model.rating_sum] = product_model.rating_sum + sum_delta
+    if count_delta:
+        values[product_model.rating_count] = product_model.rating_count + count_delta
+    if added != removed:
+        if added is not None:
+            column = getattr(product_model, f'rating_{added}')
+            values[column] = column + 1
+        if removed is not None:
+            column = getattr(product_model, f'rating_{removed}')
+            values[column] = column - 1
+
+    if values:
+        db.session.execute(
+            update(product_model).where(product_model.id == product_id).values(values)
+        )
+
+
+def rebuild_rating_aggregates(db, product_model, review_model):
+    """Recompute every product's aggregates from the reviews table in one UPDATE."""
+    def reviews_of_product():
+        return select(func.count(review_model.id)).where(
+            review_model.product_id == product_model.id
+        )
+
+    values = {
+        product_model.rating_sum: select(func.coalesce(func.sum(review_model.rating), 0)).where(
+            review_model.product_id == product_model.id
+        ).scalar_subquery(),
+        product_model.rating_count: reviews_of_product().scalar_subquery(),
+    }
+    for rating in RATING_VALUES:
+        values[getattr(product_model, f'rating_{rating}')] = reviews_of_product().where(
+            review_model.rating == rating
+        ).scalar_subquery()
+
+    db.session.execute(update(product_model).values(values))
+    db.session.commit()
+
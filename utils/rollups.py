@@ -0,0 +1,161 @@
+from collections import defaultdict
+
+from sqlalchemy import Date, and_, case, delete, distinct, exists, func, insert, literal, or_, select, union_all, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql, sqlite
+
+COUNTERS = ('revenue', 'units', 'order_count')
+PRODUCT_KEYS = ('seller_id', 'product_id', 'day')
+SELLER_KEYS = ('seller_id', 'day')
+
+# Dialects whose INSERT supports ON CONFLICT DO UPDATE
+UPSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+def sales_increments(lines, sign=1):
+    """Fold order lines into ``{key: (revenue, units, orders)}`` per rollup.
+
+    The rules, shared with ``record_sales`` in the Django project's
+    orders/models.py (keep the two in step):
+
+    - ``lines`` are ``(order_id, day, seller_id, product_id, quantity, price)``
+      and ``day`` is the date the order was placed;
+    - revenue is ``quantity * price`` and units is ``quantity``, summed;
+    - an order counts once per (seller, product, day) and once per
+      (seller, day) however many of its lines fall there;
+    - cancelled orders are not counted: cancelling passes the order's lines
+      with ``sign=-1`` to take them back out.
+
+    Returns ``(per_product, per_seller)``, keyed by PRODUCT_KEYS and SELLER_KEYS.
+    """
+    per_product = defaultdict(lambda: [0, 0, set()])
+    per_seller = defaultdict(lambda: [0, 0, set()])
+    for order_id, day, seller_id, product_id, quantity, price in lines:
+        for totals in (per_product[(seller_id, product_id, day)], per_seller[(seller_id, day)]):
+            totals[0] += quantity * price
+            totals[1] += quantity
+            totals[2].add(order_id)
+
+    def signed(groups):
+        return {
+            key: (sign * revenue, sign * units, sign * len(orders))
+            for key, (revenue, units, orders) in groups.items()
+        }
+
+    return signed(per_product), signed(per_seller)
+
+
+def sales_lines(order_model, item_model, product_model):
+    """Select every order line as the tuples ``sales_increments`` takes."""
+    return select(
+        item_model.order_id,
+        func.date(order_model.created_at, type_=Date).label('day'),
+        product_model.seller_id,
+        item_model.product_id,
+        item_model.quantity,
+        item_model.price_at_time.label('price'),
+    ).join(
+        order_model, order_model.id == item_model.order_id
+    ).join(
+        product_model, product_model.id == item_model.product_id
+    )
+
+
+def _add(db, model, keys, increments):
+    if not increments:
+        return
+    upsert = UPSERTS.get(db.session.get_bind().dialect.name)
+    if upsert is None:
+        _add_without_upsert(db, model, keys, increments)
+        return
+    statement = upsert(model)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={name: getattr(model, name) + getattr(statement.excluded, name) for name in COUNTERS}
+    )
+    db.session.execute(statement, [
+        dict(zip(keys, key), **dict(zip(COUNTERS, totals))) for key, totals in increments.items()
+    ])
+
+
+def _add_without_upsert(db, model, keys, increments):
+    # The same two steps as SalesRollup.add in the Django project: one INSERT
+    # ... SELECT of the rows that do not exist yet, at zero, then one relative
+    # UPDATE of every row
+    matches = [and_(*(getattr(model, name) == value for name, value in zip(keys, key))) for key in increments]
+    missing = [
+        select(
+            *(literal(value, getattr(model, name).type).label(name) for name, value in zip(keys, key)),
+            *(literal(0, getattr(model, name).type).label(name) for name in COUNTERS)
+        ).where(~exists().where(match))
+        for key, match in zip(increments, matches)
+    ]
+    statement = insert(model).from_select(
+        [*keys, *COUNTERS], missing[0] if len(missing) == 1 else union_all(*missing)
+    )
+    try:
+        with db.session.begin_nested():
+            db.session.execute(statement)
+    except IntegrityError:
+        # A concurrent order inserted one of the rows first; now it is skipped
+        with db.session.begin_nested():
+            db.session.execute(statement)
+
+    def per_row(index):
+        return case(*((match, totals[index]) for match, totals in zip(matches, increments.values())), else_=0)
+
+    db.session.execute(
+        update(model).where(or_(*matches)).values({
+            name: getattr(model, name) + per_row(index) for index, name in enumerate(COUNTERS)
+        }),
+        execution_options={'synchronize_session': False}
+    )
+
+
+def sales_statements(db):
+    """How many SQL statements ``apply_sales`` runs on this database, for query budgets."""
+    # One upsert per rollup, or a savepointed INSERT and an UPDATE per rollup
+    return 2 if db.session.get_bind().dialect.name in UPSERTS else 8
+
+
+def apply_sales(db, product_rollup, seller_rollup, lines, sign=1):
+    """Add order lines to the sales rollups in the current transaction.
+
+    Each table gets one ``INSERT ... ON CONFLICT DO UPDATE SET revenue =
+    revenue + excluded.revenue, ...`` for all of its rows, so the cost does
+    not grow with the order and concurrent orders on the same day add to
+    the counters instead of overwriting them. Databases without that upsert
+    (anything but SQLite and PostgreSQL) insert the missing rows at zero and
+    then run one relative UPDATE per table; ``sales_statements`` counts both.
+    """
+    per_product, per_seller = sales_increments(lines, sign)
+    _add(db, product_rollup, PRODUCT_KEYS, per_product)
+    _add(db, seller_rollup, SELLER_KEYS, per_seller)
+
+
+def rebuild_sales_rollups(db, product_rollup, seller_rollup, order_model, item_model, product_model):
+    """Recompute both rollups from the orders that are not cancelled.
+
+    Two ``INSERT ... SELECT``s aggregate ``sales_lines`` by the same rules
+    as ``sales_increments``, so a rebuild matches what the incremental
+    updates would have produced.
+    """
+    lines = sales_lines(order_model, item_model, product_model).where(
+        order_model.status != 'cancelled'
+    ).subquery()
+    totals = (
+        func.sum(lines.c.quantity * lines.c.price),
+        func.sum(lines.c.quantity),
+        func.count(distinct(lines.c.order_id)),
+    )
+    db.session.execute(delete(product_rollup))
+    db.session.execute(delete(seller_rollup))
+    db.session.execute(insert(product_rollup).from_select(
+        [*PRODUCT_KEYS, *COUNTERS],
+        select(*(lines.c[key] for key in PRODUCT_KEYS), *totals).group_by(*(lines.c[key] for key in PRODUCT_KEYS))
+    ))
+    db.session.execute(insert(seller_rollup).from_select(
+        [*SELLER_KEYS, *COUNTERS],
+        select(*(lines.c[key] for key in SELLER_KEYS), *totals).group_by(*(lines.c[key] for key in SELLER_KEYS))
+    ))
+    db.session.commit()
@@ -0,0 +1,213 @@
+import re
+
+from sqlalchemy import Float, Integer, event, inspect, text
+
+from utils.pagination import paginate_keyset
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    return [token.lower() for token in TOKEN_RE.findall(query or '')]
+
+
+class SQLiteSearchBackend:
+    """FTS5 virtual table keyed by product rowid, ranked with bm25."""
+
+    def __init__(self, table, fields):
+        self.table = table
+        self.fields = fields
+
+    def create(self, connection):
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+            f"USING fts5({', '.join(self.fields)}, "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        ))
+
+    def upsert(self, connection, rows):
+        self.delete(connection, [row['id'] for row in rows])
+        columns = ', '.join(self.fields)
+        params = ', '.join(f':{field}' for field in self.fields)
+        connection.execute(
+            text(f"INSERT INTO {self.table} (rowid, {columns}) VALUES (:id, {params})"),
+            rows
+        )
+
+    def delete(self, connection, ids):
+        connection.execute(
+            text(f"DELETE FROM {self.table} WHERE rowid = :id"),
+            [{'id': product_id} for product_id in ids]
+        )
+
+    def rebuild(self, connection, source_table):
+        columns = ', '.join(self.fields)
+        values = ', '.join(f"coalesce({field}, '')" for field in self.fields)
+        connection.execute(text(f"DELETE FROM {self.table}"))
+        connection.execute(text(
+            f"INSERT INTO {self.table} (rowid, {columns}) "
+            f"SELECT id, {values} FROM {source_table}"
+        ))
+
+    def match(self, tokens):
+        # Every token must match, each as a prefix; the first field weighs most
+        query = ' '.join(f'"{token}"*' for token in tokens)
+        weights = ', '.join(['10.0'] + ['1.0'] * (len(self.fields) - 1))
+        return text(
+            f"SELECT rowid AS product_id, bm25({self.table}, {weights}) AS rank "
+            f"FROM {self.table} WHERE {self.table} MATCH :query"
+        ).bindparams(query=query).columns(product_id=Integer, rank=Float)
+
+
+class PostgresSearchBackend:
+    """Side table holding a weighted tsvector per product behind a GIN index."""
+
+    def __init__(self, table, fields):
+        self.table = table
+        self.fields = fields
+
+    def _document(self, prefix=':'):
+        # setweight() gives A to the first field, B to the next, and so on
+        parts = [
+            f"setweight(to_tsvector('simple', coalesce({prefix}{field}, '')), '{'ABCD'[min(i, 3)]}')"
+            for i, field in enumerate(self.fields)
+        ]
+        return ' || '.join(parts)
+
+    def create(self, connection):
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            f"product_id INTEGER PRIMARY KEY, document TSVECTOR NOT NULL)"
+        ))
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{self.table}_document "
+            f"ON {self.table} USING GIN (document)"
+        ))
+
+    def upsert(self, connection, rows):
+        connection.execute(
+            text(
+                f"INSERT INTO {self.table} (product_id, document) "
+                f"VALUES (:id, {self._document()}) "
+                f"ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document"
+            ),
+            rows
+        )
+
+    def delete(self, connection, ids):
+        connection.execute(
+            text(f"DELETE FROM {self.table} WHERE product_id = ANY(:ids)"),
+            {'ids': list(ids)}
+        )
+
+    def rebuild(self, connection, source_table):
+        connection.execute(text(f"TRUNCATE {self.table}"))
+        connection.execute(text(
+            f"INSERT INTO {self.table} (product_id, document) "
+            f"SELECT id, {self._document(prefix='')} FROM {source_table}"
+        ))
+
+    def match(self, tokens):
+        # Negate ts_rank so that, as with bm25, a lower rank is a better match
+        query = ' & '.join(f'{token}:*' for token in tokens)
+        return text(
+            f"SELECT product_id, -ts_rank(document, to_tsquery('simple', :query)) AS rank "
+            f"FROM {self.table} WHERE document @@ to_tsquery('simple', :query)"
+        ).bindparams(query=query).columns(product_id=Integer, rank=Float)
+
+
+class ProductSearchIndex:
+    """Full-text index over product text fields, kept in sync on every flush.
+
+    SQLite databases use FTS5; PostgreSQL databases use a tsvector table with
+    a GIN index. The index rows are written on the same connection as the
+    product change, so they commit or roll back together.
+    """
+
+    backends = {
+        'sqlite': SQLiteSearchBackend,
+        'postgresql': PostgresSearchBackend,
+    }
+
+    def __init__(self, db, model, fields=('name', 'description')):
+        self.db = db
+        self.model = model
+        self.fields = fields
+        self.table = f'{model.__tablename__}_search'
+        self._backends = {}
+
+    def backend(self, connection):
+        # One backend per engine, created (and its table ensured) on first use
+        engine = connection.engine
+        if engine not in self._backends:
+            backend_class = self.backends.get(engine.dialect.name)
+            if backend_class is None:
+                raise RuntimeError(f'Full-text search is not supported on {engine.dialect.name}')
+            backend = backend_class(self.table, self.fields)
+            backend.create(connection)
+            self._backends[engine] = backend
+        return self._backends[engine]
+
+    def register(self):
+        event.listen(self.db.session, 'after_flush', self._after_flush)
+
+    def _row(self, product):
+        row = {'id': product.id}
+        for field in self.fields:
+            row[field] = getattr(product, field) or ''
+        return row
+
+    def _after_flush(self, session, flush_context):
+        changed = [
+            obj for obj in session.new
+            if isinstance(obj, self.model)
+        ]
+        changed += [
+            obj for obj in session.dirty
+            if isinstance(obj, self.model) and any(
+                inspect(obj).attrs[field].history.has_changes() for field in self.fields
+            )
+        ]
+        deleted = [obj.id for obj in session.deleted if isinstance(obj, self.model)]
+
+        if not changed and not deleted:
+            return
+
+        connection = session.connection()
+        backend = self.backend(connection)
+        if changed:
+            backend.upsert(connection, [self._row(product) for product in changed])
+        if deleted:
+            backend.delete(connection, deleted)
+
+    def index_rows(self, rows):
+        """Index rows written outside the ORM unit of work (bulk inserts)."""
+        if rows:
+            connection = self.db.session.connection()
+            self.backend(connection).upsert(connection, rows)
+
+    def rebuild(self):
+        connection = self.db.session.connection()
+        self.backend(connection).rebuild(connection, self.model.__tablename__)
+        self.db.session.commit()
+
+    def match(self, query):
+        """Return a ``(product_id, rank)`` subquery, or None when nothing is searchable."""
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        backend = self.backend(self.db.session.connection())
+        return backend.match(tokens).subquery()
+
+    def filter(self, query, matches):
+        return query.join(matches, matches.c.product_id == self.model.id)
+
+    def search_page(self, query, matches, cursor=None, limit=None):
+        """Page a query already filtered by ``matches``, best matches first."""
+        query = query.add_columns(matches.c.rank)
+        rows, next_cursor = paginate_keyset(
+            query, 'relevance', matches.c.rank, self.model.id,
+            cursor=cursor, limit=limit,
+            row_keys=lambda row: (row.rank, row[0].id)
+        )
+        return [row[0] for row in rows], next_cursor
@@ -0,0 +1,82 @@
+from collections import Counter
+
+from sqlalchemy import case, update
+
+
+class InsufficientStock(Exception):
+    """Raised when one or more products cannot cover the requested quantities."""
+
+    def __init__(self, product_ids):
+        super().__init__(f'Not enough stock for products {sorted(product_ids)}')
+        self.product_ids = product_ids
+
+
+def order_quantities(items):
+    """Sum ``(product_id, quantity)`` pairs so repeated lines reserve once."""
+    quantities = Counter()
+    for product_id, quantity in items:
+        quantities[product_id] += quantity
+    return dict(quantities)
+
+
+def _per_product(product_model, quantities):
+    return case(quantities, value=product_model.id)
+
+
+def reserve_stock(db, product_model, quantities):
+    """Take ``{product_id: quantity}`` out of stock, all or nothing.
+
+    One conditional ``UPDATE ... SET quantity = quantity - n WHERE id IN (...)
+    AND quantity >= n`` covers every product, so concurrent checkouts never
+    oversell: a second checkout waits for the first one's row locks and then
+    re-checks ``quantity >= n`` against the committed stock. The statement
+    runs in a savepoint of the caller's transaction, so those locks are held
+    until the caller commits or rolls back; commit promptly after reserving.
+    If any product falls short nothing is decremented and
+    ``InsufficientStock`` names the products that did.
+    """
+    if not quantities:
+        return
+    if any(quantity <= 0 for quantity in quantities.values()):
+        raise ValueError('Quantities must be positive')
+
+    requested = _per_product(product_model, quantities)
+    with db.session.begin_nested():
+        result = db.session.execute(
+            update(product_model)
+            .where(product_model.id.in_(quantities), product_model.quantity >= requested)
+            .values(quantity=product_model.quantity - requested)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != len(quantities):
+            # Leaving the block with an exception rolls the savepoint back
+            available = dict(db.session.execute(
+                db.select(product_model.id, product_model.quantity)
+                .where(product_model.id.in_(quantities))
+            ).all())
+            raise InsufficientStock([
+                product_id for product_id, quantity in quantities.items()
+                if available.get(product_id, 0) < quantity
+            ])
+    _expire_quantities(db, product_model, quantities)
+
+
+def release_stock(db, product_model, quantities):
+    """Return ``{product_id: quantity}`` to stock, e.g. when an order is cancelled."""
+    if not quantities:
+        return
+    db.session.execute(
+        update(product_model)
+        .where(product_model.id.in_(quantities))
+        .values(quantity=product_model.quantity + _per_product(product_model, quantities))
+        .execution_options(synchronize_session=False)
+    )
+    _expire_quantities(db, product_model, quantities)
+
+
+def _expire_quantities(db, product_model, quantities):
+    # Products already loaded in the session reload their stock on next access
+    for product_id in quantities:
+        product = db.session.identity_map.get(db.session.identity_key(product_model, product_id))
+        if product is not None:
+            db.session.expire(product, ['quantity'])